@@ -24,6 +24,19 @@ class AnalysisConfiguration:
         self.actor_drift_feature_sets = config['actor_drift_feature_sets']
         self.min_actor_frequency = config['min_actor_frequency']
         self.min_collab_frequency = config['min_collab_frequency']
+        # keyword arguments of FeatureExtraction.retrieve_subgraphs_for_feature_extraction
+        self.subgraph_settings = {"retrieval_mode": config.get('subgraph_retrieval_mode', "per_window"),
+                                  "aggregate_subgraphs": config.get('subgraph_aggregation', False),
+                                  "retrieval_workers": config.get('subgraph_retrieval_workers', 1),
+                                  "chunk_size": config.get('subgraph_chunk_size', 10000),
+                                  "combine_window_queries": config.get('subgraph_combined_query', False),
+                                  "incremental": config.get('subgraph_incremental', False)}
+        self.change_point_workers = config.get('change_point_workers', 1)
+        self.change_point_settings = config.get('change_point_settings', {})
+        self.online_window_size = config.get('online_window_size', 1)
+        self.online_collab_feature_sets = config.get('online_collab_feature_sets', {
+            "task_handovers_case_relative": ["count_per_task_handover_case_relative"]})
+        self.online_detector_settings = config.get('online_detector_settings', {})
 
         self.comp_window_size = config['comp_window_size']
         self.comp_feature_set_name_process_level = config['comp_feature_set_name_process_level']
@@ -3,9 +3,10 @@ from promg import DatabaseConnection
 from promg import Configuration
 from promg import Performance
 
-from main_functionalities import clear_db, load_data, transform_data, build_tasks, \
-    print_statistics, cluster_tasks, visualize_clusters_in_dot, process_level_drift_detection, \
-    actor_drift_detection, collab_drift_detection, cd_compare_subgroup_to_process_drift, \
+from main_functionalities import clear_db, load_data, transform_data, build_tasks, set_day_buckets, \
+    print_statistics, cluster_tasks, create_indexes, get_log_metadata, compute_log_metadata, visualize_clusters_in_dot, \
+    process_level_drift_detection, actor_drift_detection, collab_drift_detection, online_drift_monitoring, \
+    cd_compare_subgroup_to_process_drift, \
     cd_compare_tasks_vs_activity_activity_pair, cd_compare_variant_vs_activity_activity_pair, \
     cd_calculate_magnitude_signal_changes, cd_calculate_overall_average_max_signal_change
 from analysis_configuration import AnalysisConfiguration
@@ -17,10 +18,22 @@ analysis_config = AnalysisConfiguration()
 step_cluster_tasks = False
 step_visualize_clusters = False
 
+# sets the day buckets (start_day, end_day) on which concept drift detection filters, for the task instances and events
+# that have none, run once on graphs built without them and after loading new data (building the tasks sets them too)
+step_set_day_buckets = False
+# creates the indexes used by concept drift detection, run once after building and clustering the tasks
+step_create_indexes = False
+# computes the log bounds, actor and collaboration lists read by concept drift detection, run once after building and
+# clustering the tasks (they are recomputed automatically when the graph has changed since)
+step_compute_log_metadata = False
+
 # steps for concept drift detection, each can be switched on/off
 step_process_level_drift_detection = False
 step_actor_drift_detection = False
 step_collab_drift_detection = True
+# appends the windows that are new since the last run to the online change point detectors and alerts new change
+# points, run daily after loading the new data
+step_online_drift_monitoring = False
 
 # steps for evaluation, can only be turned is the above steps have run
 step_compare_to_process_drift = False
@@ -42,6 +55,8 @@ def main(config,
 
     db_connection = DatabaseConnection.set_up_connection(config=config)
     performance = Performance.set_up_performance(config=config)
+    # shared by all steps, such that the log metadata is read once per run
+    log_metadata = get_log_metadata(db_connection=db_connection, config=config)
 
     if step_clear_db:
         clear_db(db_connection)
@@ -53,35 +68,57 @@ def main(config,
                        config=config)
 
     if step_build_tasks:
-        build_tasks(db_connection=db_connection, config=config)
+        build_tasks(db_connection=db_connection, config=config, log_metadata=log_metadata)
 
     if step_cluster_tasks:
-        cluster_tasks(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        cluster_tasks(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                      log_metadata=log_metadata)
+
+    if step_set_day_buckets:
+        set_day_buckets(db_connection=db_connection, config=config, log_metadata=log_metadata)
+
+    if step_create_indexes:
+        create_indexes(db_connection=db_connection)
+
+    if step_compute_log_metadata:
+        compute_log_metadata(log_metadata=log_metadata)
 
     if step_visualize_clusters:
         visualize_clusters_in_dot(db_connection=db_connection, analysis_config=analysis_config)
 
     if step_process_level_drift_detection:
-        process_level_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        process_level_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                      log_metadata=log_metadata)
 
     if step_actor_drift_detection:
-        actor_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        actor_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                              log_metadata=log_metadata)
 
     if step_collab_drift_detection:
-        collab_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        collab_drift_detection(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                               log_metadata=log_metadata)
+
+    if step_online_drift_monitoring:
+        online_drift_monitoring(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                log_metadata=log_metadata)
 
     if step_compare_to_process_drift:
-        cd_compare_subgroup_to_process_drift(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        cd_compare_subgroup_to_process_drift(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                             log_metadata=log_metadata)
 
     if step_calculate_magnitude_signal_changes:
-        cd_calculate_magnitude_signal_changes(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        cd_calculate_magnitude_signal_changes(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                              log_metadata=log_metadata)
 
     if step_calculate_overall_average_max_signal_change:
-        cd_calculate_overall_average_max_signal_change(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        cd_calculate_overall_average_max_signal_change(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                                       log_metadata=log_metadata)
 
     if step_detailed_change_signal_analysis:
-        cd_compare_tasks_vs_activity_activity_pair(db_connection=db_connection, config=config, analysis_config=analysis_config)
-        cd_compare_variant_vs_activity_activity_pair(db_connection=db_connection, config=config, analysis_config=analysis_config)
+        cd_compare_tasks_vs_activity_activity_pair(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                                   log_metadata=log_metadata)
+        cd_compare_variant_vs_activity_activity_pair(db_connection=db_connection, config=config, analysis_config=analysis_config,
+                                                     log_metadata=log_metadata)
 
     performance.finish_and_save()
     print_statistics(db_connection)
@@ -7,6 +7,8 @@ from modules.task_clustering.cluster_visualization import ClusterVisualizer
 from modules.task_clustering.task_clustering import TaskClustering
 from modules.task_concept_drift_detection.concept_drift_analysis import ConceptDriftDetection
 from modules.task_concept_drift_detection.concept_drift_evaluation import ConceptDriftEvaluation
+from modules.task_concept_drift_detection.index_provisioning import IndexProvisioning
+from modules.task_concept_drift_detection.log_metadata import LogMetadata
 from modules.task_identification.task_identification import TaskIdentification as TaskIdentificationLocal
 from modules.custom_modules.delay_analysis import PerformanceAnalyzeDelays
 from modules.custom_modules.df_interactions import InferDFInteractions
@@ -81,7 +83,7 @@ def discover_model(db_connection, config):
     dfg.discover_dfg_for_entity("CASE_WO", 25000, 0.0)
 
 
-def build_tasks(db_connection, config):
+def build_tasks(db_connection, config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     print(Fore.RED + 'Detecting tasks.' + Fore.RESET)
     task_identifier = TaskIdentification(
@@ -96,9 +98,22 @@ def build_tasks(db_connection, config):
                                                     resource="Resource",
                                                     case="CaseAWO")
     task_identifier_local.set_task_id()
+    task_identifier_local.set_day_buckets()
+    log_metadata.write_graph_version()
 
 
-def cluster_tasks(db_connection, config, analysis_config):
+def set_day_buckets(db_connection, config, log_metadata):
+    semantic_header = SemanticHeader.create_semantic_header(config)
+    print(Fore.RED + 'Setting day buckets of task instances and events.' + Fore.RESET)
+    task_identifier_local = TaskIdentificationLocal(db_connection=db_connection,
+                                                    semantic_header=semantic_header,
+                                                    resource="Resource",
+                                                    case="CaseAWO")
+    task_identifier_local.set_day_buckets(only_missing=True)
+    log_metadata.write_graph_version()
+
+
+def cluster_tasks(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     print(Fore.RED + 'Clustering tasks.' + Fore.RESET)
     task_clustering = TaskClustering(db_connection=db_connection,
@@ -113,6 +128,25 @@ def cluster_tasks(db_connection, config, analysis_config):
                                                 clustering_description=analysis_config.clustering_description)
     task_clustering.remove_clusters()
     task_clustering.construct_clusters()
+    log_metadata.write_graph_version()
+
+
+def create_indexes(db_connection):
+    print(Fore.RED + 'Creating indexes for concept drift detection.' + Fore.RESET)
+    index_provisioning = IndexProvisioning(db_connection=db_connection)
+    index_provisioning.provision_indexes()
+
+
+def get_log_metadata(db_connection, config):
+    semantic_header = SemanticHeader.create_semantic_header(config)
+    return LogMetadata(db_connection=db_connection,
+                       case=semantic_header.get_entity("CaseAWO"),
+                       resource=semantic_header.get_entity("Resource"))
+
+
+def compute_log_metadata(log_metadata):
+    print(Fore.RED + 'Computing log metadata.' + Fore.RESET)
+    log_metadata.compute_log_metadata()
 
 
 def visualize_clusters_in_dot(db_connection, analysis_config):
@@ -121,13 +155,17 @@ def visualize_clusters_in_dot(db_connection, analysis_config):
     cluster_visualization.visualize_clusters()
 
 
-def process_level_drift_detection(db_connection, config, analysis_config):
+def process_level_drift_detection(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     print(Fore.RED + 'Detecting process-level drift.' + Fore.RESET)
     cd_detection = ConceptDriftDetection(db_connection=db_connection,
                                          semantic_header=semantic_header,
                                          dataset_name=analysis_config.dataset_name,
-                                         resource="Resource", case="CaseAWO")
+                                         resource="Resource", case="CaseAWO",
+                                         subgraph_settings=analysis_config.subgraph_settings,
+                                         change_point_workers=analysis_config.change_point_workers,
+                                         change_point_settings=analysis_config.change_point_settings,
+                                         log_metadata=log_metadata)
     cd_detection.detect_process_level_drift(window_sizes=analysis_config.window_sizes,
                                             penalties=analysis_config.penalties,
                                             feature_sets=analysis_config.process_drift_feature_sets,
@@ -135,14 +173,18 @@ def process_level_drift_detection(db_connection, config, analysis_config):
                                             plot_drift=False)
 
 
-def actor_drift_detection(db_connection, config, analysis_config):
+def actor_drift_detection(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     print(Fore.RED + 'Detecting actor drift.' + Fore.RESET)
     cd_detection = ConceptDriftDetection(db_connection=db_connection,
                                          semantic_header=semantic_header,
                                          dataset_name=analysis_config.dataset_name,
                                          resource="Resource",
-                                         case="CaseAWO")
+                                         case="CaseAWO",
+                                         subgraph_settings=analysis_config.subgraph_settings,
+                                         change_point_workers=analysis_config.change_point_workers,
+                                         change_point_settings=analysis_config.change_point_settings,
+                                         log_metadata=log_metadata)
     cd_detection.detect_actor_drift(window_sizes=analysis_config.window_sizes,
                                     penalties=analysis_config.penalties,
                                     feature_sets=analysis_config.actor_drift_feature_sets,
@@ -150,27 +192,53 @@ def actor_drift_detection(db_connection, config, analysis_config):
                                     plot_drift=False)
 
 
-def collab_drift_detection(db_connection, config, analysis_config):
+def collab_drift_detection(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     print(Fore.RED + 'Detecting collab drift.' + Fore.RESET)
     cd_detection = ConceptDriftDetection(db_connection=db_connection,
                                          semantic_header=semantic_header,
                                          dataset_name=analysis_config.dataset_name,
                                          resource="Resource",
-                                         case="CaseAWO")
+                                         case="CaseAWO",
+                                         subgraph_settings=analysis_config.subgraph_settings,
+                                         change_point_workers=analysis_config.change_point_workers,
+                                         change_point_settings=analysis_config.change_point_settings,
+                                         log_metadata=log_metadata)
     cd_detection.detect_collab_drift(window_sizes=analysis_config.window_sizes,
                                      penalties=analysis_config.penalties,
                                      min_collab_freq=300, detailed_analysis=True,
                                      exclude_cluster=analysis_config.leftover_cluster, plot_drift=False)
 
 
-def cd_compare_subgroup_to_process_drift(db_connection, config, analysis_config):
+def online_drift_monitoring(db_connection, config, analysis_config, log_metadata):
+    semantic_header = SemanticHeader.create_semantic_header(config)
+    print(Fore.RED + 'Monitoring drift online.' + Fore.RESET)
+    cd_detection = ConceptDriftDetection(db_connection=db_connection,
+                                         semantic_header=semantic_header,
+                                         dataset_name=analysis_config.dataset_name,
+                                         resource="Resource",
+                                         case="CaseAWO",
+                                         subgraph_settings=analysis_config.subgraph_settings,
+                                         log_metadata=log_metadata)
+    cd_detection.monitor_drift(window_size=analysis_config.online_window_size,
+                               process_feature_sets=analysis_config.process_drift_feature_sets,
+                               actor_feature_sets=analysis_config.actor_drift_feature_sets,
+                               collab_feature_sets=analysis_config.online_collab_feature_sets,
+                               min_actor_freq=analysis_config.min_actor_frequency,
+                               min_collab_freq=analysis_config.min_collab_frequency,
+                               exclude_cluster=analysis_config.leftover_cluster,
+                               detector_settings=analysis_config.online_detector_settings)
+
+
+def cd_compare_subgroup_to_process_drift(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     cd_evaluation = ConceptDriftEvaluation(db_connection=db_connection,
                                            semantic_header=semantic_header,
                                            dataset_name=analysis_config.dataset_name,
                                            resource="Resource",
-                                           case="CaseAWO")
+                                           case="CaseAWO",
+                                           subgraph_settings=analysis_config.subgraph_settings,
+                                           log_metadata=log_metadata)
     cd_evaluation.cd_compare_subgroup_to_process_drift(window_size=analysis_config.comp_window_size,
                                                        pen_process=analysis_config.comp_process_drift_penalty,
                                                        pen_subgroup=analysis_config.comp_subgroup_drift_penalty,
@@ -179,50 +247,58 @@ def cd_compare_subgroup_to_process_drift(db_connection, config, analysis_config)
                                                        feature_set_name_process_level=analysis_config.comp_feature_set_name_process_level)
 
 
-def cd_calculate_magnitude_signal_changes(db_connection, config, analysis_config):
+def cd_calculate_magnitude_signal_changes(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     cd_evaluation = ConceptDriftEvaluation(db_connection=db_connection,
                                            semantic_header=semantic_header,
                                            dataset_name=analysis_config.dataset_name,
                                            resource="Resource",
-                                           case="CaseAWO")
+                                           case="CaseAWO",
+                                           subgraph_settings=analysis_config.subgraph_settings,
+                                           log_metadata=log_metadata)
     cd_evaluation.calculate_magnitude_signal_changes(window_size=analysis_config.mc_window_size,
                                                      penalty=analysis_config.mc_penalty,
                                                      feature_sets=analysis_config.process_drift_feature_sets,
                                                      exclude_cluster=analysis_config.leftover_cluster)
 
 
-def cd_calculate_overall_average_max_signal_change(db_connection, config, analysis_config):
+def cd_calculate_overall_average_max_signal_change(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     cd_evaluation = ConceptDriftEvaluation(db_connection=db_connection,
                                            semantic_header=semantic_header,
                                            dataset_name=analysis_config.dataset_name,
                                            resource="Resource",
-                                           case="CaseAWO")
+                                           case="CaseAWO",
+                                           subgraph_settings=analysis_config.subgraph_settings,
+                                           log_metadata=log_metadata)
     cd_evaluation.calculate_overall_average_max_signal_change(window_size=analysis_config.mc_window_size,
                                                               penalty=analysis_config.mc_penalty,
                                                               feature_sets=analysis_config.process_drift_feature_sets,
                                                               exclude_cluster=analysis_config.leftover_cluster)
 
 
-def cd_compare_tasks_vs_activity_activity_pair(db_connection, config, analysis_config):
+def cd_compare_tasks_vs_activity_activity_pair(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     cd_evaluation = ConceptDriftEvaluation(db_connection=db_connection,
                                            semantic_header=semantic_header,
                                            dataset_name=analysis_config.dataset_name,
                                            resource="Resource",
-                                           case="CaseAWO")
+                                           case="CaseAWO",
+                                           subgraph_settings=analysis_config.subgraph_settings,
+                                           log_metadata=log_metadata)
     cd_evaluation.compare_tasks_vs_activity_activity_pair(penalty=analysis_config.dc_penalty,
                                                           cp_task_dict=analysis_config.dc_task_dict)
 
 
-def cd_compare_variant_vs_activity_activity_pair(db_connection, config, analysis_config):
+def cd_compare_variant_vs_activity_activity_pair(db_connection, config, analysis_config, log_metadata):
     semantic_header = SemanticHeader.create_semantic_header(config)
     cd_evaluation = ConceptDriftEvaluation(db_connection=db_connection,
                                            semantic_header=semantic_header,
                                            dataset_name=analysis_config.dataset_name,
                                            resource="Resource",
-                                           case="CaseAWO")
+                                           case="CaseAWO",
+                                           subgraph_settings=analysis_config.subgraph_settings,
+                                           log_metadata=log_metadata)
     cd_evaluation.compare_variant_vs_activity_activity_pair(penalty=analysis_config.dc_penalty,
                                                             cp_variant_dict=analysis_config.dc_variant_dict)
 
@@ -1,4 +1,61 @@
+import json
+import time
+
+import numpy as np
 import ruptures as rpt
+from ruptures.costs import CostRbf
+from ruptures.exceptions import NotEnoughPoints
+from scipy.special import gammaln, logsumexp
+
+# backend: ruptures search method, all backends use the rbf cost of CostRbfCumsum
+CPD_BACKENDS = {"pelt": rpt.Pelt, "binseg": rpt.Binseg, "bottomup": rpt.BottomUp, "window": rpt.Window}
+# backend: backend-specific parameters next to min_size and jump
+CPD_BACKEND_PARAMS = {"pelt": [], "binseg": [], "bottomup": [], "window": ["width"]}
+
+
+class CostRbfCumsum(CostRbf):
+    '''
+    Kernel cost function (rbf kernel) of ruptures with the same Gram matrix, which keeps the 2-D cumulative sums of the
+    Gram matrix such that the cost of any segment is computed in constant time, instead of summing the Gram matrix of
+    the segment
+    '''
+
+    model = "rbf_cumsum"
+
+    def fit(self, signal) -> "CostRbfCumsum":
+        super().fit(signal)
+        gram = self.gram
+        # gram_cumsum[i, j]: sum of gram[:i, :j], diagonal_cumsum[i]: sum of the diagonal of gram[:i, :i]
+        self.gram_cumsum = np.zeros((gram.shape[0] + 1, gram.shape[1] + 1))
+        self.gram_cumsum[1:, 1:] = gram.cumsum(axis=0).cumsum(axis=1)
+        self.diagonal_cumsum = np.concatenate([[0], np.cumsum(np.diagonal(gram))])
+        return self
+
+    def error(self, start, end) -> float:
+        if end - start < self.min_size:
+            raise NotEnoughPoints
+        # the Gram matrix is symmetric, the sum of gram[start:end, start:end] only needs three cumulative sums
+        segment_sum = self.gram_cumsum[end, end] - 2 * self.gram_cumsum[start, end] + \
+            self.gram_cumsum[start, start]
+        return self.diagonal_cumsum[end] - self.diagonal_cumsum[start] - segment_sum / (end - start)
+
+
+def check_backend_params(backend, params):
+    if backend not in CPD_BACKENDS:
+        raise ValueError(f"Unknown change point detection backend {backend}, choose from {list(CPD_BACKENDS)}")
+    unknown_params = [param for param in params if param not in CPD_BACKEND_PARAMS[backend]]
+    if unknown_params:
+        raise ValueError(f"Unknown parameters {unknown_params} for change point detection backend {backend}, "
+                         f"choose from {['min_size', 'jump'] + CPD_BACKEND_PARAMS[backend]}")
+
+
+def get_search_method(series, backend="pelt", min_size=1, jump=1, **params):
+    '''
+    returns:
+        search method of the backend fitted on the series, with the rbf cost answering segment costs in constant time
+    '''
+    check_backend_params(backend, params)
+    return CPD_BACKENDS[backend](custom_cost=CostRbfCumsum(), min_size=min_size, jump=jump, **params).fit(series)
 
 
 def rpt_pelt(series, pen=3):
@@ -11,6 +68,201 @@ def rpt_pelt(series, pen=3):
     returns:
         list of change points
     '''
-    algo = rpt.Pelt(model="rbf", min_size=1, jump=1).fit(series)
+    algo = get_search_method(series)
     result = algo.predict(pen=pen)
     return result[:-1]
+
+
+def rpt_pelt_penalty_path(series, penalties, min_size=1, jump=1):
+    '''
+    Applies the PELT-algorithm for all provided penalties with a single fitted cost (Gram matrix), using CROPS from
+    Haynes et al. (2017) https://doi.org/10.1080/10618600.2015.1116445 to only solve PELT for the penalties at which
+    the segmentation can change. The penalty path between the smallest and largest penalty consists of intervals with a
+    constant optimal segmentation, intervals that do not contain any of the provided penalties are not refined.
+    args:
+        series: (Reduced) time series, retrieved when applying dimensionality reduction
+        penalties: penalty values for classifying change points
+        min_size: minimum number of windows between change points
+        jump: only every jump-th window is considered as change point
+    returns:
+        dict penalty: list of change points, same as rpt_pelt for every penalty
+    '''
+    algo = get_search_method(series, "pelt", min_size, jump)
+    # number of change points: (unpenalized cost, change points) of the segmentations on the penalty path
+    segmentations = {}
+
+    def solve(pen):
+        result = algo.predict(pen=pen)
+        segmentations[len(result) - 1] = (algo.cost.sum_of_costs(result), result[:-1])
+        return len(result) - 1
+
+    pen_min, pen_max = min(penalties), max(penalties)
+    intervals = [(pen_min, solve(pen_min), pen_max, solve(pen_max))]
+    while intervals:
+        pen_low, num_cps_low, pen_high, num_cps_high = intervals.pop()
+        # consecutive numbers of change points have no other segmentation in between
+        if num_cps_low <= num_cps_high + 1 or not any(pen_low < pen < pen_high for pen in penalties):
+            continue
+        # penalty at which the segmentations of both ends of the interval have the same penalized cost
+        pen_intersect = (segmentations[num_cps_high][0] - segmentations[num_cps_low][0]) / (num_cps_low - num_cps_high)
+        num_cps_intersect = solve(pen_intersect)
+        # if the segmentation at the intersection is one of both ends, there is no other segmentation in between
+        if num_cps_intersect not in (num_cps_low, num_cps_high):
+            intervals.append((pen_low, num_cps_low, pen_intersect, num_cps_intersect))
+            intervals.append((pen_intersect, num_cps_intersect, pen_high, num_cps_high))
+
+    # the segmentation of a penalty is the segmentation on the path with the lowest penalized cost
+    return {pen: segmentations[min(segmentations, key=lambda num_cps: segmentations[num_cps][0] + pen * num_cps)][1]
+            for pen in penalties}
+
+
+def detect_change_points(series, penalties, backend="pelt", min_size=1, jump=1, **params):
+    '''
+    Detects the change points for all provided penalties with the provided backend. "pelt" is exact, "binseg" (binary
+    segmentation), "bottomup" and "window" (sliding window) are approximate and faster on long series.
+    args:
+        series: (Reduced) time series, retrieved when applying dimensionality reduction
+        penalties: penalty values for classifying change points
+        backend: backend in CPD_BACKENDS
+        min_size: minimum number of windows between change points
+        jump: only every jump-th window is considered as change point
+        params: backend-specific parameters in CPD_BACKEND_PARAMS, e.g. width (number of windows) for "window"
+    returns:
+        dict penalty: list of change points, runtime in seconds
+    '''
+    check_backend_params(backend, params)
+    start = time.time()
+    if backend == "pelt":
+        dict_cps = rpt_pelt_penalty_path(series, penalties, min_size, jump)
+    else:
+        # the approximate backends are fitted once, predicting another penalty reuses their cached segment costs
+        algo = get_search_method(series, backend, min_size, jump, **params)
+        # the sliding window backend returns numpy integers, which are converted to write plain lists of change points
+        dict_cps = {pen: [int(cp) for cp in algo.predict(pen=pen)[:-1]] for pen in penalties}
+    return dict_cps, time.time() - start
+
+
+class BayesianOnlineChangePointDetector:
+    '''
+    Bayesian online change point detection from Adams and MacKay (2007) https://arxiv.org/abs/0710.3742, with a constant
+    hazard and an independent Normal-Gamma model per feature. The run-length posterior keeps the sufficient statistics
+    (count, sum and sum of squares per feature) per run length and is truncated to the max_run_length most probable run
+    lengths, such that appending a window takes constant time, regardless of the number of windows seen before.
+    Features that appear for the first time were 0 in all earlier windows, they are added with zero sums.
+    '''
+
+    def __init__(self, expected_run_length=100, max_run_length=500, prior_mean=0.0, prior_kappa=1.0, prior_alpha=1.0,
+                 prior_beta=1.0):
+        '''
+        args:
+            expected_run_length: expected number of (active) windows between change points, the hazard is its inverse
+            max_run_length: number of run lengths kept in the posterior
+            prior_mean, prior_kappa, prior_alpha, prior_beta: Normal-Gamma prior of every feature
+        '''
+        self.settings = {"expected_run_length": expected_run_length, "max_run_length": max_run_length,
+                         "prior_mean": prior_mean, "prior_kappa": prior_kappa, "prior_alpha": prior_alpha,
+                         "prior_beta": prior_beta}
+        self.feature_names = []
+        # feature name: column of the feature in the sufficient statistics
+        self.feature_columns = {}
+        # state of the graph the observed windows were extracted from (e.g. its start date and fingerprint), such that
+        # a detector is not continued on another graph
+        self.graph_state = {}
+        # number of windows seen (including inactive windows) and the last change point that was alerted
+        self.num_windows = 0
+        self.last_change_point = 0
+        # per run length: first window of the run, log posterior probability and sufficient statistics
+        self.run_starts = np.zeros(1, dtype=np.int64)
+        self.log_posterior = np.zeros(1)
+        self.counts = np.zeros(1)
+        self.sums = np.zeros((1, 0))
+        self.sums_of_squares = np.zeros((1, 0))
+
+    def add_features(self, feature_names):
+        new_feature_names = [name for name in dict.fromkeys(feature_names) if name not in self.feature_columns]
+        if new_feature_names:
+            self.feature_columns.update((name, column) for column, name in
+                                        enumerate(new_feature_names, start=len(self.feature_names)))
+            self.feature_names += new_feature_names
+            padding = ((0, 0), (0, len(new_feature_names)))
+            self.sums = np.pad(self.sums, padding)
+            self.sums_of_squares = np.pad(self.sums_of_squares, padding)
+
+    def get_log_predictive(self, x):
+        '''
+        returns:
+            log probability of x per run length, under the Student-t posterior predictive of the run
+        '''
+        mean, kappa, alpha, beta = (self.settings[setting] for setting in
+                                    ["prior_mean", "prior_kappa", "prior_alpha", "prior_beta"])
+        counts = self.counts[:, np.newaxis]
+        kappa_n = kappa + counts
+        mean_n = (kappa * mean + self.sums) / kappa_n
+        alpha_n = alpha + counts / 2
+        beta_n = beta + (self.sums_of_squares + kappa * mean ** 2 - kappa_n * mean_n ** 2) / 2
+        scale_squared = beta_n * (kappa_n + 1) / (alpha_n * kappa_n)
+        log_pdf = gammaln(alpha_n + 0.5) - gammaln(alpha_n) - np.log(2 * np.pi * alpha_n * scale_squared) / 2 - \
+            (alpha_n + 0.5) * np.log1p((x - mean_n) ** 2 / (2 * alpha_n * scale_squared))
+        return log_pdf.sum(axis=1)
+
+    def update(self, feature_names, features, active=True):
+        '''
+        Appends the next window to the series
+        args:
+            feature_names: names of the features of the window
+            features: feature values of the window
+            active: if False, the window is counted but not observed (e.g. the actor was inactive)
+        returns:
+            first window of the new run if the most probable run length reveals a change point that was not alerted
+            before, None otherwise
+        '''
+        window = self.num_windows
+        self.num_windows += 1
+        if not active:
+            return None
+        self.add_features(feature_names)
+        x = np.zeros(len(self.feature_names))
+        x[[self.feature_columns[name] for name in feature_names]] = features
+
+        hazard = 1 / self.settings["expected_run_length"]
+        log_joint = self.log_posterior + self.get_log_predictive(x)
+        # either the run grows with x, or a new run starts after x
+        self.log_posterior = np.concatenate([[logsumexp(log_joint) + np.log(hazard)], log_joint + np.log1p(-hazard)])
+        self.run_starts = np.concatenate([[window + 1], self.run_starts])
+        self.counts = np.concatenate([[0], self.counts + 1])
+        self.sums = np.vstack([np.zeros(len(x)), self.sums + x])
+        self.sums_of_squares = np.vstack([np.zeros(len(x)), self.sums_of_squares + x ** 2])
+
+        if len(self.log_posterior) > self.settings["max_run_length"]:
+            keep = np.sort(np.argpartition(-self.log_posterior, self.settings["max_run_length"])[
+                           :self.settings["max_run_length"]])
+            self.run_starts, self.log_posterior, self.counts, self.sums, self.sums_of_squares = \
+                self.run_starts[keep], self.log_posterior[keep], self.counts[keep], self.sums[keep], \
+                self.sums_of_squares[keep]
+        self.log_posterior -= logsumexp(self.log_posterior)
+
+        change_point = int(self.run_starts[np.argmax(self.log_posterior)])
+        if self.last_change_point < change_point <= window:
+            self.last_change_point = change_point
+            return change_point
+        return None
+
+    def save(self, file_path):
+        np.savez_compressed(file_path, settings=json.dumps(self.settings), graph_state=json.dumps(self.graph_state),
+                            feature_names=np.array(self.feature_names, dtype=str),
+                            windows=np.array([self.num_windows, self.last_change_point]), run_starts=self.run_starts,
+                            log_posterior=self.log_posterior, counts=self.counts, sums=self.sums,
+                            sums_of_squares=self.sums_of_squares)
+
+    @staticmethod
+    def load(file_path):
+        with np.load(file_path) as state:
+            detector = BayesianOnlineChangePointDetector(**json.loads(str(state["settings"])))
+            detector.feature_names = state["feature_names"].tolist()
+            detector.feature_columns = {name: column for column, name in enumerate(detector.feature_names)}
+            # detectors saved without a graph state never match the state of a graph
+            detector.graph_state = json.loads(str(state["graph_state"])) if "graph_state" in state else None
+            detector.num_windows, detector.last_change_point = state["windows"].tolist()
+            detector.run_starts, detector.log_posterior, detector.counts, detector.sums, detector.sums_of_squares = \
+                (state[array] for array in ["run_starts", "log_posterior", "counts", "sums", "sums_of_squares"])
+        return detector
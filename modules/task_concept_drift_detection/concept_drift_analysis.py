@@ -6,24 +6,39 @@ from itertools import product
 from os import path
 import os
 import glob
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
 
 from promg import DatabaseConnection
 from promg.data_managers.semantic_header import ConstructedNodes, SemanticHeader
 
-from queries.task_cd_detection import ConceptDriftDetectionTasksQueryLibrary as ql
-from modules.task_concept_drift_detection.feature_extraction import FeatureExtraction
+from modules.task_concept_drift_detection.feature_extraction import FeatureExtraction, get_num_complete_windows
+from modules.task_concept_drift_detection.log_metadata import LogMetadata
 from modules.task_concept_drift_detection import change_point_detection
 from modules.task_concept_drift_detection import change_point_visualization
-from queries import query_result_parser as qp
 
 
 def get_feature_extractor_objects(db_connection, dataset_name: str, case: ConstructedNodes, resource: ConstructedNodes,
-                                  feature_names: list, window_sizes: list, exclude_cluster: str = ""):
+                                  feature_names: list, window_sizes: list, exclude_cluster: str = "",
+                                  subgraph_settings: dict = None, log_metadata: LogMetadata = None):
+    '''
+    args:
+        subgraph_settings: keyword arguments of FeatureExtraction.retrieve_subgraphs_for_feature_extraction, e.g. the
+          retrieval mode
+        log_metadata: log metadata shared by the feature extractors, created if not given
+    '''
+    log_metadata = log_metadata or LogMetadata(db_connection, case, resource)
+    subgraph_settings = subgraph_settings or {}
     list_f_extr = []
     for window_size in window_sizes:
-        f_extr = FeatureExtraction(db_connection=db_connection, dataset_name=dataset_name, case=case, actor=resource,
-                                   exclude_cluster=exclude_cluster)
-        f_extr.retrieve_subgraphs_for_feature_extraction(window_size=window_size, feature_set=feature_names)
+        if subgraph_settings.get("retrieval_mode") == "one_shot" and list_f_extr:
+            # derive the subgraphs of the other window sizes from the subgraphs retrieved for the first window size
+            f_extr = list_f_extr[0].derive_window_size(window_size)
+        else:
+            f_extr = FeatureExtraction(db_connection=db_connection, dataset_name=dataset_name, case=case,
+                                       actor=resource, exclude_cluster=exclude_cluster, log_metadata=log_metadata)
+            f_extr.retrieve_subgraphs_for_feature_extraction(window_size=window_size, feature_set=feature_names,
+                                                             **subgraph_settings)
         list_f_extr.append(f_extr)
     return list_f_extr
 
@@ -73,13 +88,133 @@ def split_consecutive(array, step_size=1):
         return None
 
 
+def get_collab_features(collab_feature_tensor, collab_pair):
+    '''
+    returns:
+        names of the features of the collab pair in both directions, window x feature matrix of the features in both
+        directions
+    '''
+    collab_feature_names, collab_feature_vector = collab_feature_tensor.get_subgroup_features(tuple(collab_pair))
+    collab_reverse_feature_names, collab_reverse_feature_vector = collab_feature_tensor.get_subgroup_features(
+        tuple(collab_pair[::-1]))
+    return ([f"dir1_{f_name}" for f_name in collab_feature_names] +
+            [f"dir2_{f_name}" for f_name in collab_reverse_feature_names],
+            np.concatenate((collab_feature_vector, collab_reverse_feature_vector), axis=1))
+
+
+def load_online_detector(detector_path, detector_settings, get_graph_state):
+    '''
+    Loads the persisted online change point detector of a series. The detector is reset if the part of the graph that
+    its windows were extracted from has changed since it was saved, e.g. if the graph was rebuilt.
+    args:
+        detector_settings: keyword arguments of change_point_detection.BayesianOnlineChangePointDetector
+        get_graph_state: function that returns the graph state of the first num_windows windows
+    '''
+    if path.exists(detector_path):
+        detector = change_point_detection.BayesianOnlineChangePointDetector.load(detector_path)
+        if detector.graph_state == get_graph_state(detector.num_windows):
+            return detector
+        print(f"The graph has changed since {detector_path} was saved, resetting the detector.")
+    return change_point_detection.BayesianOnlineChangePointDetector(**detector_settings)
+
+
+def update_online_detectors(series, detectors, num_windows):
+    '''
+    Appends the windows up to num_windows that the online change point detector of a series has not seen yet, windows
+    seen in an earlier run are not observed again
+    args:
+        series: dict series name: (feature names, window x feature matrix, active windows)
+        detectors: dict series name: online change point detector
+        num_windows: number of windows that are complete, later windows may still change and are held back
+    returns:
+        list of alerts (series name, window, change point)
+    '''
+    alerts = []
+    for series_name, (feature_names, feature_vector, active_windows) in series.items():
+        detector = detectors[series_name]
+        for window in range(detector.num_windows, num_windows):
+            change_point = detector.update(feature_names, feature_vector[window], active=active_windows[window])
+            if change_point is not None:
+                alerts.append((series_name, window, change_point))
+    return alerts
+
+
+def write_change_point_runtimes(runtimes, change_point_settings, file_path):
+    '''
+    Writes the runtime of every call of the change point detection backend, together with the backend settings
+    args:
+        runtimes: list of (subgroup, window size, number of windows, runtime in seconds)
+    '''
+    df_runtimes = pd.DataFrame(runtimes, columns=["subgroup", "window_size", "num_windows", "runtime"])
+    df_runtimes["backend"] = change_point_settings.get("backend", "pelt")
+    df_runtimes["settings"] = str(change_point_settings)
+    df_runtimes.to_csv(file_path, index=False)
+
+
+def detect_subgroup_change_points(feature_vectors, penalties, change_point_settings, activity_vectors=None):
+    '''
+    Strips the inactive windows of a subgroup, reduces its features and detects its change points, for every window
+    size. Defined at module level such that it can run in a worker process, which only receives the feature vectors of
+    the subgroup.
+    args:
+        feature_vectors: window x feature matrix of the subgroup, per window size
+        change_point_settings: keyword arguments of change_point_detection.detect_change_points, e.g. the backend
+        activity_vectors: (activity of actor 1, activity of actor 2) per window size for a collab pair, None for an
+          actor
+    returns:
+        (dict penalty: change points, inactive windows, number of windows, runtime of the change point detection in
+        seconds) per window size
+    '''
+    results = []
+    for index, feature_vector in enumerate(feature_vectors):
+        if activity_vectors is None:
+            feature_vector_stripped, time_window_mapping, windows_inactive = strip_inactive_windows(feature_vector)
+        else:
+            feature_vector_stripped, time_window_mapping, windows_inactive = strip_inactive_windows_collab(
+                feature_vector, *activity_vectors[index])
+        reduced_feature_vector = FeatureExtraction.pca_reduction(feature_vector_stripped, 'mle', normalize=True,
+                                                                 normalize_function="max")
+        dict_cps, runtime = change_point_detection.detect_change_points(reduced_feature_vector, penalties,
+                                                                        **change_point_settings)
+        results.append(({pen: retrieve_original_cps(cp, time_window_mapping) for pen, cp in dict_cps.items()},
+                         windows_inactive, len(reduced_feature_vector), runtime))
+    return results
+
+
+def map_subgroups(function, subgroup_arguments, workers=1):
+    '''
+    Applies function to the arguments of every subgroup, up to workers subgroups are processed in parallel in worker
+    processes
+    args:
+        subgroup_arguments: list of argument tuples, one per subgroup
+    returns:
+        generator of the results per subgroup, in subgroup order
+    '''
+    if workers <= 1 or len(subgroup_arguments) <= 1:
+        yield from (function(*arguments) for arguments in subgroup_arguments)
+        return
+    # send the subgroups to the workers in a few chunks per worker, instead of one round trip per subgroup
+    chunksize = max(1, len(subgroup_arguments) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(function, *zip(*subgroup_arguments), chunksize=chunksize)
+
+
 class ConceptDriftDetection:
-    def __init__(self, db_connection, semantic_header, dataset_name, resource: str, case: str):
+    def __init__(self, db_connection, semantic_header, dataset_name, resource: str, case: str,
+                 subgraph_settings: dict = None, change_point_workers: int = 1, change_point_settings: dict = None,
+                 log_metadata: LogMetadata = None):
         self.connection = db_connection
         self.dataset_name = dataset_name
+        # keyword arguments of FeatureExtraction.retrieve_subgraphs_for_feature_extraction, e.g. the retrieval mode
+        self.subgraph_settings = subgraph_settings or {}
+        self.change_point_workers = change_point_workers
+        # perspective ("process", "actor" or "collab"): settings of the change point detection backend
+        self.change_point_settings = change_point_settings or {}
         self.output_directory = f"output_final\\{dataset_name}\\task_concept_drift_detection"
         self.resource: ConstructedNodes = semantic_header.get_entity(resource)
         self.case: ConstructedNodes = semantic_header.get_entity(case)
+        # shared with the feature extractors, pass the log metadata of the run to read it once per run
+        self.log_metadata = log_metadata or LogMetadata(db_connection, self.case, self.resource)
 
     def detect_process_level_drift(self, window_sizes, penalties, feature_sets, exclude_cluster,
                                    plot_drift=False):
@@ -87,7 +222,9 @@ class ConceptDriftDetection:
         list_f_extr = get_feature_extractor_objects(db_connection=self.connection,
                                                     dataset_name=self.dataset_name, case=self.case,
                                                     resource=self.resource, feature_names=all_features,
-                                                    window_sizes=window_sizes, exclude_cluster=exclude_cluster)
+                                                    window_sizes=window_sizes, exclude_cluster=exclude_cluster,
+                                                    subgraph_settings=self.subgraph_settings,
+                                                    log_metadata=self.log_metadata)
 
         # create output directory for process drift detection
         process_level_drift_directory = os.path.join(self.output_directory, "process_level_drift")
@@ -117,32 +254,36 @@ class ConceptDriftDetection:
             process_level_drift_feature_directory = os.path.join(process_level_drift_directory, feature_set_name)
             os.makedirs(process_level_drift_feature_directory, exist_ok=True)
 
-            # initialize dictionary to store change points for specified feature set
-            dict_process_cps = {}
+            change_point_runtimes = []
             for index, window_size in enumerate(window_sizes):
-                feature_names, feature_vector = list_f_extr[index].apply_feature_extraction(feature_list)
+                feature_names, feature_vector = list_f_extr[index].apply_feature_extraction(feature_list,
+                                                                                          return_sparse=True)
                 reduced_feature_vector = list_f_extr[index].pca_reduction(feature_vector, 'mle', normalize=True,
                                                                           normalize_function="max")
-                for pen in penalties:
-                    # detect change points for specified penalty and write to dataframe
-                    cp = change_point_detection.rpt_pelt(reduced_feature_vector, pen=pen)
-                    dict_process_cps[pen] = cp
+                # detect change points for all penalties at once
+                dict_process_cps, runtime = change_point_detection.detect_change_points(
+                    reduced_feature_vector, penalties, **self.change_point_settings.get("process", {}))
+                change_point_runtimes.append((feature_set_name, window_size, len(reduced_feature_vector), runtime))
+                for pen, cp in dict_process_cps.items():
+                    # write the change points for specified penalty to dataframe
                     # print(f"Change points {feature_set_name}: {cp}")
                     df_process_level_drift_points.loc[feature_set_name, f"{window_size}_{pen}"] = str(cp)
                     df_process_level_feature_drift_points.loc[feature_set_name, f"{window_size}_{pen}"] = str(cp)
                 if plot_drift:
-                    change_point_visualization.plot_trends(np_feature_vectors=feature_vector,
+                    change_point_visualization.plot_trends(np_feature_vectors=feature_vector.toarray(),
                                                            feature_names=feature_names, window_size=window_size,
                                                            output_directory=process_level_drift_feature_directory,
                                                            dict_change_points=dict_process_cps, min_freq=5)
             df_process_level_feature_drift_points.to_csv(
                 f"{process_level_drift_directory}\\{feature_set_name}\\cps_{feature_set_name}.csv")
+            write_change_point_runtimes(
+                change_point_runtimes, self.change_point_settings.get("process", {}),
+                f"{process_level_drift_directory}\\{feature_set_name}\\cpd_runtimes_{feature_set_name}.csv")
         df_process_level_drift_points.to_csv(f"{process_level_drift_directory}\\cps_all_features.csv")
 
     def detect_actor_drift(self, window_sizes, penalties, feature_sets, min_actor_freq, exclude_cluster,
                            plot_drift=False):
-        actor_list = qp.parse_to_list(self.connection.exec_query(ql.q_retrieve_actor_list, **{
-            "resource": self.resource, "min_freq": min_actor_freq}), "actor")
+        actor_list = self.log_metadata.get_actor_list(min_freq=min_actor_freq)
 
         all_features = [item for sublist in list(feature_sets.values()) for item in sublist]
         list_f_extr = get_feature_extractor_objects(db_connection=self.connection,
@@ -151,7 +292,9 @@ class ConceptDriftDetection:
                                                     resource=self.resource,
                                                     feature_names=all_features,
                                                     window_sizes=window_sizes,
-                                                    exclude_cluster=exclude_cluster)
+                                                    exclude_cluster=exclude_cluster,
+                                                    subgraph_settings=self.subgraph_settings,
+                                                    log_metadata=self.log_metadata)
 
         for feature_set_name, feature_list in feature_sets.items():
             print(f"Feature set: {feature_set_name}")
@@ -171,8 +314,23 @@ class ConceptDriftDetection:
                     [df_all_actor_drift_points, df_all_actor_drift_points_old], ignore_index=False).dropna(
                     how='all').sort_index(axis=1)
 
+            # extract the features of all actors in one pass, per actor the features are sliced from the tensor
+            actor_feature_tensors = [f_extr.extract_actor_feature_tensor(feature_list, actor_list)
+                                     for f_extr in list_f_extr]
+
+            # the features of an actor per window size, the change points of the actors are detected in parallel
+            actor_features = [[tensor.get_subgroup_features(actor) for tensor in actor_feature_tensors]
+                              for actor in actor_list]
+            actor_change_point_settings = self.change_point_settings.get("actor", {})
+            actor_results = map_subgroups(detect_subgroup_change_points,
+                                          [([feature_vector for _, feature_vector in features], penalties,
+                                            actor_change_point_settings) for features in actor_features],
+                                          workers=self.change_point_workers)
+            change_point_runtimes = []
+
             print(f"Detecting change points for {len(actor_list)} actors...")
-            for actor in tqdm(actor_list):
+            for actor, features, results in tqdm(zip(actor_list, actor_features, actor_results),
+                                                 total=len(actor_list)):
                 # create directory to store actor-specific change points (and plots)
                 actor_drift_feature_subdirectory = os.path.join(actor_drift_feature_directory, actor)
                 os.makedirs(actor_drift_feature_subdirectory, exist_ok=True)
@@ -186,26 +344,14 @@ class ConceptDriftDetection:
                         [df_actor_drift_points, df_actor_drift_points_old], ignore_index=False).dropna(
                         how='all').sort_index(axis=1)
 
-                # initialize dictionary to store change points for specified feature set
-                dict_actor_cps = {}
                 for index, window_size in enumerate(window_sizes):
-                    # generate mv time series for specified features/actor/window size
-                    actor_feature_names, actor_feature_vector = list_f_extr[index].apply_feature_extraction(
-                        feature_list, actor=actor, actor_1=actor, actor_2=actor)
-                    actor_feature_vector_stripped, time_window_mapping, windows_inactive = strip_inactive_windows(
-                        actor_feature_vector)
-                    reduced_actor_feature_vector = list_f_extr[index].pca_reduction(actor_feature_vector_stripped,
-                                                                                    'mle',
-                                                                                    normalize=True,
-                                                                                    normalize_function="max")
-                    for pen in penalties:
-                        # detect change points for specified penalty and write to dataframe
-                        cp = change_point_detection.rpt_pelt(reduced_actor_feature_vector, pen=pen)
-                        # print(f"Change points {actor} {feature_set[1]} (pen={pen}): {cp}")
-                        cp = retrieve_original_cps(cp, time_window_mapping)
+                    actor_feature_names, actor_feature_vector = features[index]
+                    dict_actor_cps, windows_inactive, num_windows, runtime = results[index]
+                    change_point_runtimes.append((actor, window_size, num_windows, runtime))
+                    for pen, cp in dict_actor_cps.items():
+                        # write the change points for specified penalty to dataframe
                         df_all_actor_drift_points.loc[actor, f"{window_size}_{pen}"] = str(cp)
                         df_actor_drift_points.loc[actor, f"{window_size}_{pen}"] = str(cp)
-                        dict_actor_cps[pen] = cp
                     if plot_drift:
                         change_point_visualization.plot_trends(
                             np_feature_vectors=actor_feature_vector, feature_names=actor_feature_names,
@@ -215,12 +361,12 @@ class ConceptDriftDetection:
                 df_actor_drift_points.to_csv(
                     f"{actor_drift_feature_directory}\\{actor}\\{actor}_cps_{feature_set_name}.csv")
             df_all_actor_drift_points.to_csv(f"{actor_drift_feature_directory}\\all_actor_cps_{feature_set_name}.csv")
+            write_change_point_runtimes(change_point_runtimes, actor_change_point_settings,
+                                        f"{actor_drift_feature_directory}\\cpd_runtimes_{feature_set_name}.csv")
 
     def detect_collab_drift(self, window_sizes, penalties, min_collab_freq, detailed_analysis,
                             exclude_cluster, plot_drift=False):
-        collab_list = qp.parse_to_2d_list(self.connection.exec_query(ql.q_retrieve_collab_list, **{
-            "resource": self.resource, "case": self.case, "min_freq": min_collab_freq}),
-                                          "actor_1", "actor_2")
+        collab_list = self.log_metadata.get_collab_list(min_freq=min_collab_freq)
         # collab_list = [["User_1", "User_2"]]
         collab_pairs_distinct = remove_duplicate_collab_pairs(collab_list)
         if detailed_analysis:
@@ -235,19 +381,22 @@ class ConceptDriftDetection:
                                                     case=self.case, resource=self.resource,
                                                     feature_names=all_features,
                                                     window_sizes=window_sizes,
-                                                    exclude_cluster=exclude_cluster)
+                                                    exclude_cluster=exclude_cluster,
+                                                    subgraph_settings=self.subgraph_settings,
+                                                    log_metadata=self.log_metadata)
 
         # set up indices and columns for dataframes
         cp_settings = ["{}_{}".format(a_, b_) for a_, b_ in product(window_sizes, penalties)]
         index_collab_pairs = [f"{pair[0]}_{pair[1]}" for pair in collab_pairs_distinct]
 
-        # retrieve activity per time window for all actors in collab_pairs
-        list_actors = [actor for collab_pair in collab_pairs_distinct for actor in collab_pair]
+        # retrieve activity per time window for all (distinct) actors in collab_pairs
+        list_actors = list(dict.fromkeys(actor for collab_pair in collab_pairs_distinct for actor in collab_pair))
         dicts_actor_activity_per_ws = []
         for i, ws in enumerate(window_sizes):
+            actor_activity_tensor = list_f_extr[i].extract_actor_feature_tensor(["total_task_count"], list_actors)
             dict_actor_activity = {}
             for a in list_actors:
-                _, actor_activity = list_f_extr[i].apply_feature_extraction(["total_task_count"], actor=a)
+                _, actor_activity = actor_activity_tensor.get_subgroup_features(a)
                 dict_actor_activity[a] = actor_activity
             dicts_actor_activity_per_ws.append(dict_actor_activity)
 
@@ -268,7 +417,30 @@ class ConceptDriftDetection:
                     [df_all_collab_drift_points, df_all_collab_drift_points_old], ignore_index=False).dropna(
                     how='all').sort_index(axis=1)
 
-            for collab_pair in tqdm(collab_pairs_distinct):
+            # extract the handover features of all collab pairs (in both directions) in one pass
+            collab_feature_tensors = [f_extr.extract_collab_feature_tensor(feature_list, collab_pairs_distinct)
+                                      for f_extr in list_f_extr]
+
+            # the features of a collab pair (in both directions) and the activity of its actors per window size, the
+            # change points of the collab pairs are detected in parallel
+            collab_features = []
+            collab_activities = []
+            for collab_pair in collab_pairs_distinct:
+                collab_features.append([get_collab_features(collab_feature_tensor, collab_pair)
+                                        for collab_feature_tensor in collab_feature_tensors])
+                collab_activities.append([(dicts_actor_activity_per_ws[index][collab_pair[0]],
+                                           dicts_actor_activity_per_ws[index][collab_pair[1]])
+                                          for index in range(len(window_sizes))])
+            collab_change_point_settings = self.change_point_settings.get("collab", {})
+            collab_results = map_subgroups(detect_subgroup_change_points,
+                                           [([feature_vector for _, feature_vector in features], penalties,
+                                             collab_change_point_settings, activities)
+                                            for features, activities in zip(collab_features, collab_activities)],
+                                           workers=self.change_point_workers)
+            change_point_runtimes = []
+
+            for collab_pair, features, results in tqdm(zip(collab_pairs_distinct, collab_features, collab_results),
+                                                       total=len(collab_pairs_distinct)):
                 print(collab_pair)
 
                 # create analysis directory for actor to plot
@@ -276,7 +448,6 @@ class ConceptDriftDetection:
                                                                  f"{collab_pair[0]}_{collab_pair[1]}")
                 os.makedirs(collab_drift_feature_subdirectory, exist_ok=True)
 
-                collab_pair_reversed = collab_pair[::-1]
                 df_collab_drift_points = pd.DataFrame(index=[f"{collab_pair[0]}_{collab_pair[1]}"], columns=cp_settings)
                 if path.exists(
                         f"{collab_drift_feature_directory}\\{collab_pair[0]}_{collab_pair[1]}\\{collab_pair[0]}_{collab_pair[1]}_cps_{feature_set_name}.csv"):
@@ -287,34 +458,13 @@ class ConceptDriftDetection:
                         [df_collab_drift_points, df_collab_drift_points_old], ignore_index=False).dropna(
                         how='all').sort_index(axis=1)
 
-                dict_collab_cps = {}
                 for index, window_size in enumerate(window_sizes):
-                    actor_1_activity = dicts_actor_activity_per_ws[index][collab_pair[0]]
-                    actor_2_activity = dicts_actor_activity_per_ws[index][collab_pair[1]]
-
-                    # generate mv time series for specified features/collab_pair/window size
-                    collab_feature_names, collab_feature_vector = list_f_extr[index].apply_feature_extraction(
-                        feature_list, actor_1=collab_pair[0], actor_2=collab_pair[1])
-                    collab_feature_names = [f"dir1_{f_name}" for f_name in collab_feature_names]
-                    collab_reverse_feature_names, collab_reverse_feature_vector = list_f_extr[
-                        index].apply_feature_extraction(
-                        feature_list, actor_1=collab_pair_reversed[0], actor_2=collab_pair_reversed[1])
-                    collab_reverse_feature_names = [f"dir2_{f_name}" for f_name in collab_reverse_feature_names]
-                    collab_total_feature_vector = np.concatenate((collab_feature_vector, collab_reverse_feature_vector),
-                                                                 axis=1)
-                    collab_total_feature_vector_stripped, time_window_mapping, windows_inactive = \
-                        strip_inactive_windows_collab(collab_total_feature_vector, actor_1_activity, actor_2_activity)
-
-                    collab_all_feature_names = collab_feature_names + collab_reverse_feature_names
-                    reduced_collab_feature_vector = list_f_extr[index].pca_reduction(
-                        collab_total_feature_vector_stripped,
-                        'mle', normalize=True,
-                        normalize_function="max")
-                    for pen in penalties:
-                        # detect change points for specified penalty and write to dataframe
-                        cp = change_point_detection.rpt_pelt(reduced_collab_feature_vector, pen=pen)
-                        cp = retrieve_original_cps(cp, time_window_mapping)
-                        dict_collab_cps[pen] = cp
+                    collab_all_feature_names, collab_total_feature_vector = features[index]
+                    dict_collab_cps, windows_inactive, num_windows, runtime = results[index]
+                    change_point_runtimes.append((f"{collab_pair[0]}_{collab_pair[1]}", window_size, num_windows,
+                                                  runtime))
+                    for pen, cp in dict_collab_cps.items():
+                        # write the change points for specified penalty to dataframe
                         print(
                             f"Change points {collab_pair[0]}_{collab_pair[1]} {feature_set_name} (pen={pen}): {cp}")
                         df_all_collab_drift_points.loc[
@@ -332,3 +482,109 @@ class ConceptDriftDetection:
                 # df_collab_drift_points.to_csv(
                 #     f"{collab_drift_feature_directory}\\{collab_pair[0]}_{collab_pair[1]}\\{collab_pair[0]}_{collab_pair[1]}_cps_{feature_set_name}.csv")
             df_all_collab_drift_points.to_csv(f"{collab_drift_feature_directory}\\collab_cp_{feature_set_name}.csv")
+            write_change_point_runtimes(change_point_runtimes, collab_change_point_settings,
+                                        f"{collab_drift_feature_directory}\\cpd_runtimes_{feature_set_name}.csv")
+
+    def monitor_drift(self, window_size, process_feature_sets, actor_feature_sets, collab_feature_sets, min_actor_freq,
+                      min_collab_freq, exclude_cluster, detector_settings=None):
+        '''
+        Online counterpart of the drift detection: the process, actor and collab series are appended to a persisted
+        Bayesian online change point detector per series, new change points are printed and appended to
+        online_drift\\alerts.csv. The subgraphs are retrieved incrementally and only the windows that are new to a
+        detector are extracted. The last windows, which events appended to the graph can still change, are held back
+        until a later window exists.
+        args:
+            collab_feature_sets: handover feature sets of the collab pairs, the features are not normalized, such that
+              relative features suit the prior of the detector better than counts
+            detector_settings: keyword arguments of change_point_detection.BayesianOnlineChangePointDetector
+        '''
+        detector_settings = detector_settings or {}
+        actor_list = self.log_metadata.get_actor_list(min_freq=min_actor_freq)
+        collab_list = self.log_metadata.get_collab_list(min_freq=min_collab_freq)
+        collab_pairs_distinct = remove_duplicate_collab_pairs(collab_list)
+        online_drift_directory = os.path.join(self.output_directory, "online_drift")
+        graph_start_date, _ = self.log_metadata.get_log_bounds()
+
+        def get_graph_state(num_windows):
+            return {"graph_start_date": graph_start_date.isoformat(),
+                    "graph_fingerprint": self.log_metadata.get_graph_prefix_fingerprint(num_windows * window_size)}
+
+        # perspective: dict feature set name: series names
+        perspective_series_names = {
+            "process": {feature_set_name: ["process"] for feature_set_name in process_feature_sets},
+            "actor": {feature_set_name: actor_list for feature_set_name in actor_feature_sets},
+            "collab": {feature_set_name: [f"{collab_pair[0]}_{collab_pair[1]}" for collab_pair in collab_pairs_distinct]
+                       for feature_set_name in collab_feature_sets}}
+        # perspective: dict feature set name: (detector directory, dict series name: online change point detector)
+        perspective_detectors = {perspective: {} for perspective in perspective_series_names}
+        for perspective, feature_set_series_names in perspective_series_names.items():
+            for feature_set_name, series_names in feature_set_series_names.items():
+                detector_directory = os.path.join(online_drift_directory,
+                                                  f"{perspective}\\{feature_set_name}\\ws_{window_size}")
+                perspective_detectors[perspective][feature_set_name] = (detector_directory, {
+                    series_name: load_online_detector(os.path.join(detector_directory, f"{series_name}.npz"),
+                                                      detector_settings, get_graph_state)
+                    for series_name in series_names})
+        # only the windows that are new to a detector are extracted, the windows before are skipped
+        first_window = min((detector.num_windows for feature_set_detectors in perspective_detectors.values()
+                            for _, detectors in feature_set_detectors.values() for detector in detectors.values()),
+                           default=0)
+
+        all_features = [item for feature_sets in [process_feature_sets, actor_feature_sets, collab_feature_sets]
+                        for sublist in feature_sets.values() for item in sublist] + ["total_task_count"]
+        # the windows are retrieved incrementally, such that only the new windows are queried
+        subgraph_settings = {**self.subgraph_settings, "retrieval_mode": "per_window", "incremental": True,
+                             "skip_windows": first_window}
+        f_extr = get_feature_extractor_objects(db_connection=self.connection,
+                                               dataset_name=self.dataset_name, case=self.case,
+                                               resource=self.resource, feature_names=all_features,
+                                               window_sizes=[window_size], exclude_cluster=exclude_cluster,
+                                               subgraph_settings=subgraph_settings,
+                                               log_metadata=self.log_metadata)[0]
+        num_complete_windows = get_num_complete_windows(f_extr.num_days, window_size)
+
+        # perspective: dict feature set name: dict series name: (feature names, window x feature matrix, active windows)
+        perspective_series = {"process": {}, "actor": {}, "collab": {}}
+        for feature_set_name, feature_list in process_feature_sets.items():
+            feature_names, feature_vector = f_extr.apply_feature_extraction(feature_list)
+            perspective_series["process"][feature_set_name] = {
+                "process": (feature_names, feature_vector, np.ones(len(feature_vector), dtype=bool))}
+        for feature_set_name, feature_list in actor_feature_sets.items():
+            actor_feature_tensor = f_extr.extract_actor_feature_tensor(feature_list, actor_list)
+            perspective_series["actor"][feature_set_name] = {}
+            for actor in actor_list:
+                feature_names, feature_vector = actor_feature_tensor.get_subgroup_features(actor)
+                perspective_series["actor"][feature_set_name][actor] = (feature_names, feature_vector,
+                                                                        np.any(feature_vector != 0, axis=1))
+        list_actors = list(dict.fromkeys(actor for collab_pair in collab_pairs_distinct for actor in collab_pair))
+        actor_activity_tensor = f_extr.extract_actor_feature_tensor(["total_task_count"], list_actors)
+        actor_active_windows = {actor: np.any(actor_activity_tensor.get_subgroup_features(actor)[1] != 0, axis=1)
+                                for actor in list_actors}
+        for feature_set_name, feature_list in collab_feature_sets.items():
+            collab_feature_tensor = f_extr.extract_collab_feature_tensor(feature_list, collab_pairs_distinct)
+            perspective_series["collab"][feature_set_name] = {}
+            for collab_pair in collab_pairs_distinct:
+                # as in detect_collab_drift, windows in which either actor is inactive are not observed
+                perspective_series["collab"][feature_set_name][f"{collab_pair[0]}_{collab_pair[1]}"] = (
+                    *get_collab_features(collab_feature_tensor, collab_pair),
+                    actor_active_windows[collab_pair[0]] & actor_active_windows[collab_pair[1]])
+
+        alerts = []
+        for perspective, feature_set_series in perspective_series.items():
+            for feature_set_name, series in feature_set_series.items():
+                detector_directory, detectors = perspective_detectors[perspective][feature_set_name]
+                for series_name, window, change_point in update_online_detectors(series, detectors,
+                                                                                 num_complete_windows):
+                    change_point_date = graph_start_date + timedelta(days=change_point * window_size)
+                    print(f"Change point {perspective} {series_name} {feature_set_name} (window {window}): "
+                          f"{change_point} ({change_point_date})")
+                    alerts.append((perspective, feature_set_name, series_name, window_size, window, change_point,
+                                   change_point_date))
+                os.makedirs(detector_directory, exist_ok=True)
+                for series_name, detector in detectors.items():
+                    detector.graph_state = get_graph_state(detector.num_windows)
+                    detector.save(os.path.join(detector_directory, f"{series_name}.npz"))
+        df_alerts = pd.DataFrame(alerts, columns=["perspective", "feature_set", "subgroup", "window_size", "window",
+                                                  "change_point", "change_point_date"])
+        alerts_path = f"{online_drift_directory}\\alerts.csv"
+        df_alerts.to_csv(alerts_path, mode="a", header=not path.exists(alerts_path), index=False)
@@ -11,16 +11,22 @@ from promg.data_managers.semantic_header import ConstructedNodes
 
 from queries.task_cd_detection import ConceptDriftDetectionTasksQueryLibrary as ql
 from modules.task_concept_drift_detection.feature_extraction import FeatureExtraction
+from modules.task_concept_drift_detection.log_metadata import LogMetadata
 from modules.task_concept_drift_detection import change_point_detection
 from queries import query_result_parser as qp
 
 
 class ConceptDriftEvaluation:
-    def __init__(self, db_connection, semantic_header, dataset_name, resource: str, case: str):
+    def __init__(self, db_connection, semantic_header, dataset_name, resource: str, case: str,
+                 subgraph_settings: dict = None, log_metadata: LogMetadata = None):
         self.connection = db_connection
         self.dataset_name = dataset_name
+        # keyword arguments of FeatureExtraction.retrieve_subgraphs_for_feature_extraction, e.g. the retrieval mode
+        self.subgraph_settings = subgraph_settings or {}
         self.resource: ConstructedNodes = semantic_header.get_entity(resource)
         self.case: ConstructedNodes = semantic_header.get_entity(case)
+        # shared with the feature extractors, pass the log metadata of the run to read it once per run
+        self.log_metadata = log_metadata or LogMetadata(db_connection, self.case, self.resource)
 
         self.input_directory = f"output_final\\{dataset_name}\\task_concept_drift_detection"
         self.output_directory = f"output_final\\{dataset_name}\\task_concept_drift_evaluation"
@@ -88,8 +94,9 @@ class ConceptDriftEvaluation:
         all_features = [item for sublist in list(feature_sets.values()) for item in sublist]
 
         f_extr = FeatureExtraction(db_connection=self.connection, dataset_name=self.dataset_name, case=self.case,
-                                   actor=self.resource, exclude_cluster=exclude_cluster)
-        f_extr.retrieve_subgraphs_for_feature_extraction(window_size, all_features)
+                                   actor=self.resource, exclude_cluster=exclude_cluster,
+                                   log_metadata=self.log_metadata)
+        f_extr.retrieve_subgraphs_for_feature_extraction(window_size, all_features, **self.subgraph_settings)
 
         # create analysis directory for signal magnitude calculation
         signal_magnitude_directory = os.path.join(self.output_directory, "signal_magnitude")
@@ -165,8 +172,9 @@ class ConceptDriftEvaluation:
         all_features = [item for sublist in list(feature_sets.values()) for item in sublist]
 
         f_extr = FeatureExtraction(db_connection=self.connection, dataset_name=self.dataset_name, case=self.case,
-                                   actor=self.resource, exclude_cluster=exclude_cluster)
-        f_extr.retrieve_subgraphs_for_feature_extraction(window_size, all_features)
+                                   actor=self.resource, exclude_cluster=exclude_cluster,
+                                   log_metadata=self.log_metadata)
+        f_extr.retrieve_subgraphs_for_feature_extraction(window_size, all_features, **self.subgraph_settings)
 
         # create analysis directory for signal magnitude calculation
         signal_magnitude_directory = os.path.join(self.output_directory, "signal_magnitude")
@@ -241,14 +249,14 @@ class ConceptDriftEvaluation:
                 task_change = df_task_change_magnitudes.loc[f"task_{task}_relative_freq", (cp_dic_task[cp], "mean")]
                 task_change_direction = "rising" if task_change > 0 else "falling"
                 variant_list = qp.parse_to_list(self.connection.exec_query(ql.q_retrieve_variants_in_cluster, **{
-                    "aggregation_type": "cluster", "aggregation_id": f"\"{task}\""}), "variant")
+                    "aggregation_type": "cluster", "aggregation_id": str(task)}), "variant")
                 all_activity_df = qp.parse_to_2d_list(
                     self.connection.exec_query(ql.q_retrieve_activity_pairs_in_cluster, **{
-                        "aggregation_type": "cluster", "aggregation_id": f"\"{task}\"", "case": self.case, "resource": self.resource}),
+                        "aggregation_type": "cluster", "aggregation_id": str(task), "case": self.case, "resource": self.resource}),
                     "action1", "action2")
                 all_activity = qp.parse_to_list(
                     self.connection.exec_query(ql.q_retrieve_activities_in_cluster, **{
-                        "aggregation_type": "cluster", "aggregation_id": f"\"{task}\""}), "action")
+                        "aggregation_type": "cluster", "aggregation_id": str(task)}), "action")
                 act_same_direction = {}
                 act_opposite_direction = {}
                 for activity in all_activity:
@@ -1,26 +1,49 @@
-from datetime import timedelta
 from sklearn.decomposition import PCA
+from scipy import sparse
 import numpy as np
 import pandas as pd
-from os import path
+import hashlib
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from PerformanceRecorder import PerformanceRecorder
 
 from promg import DatabaseConnection
 from promg.data_managers.semantic_header import ConstructedNodes
 
-from queries.task_cd_detection import ConceptDriftDetectionTasksQueryLibrary as ql
+from modules.task_concept_drift_detection.log_metadata import LogMetadata
+from modules.task_concept_drift_detection.subgraph_cache import SubgraphCache, get_cache_key
+from queries.task_cd_detection import ConceptDriftDetectionTasksQueryLibrary as ql, get_window_subgraph_columns
 from queries import query_result_parser as qp
 
 
+# domain: subgraph columns that are dictionary-encoded with a shared vocabulary
+VOCABULARY_COLUMNS = {"actor": ["actor", "actor_1", "actor_2"],
+                      "case": ["case", "case_1", "case_2"],
+                      "task": ["task", "task_1", "task_2"],
+                      "task_variant": ["task_variant", "task_variant_1", "task_variant_2"],
+                      "activity": ["activity", "activity_1", "activity_2"],
+                      "entity_type": ["entity_type"]}
+
+
 class FeatureExtraction:
-    def __init__(self, db_connection, dataset_name: str, case: ConstructedNodes, actor: ConstructedNodes, exclude_cluster: str):
+    def __init__(self, db_connection, dataset_name: str, case: ConstructedNodes, actor: ConstructedNodes, exclude_cluster: str,
+                 log_metadata: LogMetadata = None):
         self.connection = db_connection
+        self.dataset_name = dataset_name
         self.intermediate_output_directory = f"output_intermediate\\{dataset_name}\\subgraphs\\"
+        self.subgraph_cache = SubgraphCache(self.intermediate_output_directory)
+        self.feature_matrix_directory = f"output_intermediate\\{dataset_name}\\features\\"
         self.case = case
         self.actor = actor
+        # shared between the feature extractors of a run, such that the log metadata is read once
+        self.log_metadata = log_metadata or LogMetadata(db_connection, case, actor)
         # TODO: retrieve event class from semantic header?
         os.makedirs(self.intermediate_output_directory, exist_ok=True)
+        os.makedirs(self.feature_matrix_directory, exist_ok=True)
+        self.num_days = None
         self.num_windows = None
         self.exclude_cluster = exclude_cluster
         self.task_subgraphs_nodes = []
@@ -28,6 +51,16 @@ class FeatureExtraction:
         self.event_subgraphs_nodes = []
         self.event_subgraphs_edges = []
         self.durations = []
+        self.aggregate_subgraphs = False
+        self.chunk_size = 10000
+        self.vocabulary = Vocabulary()
+        # incremental mode: cache keys of the window subgraphs and first window that was not loaded from the cache
+        self.incremental = False
+        self.skip_windows = 0
+        self.subgraph_cache_keys = []
+        self.first_changed_window = 0
+        # subgraph type: subgraph of the entire log with day offsets, only used for one-shot retrieval
+        self.base_subgraphs = {}
         self.task_node_based_features = ["distinct_task_count", "distinct_task_variant_count",
                                          "count_per_task", "count_per_task_variant",
                                          "count_per_task_relative", "count_per_task_variant_relative",
@@ -55,234 +88,608 @@ class FeatureExtraction:
                                           "count_per_activity_handover_case_relative",
                                           "count_per_activity_handover_case"]
         self.performance_features = ["average_case_duration", "case_throughput_speed", "case_throughput_velocity"]
+        # feature: (subgraphs, aggregation, node type, entity type), used to extract features for all subgroups at once
+        self.grouped_feature_definitions = {
+            "case_volume": ("task_nodes", "case_count", "case", ""),
+            "distinct_task_count": ("task_nodes", "distinct", "task", ""),
+            "total_task_count": ("task_nodes", "total", "task", ""),
+            "distinct_task_variant_count": ("task_nodes", "distinct", "task_variant", ""),
+            "count_per_task": ("task_nodes", "count", "task", ""),
+            "count_per_task_relative": ("task_nodes", "relative", "task", ""),
+            "count_per_task_variant": ("task_nodes", "count", "task_variant", ""),
+            "count_per_task_variant_relative": ("task_nodes", "relative", "task_variant", ""),
+            "distinct_task_handover_count_actor": ("task_edges", "distinct", "task", actor.type),
+            "distinct_task_variant_handover_count_actor": ("task_edges", "distinct", "task_variant", actor.type),
+            "total_task_handover_count_actor": ("task_edges", "total", "task", actor.type),
+            "count_per_task_handover_actor_relative": ("task_edges", "relative", "task", actor.type),
+            "count_per_task_handover_actor": ("task_edges", "count", "task", actor.type),
+            "count_per_task_variant_handover_actor_relative": ("task_edges", "relative", "task_variant", actor.type),
+            "count_per_task_variant_handover_actor": ("task_edges", "count", "task_variant", actor.type),
+            "distinct_task_handover_count_case": ("task_edges", "distinct", "task", case.type),
+            "distinct_task_variant_handover_count_case": ("task_edges", "distinct", "task_variant", case.type),
+            "total_task_handover_count_case": ("task_edges", "total", "task", case.type),
+            "count_per_task_handover_case_relative": ("task_edges", "relative", "task", case.type),
+            "count_per_task_handover_case": ("task_edges", "count", "task", case.type),
+            "count_per_task_variant_handover_case_relative": ("task_edges", "relative", "task_variant", case.type),
+            "count_per_task_variant_handover_case": ("task_edges", "count", "task_variant", case.type),
+            "distinct_activity_count": ("event_nodes", "distinct", "activity", ""),
+            "count_per_activity_relative": ("event_nodes", "relative", "activity", ""),
+            "count_per_activity": ("event_nodes", "count", "activity", ""),
+            "total_activity_count": ("event_nodes", "total", "activity", ""),
+            "distinct_activity_handover_count_actor": ("event_edges", "distinct", "activity", actor.type),
+            "count_per_activity_handover_actor_relative": ("event_edges", "relative", "activity", actor.type),
+            "count_per_activity_handover_actor": ("event_edges", "count", "activity", actor.type),
+            "distinct_activity_handover_count_case": ("event_edges", "distinct", "activity", case.type),
+            "count_per_activity_handover_case_relative": ("event_edges", "relative", "activity", case.type),
+            "count_per_activity_handover_case": ("event_edges", "count", "activity", case.type)}
         self.pr = PerformanceRecorder(dataset_name, 'extracting_features')
 
-    def retrieve_subgraphs_for_feature_extraction(self, window_size: int, feature_set=""):
-        graph_start_date = qp.parse_timestamp(self.connection.exec_query(ql.q_get_start_timestamp), 'start_time')
-        graph_end_date = qp.parse_timestamp(self.connection.exec_query(ql.q_get_end_timestamp), 'end_time')
+    def retrieve_subgraphs_for_feature_extraction(self, window_size: int, feature_set="", retrieval_mode="per_window",
+                                                  aggregate_subgraphs=False, retrieval_workers=1, chunk_size=10000,
+                                                  combine_window_queries=False, incremental=False, skip_windows=0):
+        '''
+        Retrieves the subgraphs per window that are needed to extract the feature set, subgraphs are cached per subgraph
+        type in a Parquet dataset keyed by a hash of the query and the graph fingerprint
+        retrieval_mode: "per_window" queries every subgraph type once per window, "one_shot" queries every subgraph
+          type once for the entire log and assigns the rows to the windows client-side. The case durations are always
+          retrieved once for the entire log (as case lifecycles) and binned into the windows
+        aggregate_subgraphs: if True, nodes and edges are counted per distinct combination of the required columns in
+          the database, such that a row with a "count" column is returned per combination instead of per node/edge
+        retrieval_workers: number of window queries that run in parallel in "per_window" mode
+        chunk_size: number of records that are fetched and parsed at a time, bounds the memory used for parsing
+        combine_window_queries: if True, the subgraph types that are not cached are retrieved with a single combined
+          query per window in "per_window" mode
+        incremental: if True, the cache is kept when events are appended to the graph and only the windows after the
+          last processed timestamp are retrieved in "per_window" mode, all windows are retrieved if the part of the graph
+          before the last processed timestamp has changed
+        skip_windows: in incremental mode, the cached subgraphs of the first skip_windows windows are not loaded and
+          are left empty, e.g. the windows that were already observed by the online change point detectors. The
+          feature matrices are not persisted then.
+        '''
+        self.aggregate_subgraphs = aggregate_subgraphs
+        self.chunk_size = chunk_size
+        self.incremental = incremental and retrieval_mode == "per_window"
+        self.skip_windows = skip_windows if self.incremental else 0
+        if self.connection.exec_query(ql.q_get_day_bucket) is None:
+            # without day buckets every window query returns an empty subgraph
+            raise RuntimeError("The task instances have no day buckets (start_day, end_day), run step_set_day_buckets")
+        graph_start_date, graph_end_date = self.log_metadata.get_log_bounds()
+        graph_fingerprint = self.log_metadata.get_graph_fingerprint()
 
         # Calculate the number of windows
-        self.num_windows = (graph_end_date - graph_start_date).days // window_size
-
-        for window in range(0, self.num_windows):
-
-            if any(feature in feature_set for feature in self.task_node_based_features) or feature_set == "":
-                if path.exists(f"{self.intermediate_output_directory}task_node_ws{window_size}_w{window}.pkl"):
-                    df_task_subgraphs_nodes = pd.read_pickle(
-                        f"{self.intermediate_output_directory}task_node_ws{window_size}_w{window}.pkl")
-                else:
-                    df_task_subgraphs_nodes = qp.parse_to_dataframe(
-                        self.connection.exec_query(ql.q_retrieve_task_subgraph_nodes, **{
-                            "start_date": (graph_start_date + timedelta(days=window * window_size)).strftime("%Y-%m-%d"),
-                            "end_date": (graph_start_date + timedelta(days=(window + 1) * window_size)).strftime("%Y-%m-%d"),
-                            "case": self.case, "resource": self.actor, "exclude_cluster": self.exclude_cluster}))
-                    df_task_subgraphs_nodes.to_pickle(
-                        f"{self.intermediate_output_directory}task_node_ws{window_size}_w{window}.pkl")
-                self.task_subgraphs_nodes.append(df_task_subgraphs_nodes)
-                self.pr.record_performance(f"extract_task_subgraphs_nodes_{window}/{self.num_windows}")
-
-            if any(feature in feature_set for feature in self.event_node_based_features) or feature_set == "":
-                if path.exists(f"{self.intermediate_output_directory}event_node_ws{window_size}_w{window}.pkl"):
-                    df_event_subgraphs_nodes = pd.read_pickle(
-                        f"{self.intermediate_output_directory}event_node_ws{window_size}_w{window}.pkl")
-                else:
-                    df_event_subgraphs_nodes = qp.parse_to_dataframe(
-                        self.connection.exec_query(ql.q_retrieve_event_subgraph_nodes, **{
-                            "start_date": (graph_start_date + timedelta(days=window * window_size)).strftime("%Y-%m-%d"),
-                            "end_date": (graph_start_date + timedelta(days=(window + 1) * window_size)).strftime("%Y-%m-%d"),
-                            "case": self.case, "resource": self.actor}))
-                    df_event_subgraphs_nodes.to_pickle(
-                        f"{self.intermediate_output_directory}event_node_ws{window_size}_w{window}.pkl")
-                self.event_subgraphs_nodes.append(df_event_subgraphs_nodes)
-                self.pr.record_performance(f"extract_event_subgraphs_nodes_{window}/{self.num_windows}")
-
-            if any(feature in feature_set for feature in self.task_edge_based_features) or feature_set == "":
-                if path.exists(f"{self.intermediate_output_directory}task_edge_ws{window_size}_w{window}.pkl"):
-                    df_task_subgraphs_edges = pd.read_pickle(
-                        f"{self.intermediate_output_directory}task_edge_ws{window_size}_w{window}.pkl")
-                else:
-                    df_task_subgraphs_edges = qp.parse_to_dataframe(
-                        self.connection.exec_query(ql.q_retrieve_task_subgraph_edges, **{
-                            "start_date": (graph_start_date + timedelta(days=window * window_size)).strftime("%Y-%m-%d"),
-                            "end_date": (graph_start_date + timedelta(days=(window + 1) * window_size)).strftime("%Y-%m-%d"),
-                            "case": self.case, "resource": self.actor, "exclude_cluster": self.exclude_cluster}))
-                    df_task_subgraphs_edges.to_pickle(
-                        f"{self.intermediate_output_directory}task_edge_ws{window_size}_w{window}.pkl")
-                self.task_subgraphs_edges.append(df_task_subgraphs_edges)
-                self.pr.record_performance(f"extract_task_subgraphs_edges_{window}/{self.num_windows}")
-
-            if any(feature in feature_set for feature in self.event_edge_based_features) or feature_set == "":
-                if path.exists(f"{self.intermediate_output_directory}event_edge_ws{window_size}_w{window}.pkl"):
-                    df_event_subgraphs_edges = pd.read_pickle(
-                        f"{self.intermediate_output_directory}event_edge_ws{window_size}_w{window}.pkl")
-                else:
-                    df_event_subgraphs_edges = qp.parse_to_dataframe(
-                        self.connection.exec_query(ql.q_retrieve_event_subgraph_edges, **{
-                            "start_date": (graph_start_date + timedelta(days=window * window_size)).strftime("%Y-%m-%d"),
-                            "end_date": (graph_start_date + timedelta(days=(window + 1) * window_size)).strftime("%Y-%m-%d"),
-                            "case": self.case, "resource": self.actor}))
-                    df_event_subgraphs_edges.to_pickle(
-                        f"{self.intermediate_output_directory}event_edge_ws{window_size}_w{window}.pkl")
-                self.event_subgraphs_edges.append(df_event_subgraphs_edges)
-                self.pr.record_performance(f"extract_event_subgraphs_edges_{window}/{self.num_windows}")
-
-            if any(feature in feature_set for feature in self.performance_features) or feature_set == "":
-                if path.exists(f"{self.intermediate_output_directory}durations_ws{window_size}_w{window}.pkl"):
-                    df_global = pd.read_pickle(
-                        f"{self.intermediate_output_directory}durations_ws{window_size}_w{window}.pkl")
-                else:
-                    df_global = qp.parse_to_dataframe(
-                        self.connection.exec_query(ql.q_retrieve_case_durations, **{
-                            "start_date": (graph_start_date + timedelta(days=window * window_size)).strftime("%Y-%m-%d"),
-                            "end_date": (graph_start_date + timedelta(days=(window + 1) * window_size)).strftime("%Y-%m-%d"),
-                            "case": self.case}), timedelta_cols={'duration': 'minutes'})
-                    df_global.to_pickle(
-                        f"{self.intermediate_output_directory}durations_ws{window_size}_w{window}.pkl")
-                self.durations.append(df_global)
-
-    def apply_feature_extraction(self, features, actor="", actor_1="", actor_2=""):
+        self.num_days = (graph_end_date - graph_start_date).days
+        self.num_windows = self.num_days // window_size
+
+        if retrieval_mode == "one_shot":
+            self.retrieve_subgraphs_one_shot(window_size, feature_set, graph_start_date, graph_fingerprint)
+            return
+
+        # the watermark stored with the cached windows, used to find the windows to retrieve in incremental mode: the
+        # windows before prefix_windows are complete, the part of the graph they are retrieved from is fingerprinted
+        watermark = {"end_date": graph_end_date.isoformat(), "num_windows": self.num_windows}
+        if self.incremental:
+            prefix_windows = get_num_complete_windows(self.num_days, window_size)
+            prefix_fingerprint = self.log_metadata.get_graph_prefix_fingerprint(prefix_windows * window_size)
+            watermark.update(prefix_windows=prefix_windows, prefix_fingerprint=prefix_fingerprint)
+        self.first_changed_window = self.num_windows
+        self.subgraph_cache_keys = []
+        # subgraph type: (per-window subgraphs, window query, query parameters, cache key, first window to retrieve)
+        combined_subgraph_types = {}
+        for subgraph_type, (features, subgraphs, window_query, query, parameters, timedelta_cols) in \
+                self.get_subgraph_types(feature_set).items():
+            if not (any(feature in feature_set for feature in features) or feature_set == ""):
+                continue
+            if window_query is None:
+                df_subgraph = self.retrieve_base_subgraph(subgraph_type, query, parameters, timedelta_cols,
+                                                          graph_start_date, graph_fingerprint)
+                subgraphs.extend(split_subgraph(subgraph_type, df_subgraph, window_size, self.num_windows))
+                self.pr.record_performance(f"extract_{subgraph_type}_subgraphs_{self.num_windows}")
+                continue
+            # in incremental mode the cache is not invalidated by a change of the graph
+            cache_key = get_cache_key(window_query(start_day="$start_day", end_day="$end_day", **parameters),
+                                      graph_start_date.strftime("%Y-%m-%d"), window_size,
+                                      "" if self.incremental else graph_fingerprint)
+            self.subgraph_cache_keys.append(cache_key)
+            first_window = self.get_first_window_to_retrieve(subgraph_type, cache_key, window_size)
+            self.first_changed_window = min(self.first_changed_window, first_window)
+            # only cached windows are skipped, the windows that are retrieved are stored in the cache
+            num_skipped_windows = min(self.skip_windows, first_window)
+            subgraphs.extend(pd.DataFrame() for _ in range(num_skipped_windows))
+            if first_window > num_skipped_windows:
+                subgraphs.extend(self.subgraph_cache.load_windows(subgraph_type, cache_key, first_window,
+                                                                  windows=list(range(num_skipped_windows,
+                                                                                     first_window))))
+                self.pr.record_performance(f"load_{subgraph_type}_subgraphs_{first_window}")
+            if first_window == self.num_windows:
+                continue
+            if combine_window_queries:
+                combined_subgraph_types[subgraph_type] = (subgraphs, window_query, parameters, cache_key,
+                                                          first_window)
+                continue
+            retrieve_window = partial(self.retrieve_window_subgraph, window_query, window_size, parameters,
+                                      timedelta_cols)
+            for window, df_window_subgraph in enumerate(self.retrieve_windows(retrieve_window, retrieval_workers,
+                                                                              first_window), start=first_window):
+                subgraphs.append(df_window_subgraph)
+                self.pr.record_performance(f"extract_{subgraph_type}_subgraphs_{window}/{self.num_windows}")
+            # aligned to the same categories first, such that the windows are stored as one categorical column
+            self.subgraph_cache.store_windows(subgraph_type, cache_key, self.encode_subgraphs(subgraphs[first_window:]),
+                                              watermark, first_window)
+        if combined_subgraph_types:
+            self.retrieve_subgraphs_combined(combined_subgraph_types, window_size, retrieval_workers, watermark)
+        # the subgraphs were encoded while they were parsed, only their categories are aligned to the final vocabulary
+        for _, subgraphs, _, _, _, _ in self.get_subgraph_types().values():
+            self.encode_subgraphs(subgraphs)
+
+    def retrieve_subgraphs_combined(self, subgraph_types, window_size, retrieval_workers=1, watermark=None):
+        '''
+        Retrieves the subgraphs of several subgraph types with a single combined query per window, instead of one query
+        per subgraph type per window, and caches them per subgraph type
+        args:
+            subgraph_types: dict subgraph type: (per-window subgraphs, query retrieving the subgraphs of a window, query
+              parameters, cache key, first window to retrieve)
+        '''
+        first_window = min(subgraph_type[4] for subgraph_type in subgraph_types.values())
+        subgraph_queries = {subgraph_type: (window_query, parameters)
+                            for subgraph_type, (_, window_query, parameters, _, _) in subgraph_types.items()}
+        retrieve_window = partial(self.retrieve_window_subgraphs_combined, subgraph_queries, window_size)
+        for window, window_results in enumerate(self.retrieve_windows(retrieve_window, retrieval_workers,
+                                                                      first_window), start=first_window):
+            for subgraph_type, (subgraphs, _, _, _, type_first_window) in subgraph_types.items():
+                # windows before the first window of the subgraph type were already loaded from the cache
+                if window >= type_first_window:
+                    subgraphs.append(window_results.get(subgraph_type, pd.DataFrame()))
+            self.pr.record_performance(f"extract_combined_subgraphs_{window}/{self.num_windows}")
+        for subgraph_type, (subgraphs, _, _, cache_key, type_first_window) in subgraph_types.items():
+            self.subgraph_cache.store_windows(subgraph_type, cache_key,
+                                              self.encode_subgraphs(subgraphs[type_first_window:]), watermark,
+                                              type_first_window)
+
+    def encode_subgraphs(self, subgraphs):
+        '''
+        Encodes the subgraphs (in place) against the current vocabulary
+        returns:
+            the subgraphs
+        '''
+        for df_subgraph in subgraphs:
+            self.vocabulary.encode(df_subgraph)
+        return subgraphs
+
+    def get_first_window_to_retrieve(self, subgraph_type, cache_key, window_size):
+        '''
+        In incremental mode, the windows that end before the last processed date are complete and are loaded from the
+        cache, the window containing the last processed date and later windows are new or dirty. The complete windows
+        are only reused if the part of the graph they were retrieved from has the same fingerprint, e.g. not if the
+        graph was rebuilt or events before the last processed date were added.
+        returns:
+            first window that is not (or not completely) cached
+        '''
+        if not self.subgraph_cache.contains(subgraph_type, cache_key):
+            return 0
+        if not self.incremental:
+            return self.num_windows
+        watermark = self.subgraph_cache.load_watermark(subgraph_type, cache_key)
+        if watermark is None or "prefix_fingerprint" not in watermark:
+            return 0
+        if watermark["prefix_fingerprint"] != \
+                self.log_metadata.get_graph_prefix_fingerprint(watermark["prefix_windows"] * window_size):
+            return 0
+        return min(watermark["prefix_windows"], self.num_windows)
+
+    def retrieve_window_subgraph(self, window_query, window_size, parameters, timedelta_cols, window):
+        return qp.parse_stream_to_dataframe(self.connection, window_query, chunk_size=self.chunk_size,
+                                            timedelta_cols=timedelta_cols, vocabulary=self.vocabulary, **{
+                                                "start_day": window * window_size,
+                                                "end_day": (window + 1) * window_size,
+                                                **parameters})
+
+    def retrieve_window_subgraphs_combined(self, subgraph_queries, window_size, window):
+        '''
+        returns:
+            dict subgraph type: subgraph of the window, subgraph types without rows are left out
+        '''
+        return qp.parse_stream_to_dataframes(self.connection, ql.q_retrieve_window_subgraphs, "subgraph_type",
+                                             get_window_subgraph_columns(subgraph_queries),
+                                             chunk_size=self.chunk_size, vocabulary=self.vocabulary, **{
+                                                 "start_day": window * window_size,
+                                                 "end_day": (window + 1) * window_size,
+                                                 "subgraph_queries": subgraph_queries})
+
+    def retrieve_windows(self, retrieve_window, retrieval_workers=1, first_window=0):
+        '''
+        Retrieves every window from first_window on with retrieve_window(window), up to retrieval_workers windows are
+        retrieved in parallel. The driver is thread safe and every query runs in its own session from the connection
+        pool of the driver. Windows are only submitted while at most 2 * retrieval_workers windows are being retrieved
+        or waiting to be consumed, such that the results of all windows are never buffered at once.
+        returns:
+            generator of the results per window, in window order
+        '''
+        if retrieval_workers <= 1:
+            yield from map(retrieve_window, range(first_window, self.num_windows))
+            return
+        with ThreadPoolExecutor(max_workers=retrieval_workers) as executor:
+            pending_windows = deque()
+            for window in range(first_window, self.num_windows):
+                pending_windows.append(executor.submit(retrieve_window, window))
+                if len(pending_windows) >= 2 * retrieval_workers:
+                    yield pending_windows.popleft().result()
+            while pending_windows:
+                yield pending_windows.popleft().result()
+
+    def get_subgraph_types(self, feature_set=""):
+        '''
+        args:
+            feature_set: feature set to retrieve the subgraphs for, the node and edge queries only return the columns
+              needed for the feature set
+        returns:
+            dict subgraph type: (features based on the subgraph type, per-window subgraphs, query retrieving the
+            subgraphs of a window (None if always retrieved for the entire log), query retrieving the subgraphs of the
+            entire log, query parameters, timedelta columns)
+        '''
+        required_columns = self.get_required_columns(feature_set)
+        return {
+            "task_node": (self.task_node_based_features, self.task_subgraphs_nodes,
+                          ql.q_retrieve_task_subgraph_nodes, ql.q_retrieve_all_task_subgraph_nodes,
+                          {"case": self.case, "resource": self.actor, "exclude_cluster": self.exclude_cluster,
+                           "columns": required_columns["task_node"],
+                           "aggregate": self.aggregate_subgraphs}, None),
+            "event_node": (self.event_node_based_features, self.event_subgraphs_nodes,
+                           ql.q_retrieve_event_subgraph_nodes, ql.q_retrieve_all_event_subgraph_nodes,
+                           {"case": self.case, "resource": self.actor, "columns": required_columns["event_node"],
+                            "aggregate": self.aggregate_subgraphs}, None),
+            "task_edge": (self.task_edge_based_features, self.task_subgraphs_edges,
+                          ql.q_retrieve_task_subgraph_edges, ql.q_retrieve_all_task_subgraph_edges,
+                          {"case": self.case, "resource": self.actor, "exclude_cluster": self.exclude_cluster,
+                           "columns": required_columns["task_edge"],
+                           "aggregate": self.aggregate_subgraphs}, None),
+            "event_edge": (self.event_edge_based_features, self.event_subgraphs_edges,
+                           ql.q_retrieve_event_subgraph_edges, ql.q_retrieve_all_event_subgraph_edges,
+                           {"case": self.case, "resource": self.actor, "columns": required_columns["event_edge"],
+                            "aggregate": self.aggregate_subgraphs}, None),
+            "durations": (self.performance_features, self.durations, None, ql.q_retrieve_case_lifecycles,
+                          {"case": self.case}, {'duration': 'days'})}
+
+    def get_required_columns(self, feature_set=""):
+        '''
+        Derives the subgraph columns needed for the feature set from the feature definitions. The actor columns are
+        always included, as they are needed to extract the features per actor or collaboration.
+        returns:
+            dict subgraph type: list of columns
+        '''
+        features = feature_set if feature_set != "" else list(self.grouped_feature_definitions)
+        required_columns = {"task_node": ["actor"], "event_node": ["actor"],
+                            "task_edge": ["actor_1", "actor_2"], "event_edge": ["actor_1", "actor_2"]}
+        for feature in features:
+            if feature not in self.grouped_feature_definitions:
+                continue
+            kind, aggregation, node_type, entity_type = self.grouped_feature_definitions[feature]
+            columns = required_columns[kind[:-1]]
+            if aggregation == "case_count":
+                columns.append("case")
+            elif aggregation != "total":
+                columns.extend([f"{node_type}_1", f"{node_type}_2"] if kind.endswith("edges") else [node_type])
+            if entity_type != "":
+                columns.append("entity_type")
+        return {subgraph_type: list(dict.fromkeys(columns)) for subgraph_type, columns in required_columns.items()}
+
+    def retrieve_subgraphs_one_shot(self, window_size, feature_set, graph_start_date, graph_fingerprint):
+        '''
+        Retrieves every subgraph type needed for the feature set with a single query for the entire log, instead of one
+        query per window, and splits the result into the per-window subgraphs. The subgraphs of the entire log are
+        cached and kept as base subgraphs, from which the subgraphs of any other window size can be derived.
+        '''
+        for subgraph_type, (features, _, _, query, parameters, timedelta_cols) in \
+                self.get_subgraph_types(feature_set).items():
+            if not (any(feature in feature_set for feature in features) or feature_set == ""):
+                continue
+            self.base_subgraphs[subgraph_type] = self.retrieve_base_subgraph(subgraph_type, query, parameters,
+                                                                             timedelta_cols, graph_start_date,
+                                                                             graph_fingerprint)
+            self.pr.record_performance(f"extract_{subgraph_type}_subgraphs_one_shot")
+        # aligned before splitting, such that the subgraphs of all window sizes share the vocabulary
+        self.encode_subgraphs(self.base_subgraphs.values())
+        self.split_base_subgraphs(window_size)
+
+    def retrieve_base_subgraph(self, subgraph_type, query, parameters, timedelta_cols, graph_start_date,
+                               graph_fingerprint):
+        '''
+        returns:
+            subgraph of the entire log with day offsets, from the cache if it was retrieved before
+        '''
+        cache_key = get_cache_key(query(**parameters), graph_start_date.strftime("%Y-%m-%d"), graph_fingerprint)
+        if self.subgraph_cache.contains(f"{subgraph_type}_all", cache_key):
+            return self.vocabulary.encode(self.subgraph_cache.load(f"{subgraph_type}_all", cache_key))
+        df_subgraph = qp.parse_stream_to_dataframe(self.connection, query, chunk_size=self.chunk_size,
+                                                   timedelta_cols=timedelta_cols, vocabulary=self.vocabulary,
+                                                   **parameters)
+        self.subgraph_cache.store(f"{subgraph_type}_all", cache_key, df_subgraph)
+        return df_subgraph
+
+    def split_base_subgraphs(self, window_size):
+        self.num_windows = self.num_days // window_size
+        subgraph_types = self.get_subgraph_types()
+        for subgraph_type, df_subgraph in self.base_subgraphs.items():
+            subgraph_types[subgraph_type][1].extend(split_subgraph(subgraph_type, df_subgraph, window_size,
+                                                                   self.num_windows))
+        self.pr.record_performance(f"split_base_subgraphs_ws{window_size}_{self.num_windows}")
+
+    def derive_window_size(self, window_size):
+        '''
+        Derives a feature extractor for another window size from the base subgraphs of this feature extractor, without
+        querying the database again (requires the subgraphs to be retrieved one-shot)
+        returns:
+            FeatureExtraction object with the subgraphs of the given window size
+        '''
+        f_extr = FeatureExtraction(db_connection=self.connection, dataset_name=self.dataset_name, case=self.case,
+                                   actor=self.actor, exclude_cluster=self.exclude_cluster, log_metadata=self.log_metadata)
+        f_extr.num_days = self.num_days
+        f_extr.aggregate_subgraphs = self.aggregate_subgraphs
+        f_extr.base_subgraphs = self.base_subgraphs
+        f_extr.vocabulary = self.vocabulary
+        f_extr.split_base_subgraphs(window_size)
+        return f_extr
+
+    def apply_feature_extraction(self, features, actor="", actor_1="", actor_2="", return_sparse=False):
         '''
         Adapted from Adams et al. (2021) https://github.com/niklasadams/explainable_concept_drift_pm
+        returns:
+            sorted feature names, window x feature matrix (scipy.sparse CSR matrix if return_sparse, else dense)
         '''
-        feature_vectors = [[] for i in range(0, self.num_windows)]
+        # in incremental mode, the feature matrix is persisted and only the rows of the new or dirty windows are
+        # extracted, performance features depend on the case lifecycles of the entire log and are always re-extracted
+        first_window = 0
+        stored_feature_matrix = None
+        # the feature matrix of skipped windows is incomplete and is not persisted
+        persist_feature_matrix = self.incremental and self.skip_windows == 0
+        if persist_feature_matrix:
+            feature_matrix_key = hashlib.sha1(repr((self.subgraph_cache_keys, list(features), actor, actor_1,
+                                                    actor_2)).encode()).hexdigest()[:16]
+            feature_matrix_path = f"{self.feature_matrix_directory}{feature_matrix_key}.npz"
+            if os.path.exists(feature_matrix_path) and \
+                    not any(feature in self.performance_features for feature in features):
+                stored_feature_matrix = load_feature_matrix(feature_matrix_path)
+                first_window = min(self.first_changed_window, stored_feature_matrix[1].shape[0])
+        task_subgraphs_nodes = self.task_subgraphs_nodes[first_window:]
+        task_subgraphs_edges = self.task_subgraphs_edges[first_window:]
+        event_subgraphs_nodes = self.event_subgraphs_nodes[first_window:]
+        event_subgraphs_edges = self.event_subgraphs_edges[first_window:]
+        durations = self.durations[first_window:]
+
+        feature_vectors = [[] for i in range(first_window, self.num_windows)]
         for feature in features:
             results = []
             # task node based features
             if feature == "case_volume":
-                results = extract_number_of_cases(self.task_subgraphs_nodes, actor)
+                results = extract_number_of_cases(task_subgraphs_nodes, actor)
             if feature == "distinct_task_count":
-                results = extract_distinct_performance_instance_count(self.task_subgraphs_nodes, 'task', actor)
+                results = extract_distinct_performance_instance_count(task_subgraphs_nodes, 'task', actor)
             if feature == "total_task_count":
-                results = extract_total_performance_instance_count(self.task_subgraphs_nodes, 'task', actor)
+                results = extract_total_performance_instance_count(task_subgraphs_nodes, 'task', actor)
             if feature == "distinct_task_variant_count":
-                results = extract_distinct_performance_instance_count(self.task_subgraphs_nodes, 'task_variant', actor)
+                results = extract_distinct_performance_instance_count(task_subgraphs_nodes, 'task_variant', actor)
             if feature == "count_per_task":
-                results = extract_count_per_performance_instance(self.task_subgraphs_nodes, 'task', actor)
+                results = extract_count_per_performance_instance(task_subgraphs_nodes, 'task', actor)
             if feature == "count_per_task_relative":
-                results = extract_count_per_performance_instance_normalized(self.task_subgraphs_nodes, 'task', actor)
+                results = extract_count_per_performance_instance_normalized(task_subgraphs_nodes, 'task', actor)
             if feature == "count_per_task_variant":
-                results = extract_count_per_performance_instance(self.task_subgraphs_nodes, 'task_variant', actor)
+                results = extract_count_per_performance_instance(task_subgraphs_nodes, 'task_variant', actor)
             if feature == "count_per_task_variant_relative":
-                results = extract_count_per_performance_instance_normalized(self.task_subgraphs_nodes, 'task_variant',
+                results = extract_count_per_performance_instance_normalized(task_subgraphs_nodes, 'task_variant',
                                                                             actor)
 
             # task edge based features -- actor
             if feature == "distinct_task_handover_count_actor":
-                results = extract_distinct_handover_count(self.task_subgraphs_edges, 'task', actor_1, actor_2,
+                results = extract_distinct_handover_count(task_subgraphs_edges, 'task', actor_1, actor_2,
                                                           self.actor.type)
             if feature == "distinct_task_variant_handover_count_actor":
-                results = extract_distinct_handover_count(self.task_subgraphs_edges, 'task_variant', actor_1,
+                results = extract_distinct_handover_count(task_subgraphs_edges, 'task_variant', actor_1,
                                                           actor_2, self.actor.type)
             if feature == "total_task_handover_count_actor":
-                results = extract_total_handover_count(self.task_subgraphs_edges, 'task', actor_1, actor_2, self.actor.type)
+                results = extract_total_handover_count(task_subgraphs_edges, 'task', actor_1, actor_2, self.actor.type)
 
             if feature == "count_per_task_handover_actor_relative":
-                results = extract_count_per_handover_normalized(self.task_subgraphs_edges, 'task', actor_1, actor_2,
+                results = extract_count_per_handover_normalized(task_subgraphs_edges, 'task', actor_1, actor_2,
                                                                 self.actor.type)
             if feature == "count_per_task_handover_actor":
-                results = extract_count_per_handover(self.task_subgraphs_edges, 'task', actor_1, actor_2, self.actor.type)
+                results = extract_count_per_handover(task_subgraphs_edges, 'task', actor_1, actor_2, self.actor.type)
             if feature == "count_per_task_variant_handover_actor_relative":
-                results = extract_count_per_handover_normalized(self.task_subgraphs_edges, 'task_variant', actor_1,
+                results = extract_count_per_handover_normalized(task_subgraphs_edges, 'task_variant', actor_1,
                                                                 actor_2, self.actor.type)
             if feature == "count_per_task_variant_handover_actor":
-                results = extract_count_per_handover(self.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                results = extract_count_per_handover(task_subgraphs_edges, 'task_variant', actor_1, actor_2,
                                                      self.actor.type)
 
             # task edge based features -- case
             if feature == "distinct_task_handover_count_case":
-                results = extract_distinct_handover_count(self.task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
+                results = extract_distinct_handover_count(task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
             if feature == "distinct_task_variant_handover_count_case":
-                results = extract_distinct_handover_count(self.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                results = extract_distinct_handover_count(task_subgraphs_edges, 'task_variant', actor_1, actor_2,
                                                           self.case.type)
             if feature == "total_task_handover_count_case":
-                results = extract_total_handover_count(self.task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
+                results = extract_total_handover_count(task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
             if feature == "count_per_task_handover_case_relative":
-                results = extract_count_per_handover_normalized(self.task_subgraphs_edges, 'task', actor_1, actor_2,
+                results = extract_count_per_handover_normalized(task_subgraphs_edges, 'task', actor_1, actor_2,
                                                                 self.case.type)
             if feature == "count_per_task_handover_case":
-                results = extract_count_per_handover(self.task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
+                results = extract_count_per_handover(task_subgraphs_edges, 'task', actor_1, actor_2, self.case.type)
             if feature == "count_per_task_variant_handover_case_relative":
-                results = extract_count_per_handover_normalized(self.task_subgraphs_edges, 'task_variant', actor_1,
+                results = extract_count_per_handover_normalized(task_subgraphs_edges, 'task_variant', actor_1,
                                                                 actor_2, self.case.type)
             if feature == "count_per_task_variant_handover_case":
-                results = extract_count_per_handover(self.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                results = extract_count_per_handover(task_subgraphs_edges, 'task_variant', actor_1, actor_2,
                                                      self.case.type)
 
             # event node based features
             if feature == "distinct_activity_count":
-                results = extract_distinct_performance_instance_count(self.event_subgraphs_nodes, 'activity',
+                results = extract_distinct_performance_instance_count(event_subgraphs_nodes, 'activity',
                                                                       actor)
             if feature == "count_per_activity_relative":
-                results = extract_count_per_performance_instance_normalized(self.event_subgraphs_nodes,
+                results = extract_count_per_performance_instance_normalized(event_subgraphs_nodes,
                                                                             'activity', actor)
             if feature == "count_per_activity":
-                results = extract_count_per_performance_instance(self.event_subgraphs_nodes, 'activity',
+                results = extract_count_per_performance_instance(event_subgraphs_nodes, 'activity',
                                                                  actor)
             if feature == "total_activity_count":
-                results = extract_total_performance_instance_count(self.event_subgraphs_nodes, 'activity',
+                results = extract_total_performance_instance_count(event_subgraphs_nodes, 'activity',
                                                                    actor)
 
             # event edge based features -- actor
             if feature == "distinct_activity_handover_count_actor":
-                results = extract_distinct_handover_count(self.event_subgraphs_edges, 'activity', actor_1,
+                results = extract_distinct_handover_count(event_subgraphs_edges, 'activity', actor_1,
                                                           actor_2, self.actor.type)
             if feature == "count_per_activity_handover_actor_relative":
-                results = extract_count_per_handover_normalized(self.event_subgraphs_edges, 'activity',
+                results = extract_count_per_handover_normalized(event_subgraphs_edges, 'activity',
                                                                 actor_1, actor_2, self.actor.type)
             if feature == "count_per_activity_handover_actor":
-                results = extract_count_per_handover(self.event_subgraphs_edges, 'activity',
+                results = extract_count_per_handover(event_subgraphs_edges, 'activity',
                                                      actor_1, actor_2, self.actor.type)
             # event edge based features -- case
             if feature == "distinct_activity_handover_count_case":
-                results = extract_distinct_handover_count(self.event_subgraphs_edges, 'activity', actor_1,
+                results = extract_distinct_handover_count(event_subgraphs_edges, 'activity', actor_1,
                                                           actor_2, self.case.type)
             if feature == "count_per_activity_handover_case_relative":
-                results = extract_count_per_handover_normalized(self.event_subgraphs_edges, 'activity',
+                results = extract_count_per_handover_normalized(event_subgraphs_edges, 'activity',
                                                                 actor_1, actor_2, self.case.type)
             if feature == "count_per_activity_handover_case":
-                results = extract_count_per_handover(self.event_subgraphs_edges, 'activity',
+                results = extract_count_per_handover(event_subgraphs_edges, 'activity',
                                                      actor_1, actor_2, self.case.type)
 
             # global features
             if feature == "average_case_duration":
-                results = extract_average_case_duration(self.durations)
+                results = extract_average_case_duration(durations)
             if feature == "case_throughput_speed":
-                results = extract_case_throughput_speed(self.durations)
+                results = extract_case_throughput_speed(durations)
             if feature == "case_throughput_velocity":
-                results = extract_case_throughput_velocity(self.durations)
+                results = extract_case_throughput_velocity(durations)
 
             # more feature
             for i in range(0, len(results)):
                 for result in results[i]:
                     feature_vectors[i].append(result)
-        # set non existent features to zero
-        feature_names__ = []
-        for window in range(0, self.num_windows):
-            for feature in range(0, len(feature_vectors[window])):
-                feature_names__.append(feature_vectors[window][feature][0])
-
-        feature_names = list(set(feature_names__))
-
-        feature_lists = []
-        for feature_name in range(0, len(feature_names)):
-            feature_list = []
-            for window in range(0, self.num_windows):
-                existing_features = [i[0] for i in feature_vectors[window]]
-                if feature_names[feature_name] in existing_features:
-                    # find index
-                    idx = existing_features.index(feature_names[feature_name])
-                    feature_list.append(feature_vectors[window][idx][1])
-                else:
-                    feature_list.append(0)
-            feature_lists.append(feature_list)
+        # assemble the sparse window x feature matrix through a feature name -> column dictionary, with the columns
+        # in sorted order of the feature names; features that do not exist in a window are zero
+        feature_names = sorted({result[0] for window_results in feature_vectors for result in window_results})
+        feature_columns = {feature_name: column for column, feature_name in enumerate(feature_names)}
+        rows, columns, values = [], [], []
+        for window, window_results in enumerate(feature_vectors):
+            window_columns = set()
+            for feature_name, value in window_results:
+                # if multiple features produce the same feature name, the first value is kept
+                if feature_columns[feature_name] not in window_columns:
+                    window_columns.add(feature_columns[feature_name])
+                    rows.append(window)
+                    columns.append(feature_columns[feature_name])
+                    values.append(value)
+        feature_matrix = sparse.coo_matrix((np.asarray(values), (rows, columns)),
+                                           shape=(len(feature_vectors), len(feature_names))).tocsr()
+        if stored_feature_matrix is not None:
+            feature_names, feature_matrix = stack_feature_matrices(*stored_feature_matrix, first_window,
+                                                                   feature_names, feature_matrix)
+        if persist_feature_matrix:
+            save_feature_matrix(feature_matrix_path, feature_names, feature_matrix)
 
         # self.pr.record_performance(f"apply_extraction_{self.num_windows}")
         self.pr.record_total_performance()
         self.pr.save_to_file()
 
-        return feature_names, np.asarray(feature_lists).transpose()
+        if return_sparse:
+            return feature_names, feature_matrix
+        return feature_names, feature_matrix.toarray()
 
-    def pca_reduction(self, features_np, dimensions, normalize=False, normalize_function='max'):
+    def extract_actor_feature_tensor(self, features, actors):
+        '''
+        Extracts the features of all actors in a single grouped pass over the subgraphs, instead of filtering all
+        subgraphs once per actor. The slice of an actor equals apply_feature_extraction(features, actor=actor,
+        actor_1=actor, actor_2=actor), with the features in sorted order.
+        returns:
+            SubgroupFeatureTensor with the actors as subgroups
+        '''
+        actor_index = {actor: i for i, actor in enumerate(actors)}
+
+        def map_nodes_to_actors(df_nodes):
+            return df_nodes['actor'].map(actor_index)
+
+        def map_edges_to_actors(df_edges):
+            return df_edges['actor_1'].map(actor_index).where(df_edges['actor_1'] == df_edges['actor_2'])
+
+        return self.extract_subgroup_feature_tensor(features, actors, map_nodes_to_actors, map_edges_to_actors)
+
+    def extract_collab_feature_tensor(self, features, collab_pairs):
+        '''
+        Extracts the handover features of all collaboration pairs in a single grouped pass over the edge subgraphs.
+        Both directions of a pair are subgroups, the slice of (actor_1, actor_2) equals
+        apply_feature_extraction(features, actor_1=actor_1, actor_2=actor_2). Node-based features are not specific to a
+        collaboration, the activity of the individual actors is extracted with extract_actor_feature_tensor.
+        returns:
+            SubgroupFeatureTensor with the directed (actor_1, actor_2) pairs as subgroups
+        '''
+        directed_pairs = list(dict.fromkeys(directed_pair for collab_pair in collab_pairs
+                                            for directed_pair in [tuple(collab_pair), tuple(collab_pair[::-1])]))
+        pair_index = pd.MultiIndex.from_arrays([[pair[0] for pair in directed_pairs],
+                                                [pair[1] for pair in directed_pairs]])
+
+        def map_nodes_to_pairs(df_nodes):
+            return pd.Series(np.nan, index=df_nodes.index)
+
+        def map_edges_to_pairs(df_edges):
+            pair_ids = pair_index.get_indexer(pd.MultiIndex.from_arrays([df_edges['actor_1'], df_edges['actor_2']]))
+            return pd.Series(pair_ids, index=df_edges.index).where(pair_ids >= 0)
+
+        return self.extract_subgroup_feature_tensor(features, directed_pairs, map_nodes_to_pairs, map_edges_to_pairs)
+
+    def extract_subgroup_feature_tensor(self, features, subgroups, map_nodes_to_subgroups, map_edges_to_subgroups):
+        '''
+        Extracts the features for all subgroups in a single grouped pass over the subgraphs
+        args:
+            features: list of features to extract
+            subgroups: list of (hashable) subgroups, e.g. actors
+            map_nodes_to_subgroups, map_edges_to_subgroups: functions that map a dataframe of stacked node/edge
+              subgraphs to the index of the subgroup of each row (NaN if the row does not belong to any subgroup)
+        returns:
+            SubgroupFeatureTensor
+        '''
+        num_groups = len(subgroups) * self.num_windows
+        subgraphs = {"task_nodes": (self.task_subgraphs_nodes, map_nodes_to_subgroups),
+                     "event_nodes": (self.event_subgraphs_nodes, map_nodes_to_subgroups),
+                     "task_edges": (self.task_subgraphs_edges, map_edges_to_subgroups),
+                     "event_edges": (self.event_subgraphs_edges, map_edges_to_subgroups)}
+        performance_feature_functions = {"average_case_duration": extract_average_case_duration,
+                                         "case_throughput_speed": extract_case_throughput_speed,
+                                         "case_throughput_velocity": extract_case_throughput_velocity}
+        grouped_subgraphs = {}
+        feature_index = {}
+        all_groups, all_feature_ids, all_values = [], [], []
+        for feature in features:
+            if feature in performance_feature_functions:
+                # performance features are not subgroup-specific, every subgroup gets the values of the entire log
+                window_results = performance_feature_functions[feature](self.durations)
+                window_values = [window_result[0][1] for window_result in window_results]
+                grouped_features = (np.arange(num_groups), [feature], np.zeros(num_groups, dtype=np.int64),
+                                    np.tile(window_values, len(subgroups)))
+            elif feature in self.grouped_feature_definitions:
+                kind, aggregation, node_type, entity_type = self.grouped_feature_definitions[feature]
+                if kind not in grouped_subgraphs:
+                    grouped_subgraphs[kind] = group_subgraphs(*subgraphs[kind], self.num_windows)
+                grouped_features = extract_grouped_feature(grouped_subgraphs[kind], kind, aggregation, node_type,
+                                                           entity_type, num_groups)
+            else:
+                continue
+            groups, feature_names, feature_ids, values = grouped_features
+            global_feature_ids = np.array([feature_index.setdefault(name, len(feature_index))
+                                           for name in feature_names], dtype=np.int64)
+            all_groups.append(groups)
+            all_feature_ids.append(global_feature_ids[feature_ids])
+            all_values.append(np.asarray(values, dtype=float))
+
+        groups = np.concatenate(all_groups) if all_groups else np.empty(0, dtype=np.int64)
+        feature_ids = np.concatenate(all_feature_ids) if all_feature_ids else np.empty(0, dtype=np.int64)
+        values = np.concatenate(all_values) if all_values else np.empty(0)
+        self.pr.record_performance(f"extract_subgroup_feature_tensor_{len(subgroups)}")
+        return SubgroupFeatureTensor(subgroups, self.num_windows, list(feature_index), groups // self.num_windows,
+                                     groups % self.num_windows, feature_ids, values)
+
+    @staticmethod
+    def pca_reduction(features_np, dimensions, normalize=False, normalize_function='max'):
         '''Reduces a time series of features
         Adapted from Adams et al. (2021) https://github.com/niklasadams/explainable_concept_drift_pm
         features: Two dimensional array of features
@@ -295,6 +702,8 @@ class FeatureExtraction:
           features should be normalized, if they have very different scales.
         normalize_function: Choose 'max' or 'sum'
         '''
+        if sparse.issparse(features_np):
+            features_np = features_np.toarray()
         # print(features_np.shape)
         # print(features_np)
         if normalize:
@@ -324,219 +733,489 @@ class FeatureExtraction:
         return reduced_features
 
 
-def extract_distinct_performance_instance_count(subgraphs_nodes, node_type, actor):
-    results = []
-    for df_subgraph in subgraphs_nodes:
-        all_instances = []
-        for index, row in df_subgraph.iterrows():
-            if actor == "":
-                all_instances.append(row[node_type])
-            else:
-                if row['actor'] == actor:
-                    all_instances.append(row[node_type])
-        results.append([(f'distinct_{node_type}_count', len(set(all_instances)))])
+class SubgroupFeatureTensor:
+    '''
+    Sparse (subgroup, window, feature) tensor in coordinate format, from which the feature matrix of a single subgroup
+    is sliced
+    '''
+
+    def __init__(self, subgroups, num_windows, feature_names, subgroup_ids, windows, feature_ids, values):
+        self.subgroups = list(subgroups)
+        self.subgroup_index = {subgroup: i for i, subgroup in enumerate(self.subgroups)}
+        self.num_windows = num_windows
+        # columns in sorted order of the feature names
+        self.feature_names = sorted(feature_names)
+        feature_rank = {feature_name: i for i, feature_name in enumerate(self.feature_names)}
+        feature_ids = np.array([feature_rank[feature_name] for feature_name in feature_names],
+                               dtype=np.int64)[feature_ids]
+        # entries sorted on subgroup, entries of a subgroup keep their extraction order
+        order = np.argsort(subgroup_ids, kind='stable')
+        self.windows = windows[order]
+        self.feature_ids = feature_ids[order]
+        self.values = values[order]
+        self.offsets = np.searchsorted(subgroup_ids[order], np.arange(len(self.subgroups) + 1))
+
+    def get_subgroup_features(self, subgroup):
+        '''
+        returns:
+            names of the features observed for the subgroup, window x feature matrix of the subgroup
+        '''
+        i = self.subgroup_index[subgroup]
+        windows = self.windows[self.offsets[i]:self.offsets[i + 1]]
+        feature_ids = self.feature_ids[self.offsets[i]:self.offsets[i + 1]]
+        values = self.values[self.offsets[i]:self.offsets[i + 1]]
+        # if multiple features produce the same feature name, the first value is kept (as in apply_feature_extraction)
+        _, first = np.unique(windows * len(self.feature_names) + feature_ids, return_index=True)
+        windows, feature_ids, values = windows[first], feature_ids[first], values[first]
+        subgroup_feature_ids = np.unique(feature_ids)
+        feature_vector = np.zeros((self.num_windows, len(subgroup_feature_ids)))
+        feature_vector[windows, np.searchsorted(subgroup_feature_ids, feature_ids)] = values
+        return [self.feature_names[feature_id] for feature_id in subgroup_feature_ids], feature_vector
+
+
+def save_feature_matrix(file_path, feature_names, feature_matrix):
+    np.savez(file_path, feature_names=np.asarray(feature_names, dtype=str), data=feature_matrix.data,
+             indices=feature_matrix.indices, indptr=feature_matrix.indptr, shape=feature_matrix.shape)
+
+
+def load_feature_matrix(file_path):
+    '''
+    returns:
+        feature names, window x feature matrix (scipy.sparse CSR matrix, including explicitly stored zeros)
+    '''
+    with np.load(file_path) as stored:
+        return (stored["feature_names"].tolist(),
+                sparse.csr_matrix((stored["data"], stored["indices"], stored["indptr"]), shape=tuple(stored["shape"])))
+
+
+def stack_feature_matrices(feature_names_1, feature_matrix_1, num_rows_1, feature_names_2, feature_matrix_2):
+    '''
+    Stacks the first num_rows_1 rows of the first feature matrix on top of the second feature matrix. The features that
+    exist in none of the stacked rows (i.e. have no stored entry) are left out, as in apply_feature_extraction.
+    returns:
+        sorted feature names, stacked window x feature matrix (scipy.sparse CSR matrix)
+    '''
+    feature_matrix_1 = feature_matrix_1[:num_rows_1].tocoo()
+    feature_names = sorted({feature_names_1[column] for column in feature_matrix_1.col} | set(feature_names_2))
+    feature_columns = {feature_name: column for column, feature_name in enumerate(feature_names)}
+    feature_matrix_2 = feature_matrix_2.tocoo()
+    columns_1 = np.array([feature_columns.get(feature_name, -1) for feature_name in feature_names_1], dtype=np.int64)
+    columns_2 = np.array([feature_columns[feature_name] for feature_name in feature_names_2], dtype=np.int64)
+    rows = np.concatenate([feature_matrix_1.row, feature_matrix_2.row + num_rows_1])
+    columns = np.concatenate([columns_1[feature_matrix_1.col], columns_2[feature_matrix_2.col]]).astype(np.int64)
+    values = np.concatenate([feature_matrix_1.data, feature_matrix_2.data])
+    return feature_names, sparse.coo_matrix((values, (rows, columns)),
+                                            shape=(num_rows_1 + feature_matrix_2.shape[0], len(feature_names))).tocsr()
+
+
+class Vocabulary:
+    '''
+    Vocabulary per domain (actors, cases, tasks, ...) that is shared by all subgraphs, the repeated values of the
+    subgraphs are dictionary-encoded against it as pandas Categoricals while they are parsed. Values are only appended,
+    such that the code of a value never changes and a subgraph is re-encoded with a lookup per category instead of per
+    row. Stacked subgraphs therefore stay categorical, all groupbys and handover keys are computed on the integer codes
+    and values are only decoded to strings when feature names are emitted.
+    '''
+
+    def __init__(self):
+        self.domains = {column: domain for domain, columns in VOCABULARY_COLUMNS.items() for column in columns}
+        self.codes = {domain: {} for domain in VOCABULARY_COLUMNS}
+        self.dtypes = {domain: pd.CategoricalDtype([]) for domain in VOCABULARY_COLUMNS}
+        # windows are parsed in parallel if retrieval_workers > 1
+        self.lock = threading.Lock()
+
+    def get_codes(self, domain, values):
+        '''
+        returns:
+            vocabulary codes of the values (-1 for nulls), values that are not in the vocabulary yet are added
+        '''
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            value_codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            value_codes, uniques = pd.factorize(values)
+        with self.lock:
+            domain_codes = self.codes[domain]
+            num_codes = len(domain_codes)
+            unique_codes = np.array([domain_codes.setdefault(value, len(domain_codes)) for value in uniques],
+                                    dtype=np.int32)
+            if len(domain_codes) > num_codes:
+                self.dtypes[domain] = pd.CategoricalDtype(list(domain_codes))
+        codes = np.full(len(value_codes), -1, dtype=np.int32)
+        valid = value_codes >= 0
+        codes[valid] = unique_codes[value_codes[valid]]
+        return codes
+
+    def encode_codes(self, df_subgraph):
+        '''
+        Replaces the values of the vocabulary columns of the subgraph (in place) by their integer codes
+        '''
+        for column in df_subgraph.columns:
+            if column in self.domains:
+                df_subgraph[column] = self.get_codes(self.domains[column], df_subgraph[column])
+        return df_subgraph
+
+    def codes_to_categorical(self, df_subgraph):
+        '''
+        Converts the integer codes of the vocabulary columns of the subgraph (in place) to Categoricals
+        '''
+        for column in df_subgraph.columns:
+            if column in self.domains:
+                df_subgraph[column] = pd.Categorical.from_codes(df_subgraph[column].to_numpy(),
+                                                                dtype=self.dtypes[self.domains[column]])
+        return df_subgraph
+
+    def encode(self, df_subgraph):
+        '''
+        Encodes the vocabulary columns of the subgraph (in place) against the current vocabulary, e.g. to give
+        subgraphs that were encoded earlier or loaded from the cache the same categories
+        '''
+        for column in df_subgraph.columns:
+            domain = self.domains.get(column)
+            if domain is not None and df_subgraph[column].dtype is not self.dtypes[domain]:
+                codes = self.get_codes(domain, df_subgraph[column])
+                df_subgraph[column] = pd.Categorical.from_codes(codes, dtype=self.dtypes[domain])
+        return df_subgraph
+
+
+def get_num_complete_windows(num_days, window_size):
+    '''
+    returns:
+        number of leading windows that events appended after the last day of the log cannot change. The day bounds of a
+        window are inclusive, window w can still change if (w + 1) * window_size >= num_days.
+    '''
+    return min(max(0, -(-num_days // window_size) - 1), num_days // window_size)
+
+
+def split_into_windows(df_subgraph, window_size, num_windows):
+    '''
+    Splits a subgraph retrieved for the entire log into the per-window subgraphs. A row with day offsets (from_day,
+    to_day) since the start of the log belongs to window w if w * window_size <= from_day and
+    to_day <= (w + 1) * window_size, i.e. the (inclusive) date filter of the per-window queries, hence a row can belong
+    to multiple windows.
+    returns:
+        list of per-window subgraphs, without the from_day and to_day columns
+    '''
+    if df_subgraph.empty:
+        return [df_subgraph.drop(columns=['from_day', 'to_day'], errors='ignore') for _ in range(0, num_windows)]
+    window_bounds = np.arange(num_windows + 1) * window_size
+    from_days = df_subgraph['from_day'].to_numpy(dtype=np.int64)
+    to_days = df_subgraph['to_day'].to_numpy(dtype=np.int64)
+    last_windows = np.minimum(np.searchsorted(window_bounds, from_days, side='right') - 1, num_windows - 1)
+    first_windows = np.maximum(np.searchsorted(window_bounds, to_days, side='left') - 1, 0)
+    num_row_windows = np.maximum(last_windows - first_windows + 1, 0)
+
+    # repeat every row for each window it belongs to
+    rows = np.repeat(np.arange(len(df_subgraph.index)), num_row_windows)
+    offsets = np.arange(len(rows)) - np.repeat(np.cumsum(num_row_windows) - num_row_windows, num_row_windows)
+    windows = np.repeat(first_windows, num_row_windows) + offsets
+
+    order = np.argsort(windows, kind='stable')
+    window_offsets = np.searchsorted(windows[order], np.arange(num_windows + 1))
+    df_rows = df_subgraph.drop(columns=['from_day', 'to_day'])
+    return [df_rows.iloc[rows[order[window_offsets[window]:window_offsets[window + 1]]]].reset_index(drop=True)
+            for window in range(0, num_windows)]
+
+
+def bin_case_lifecycles(df_case_lifecycles, window_size, num_windows):
+    '''
+    Bins the case lifecycles (case, start_day, end_day, duration) into the windows, a case belongs to every window
+    its lifecycle overlaps with
+    returns:
+        list of per-window case durations, windows without cases have no rows (and the performance features NaN)
+    '''
+    if df_case_lifecycles.empty:
+        # a query result without rows has no columns
+        df_case_lifecycles = pd.DataFrame(columns=["case", "start_day", "end_day", "duration_days"])
+    return split_into_windows(df_case_lifecycles.rename(columns={"end_day": "from_day", "start_day": "to_day"}),
+                              window_size, num_windows)
+
+
+def split_subgraph(subgraph_type, df_subgraph, window_size, num_windows):
+    if subgraph_type == "durations":
+        return bin_case_lifecycles(df_subgraph, window_size, num_windows)
+    return split_into_windows(df_subgraph, window_size, num_windows)
+
+
+def stack_subgraphs(subgraphs):
+    '''
+    Stacks the per-window subgraph dataframes into one dataframe with an additional "window" column, such that all
+    windows can be aggregated in a single groupby instead of iterating over the rows of each window
+    '''
+    frames = [df_subgraph.assign(window=window) for window, df_subgraph in enumerate(subgraphs)
+              if not df_subgraph.empty]
+    if not frames:
+        return pd.DataFrame(columns=['window'])
+    return pd.concat(frames, ignore_index=True)
+
+
+def filter_subgraph_nodes(df_nodes, actor=""):
+    if actor == "" or df_nodes.empty:
+        return df_nodes
+    return df_nodes[df_nodes['actor'] == actor]
+
+
+def filter_subgraph_edges(df_edges, actor_1="", actor_2="", entity_type=""):
+    if df_edges.empty:
+        return df_edges
+    mask = np.ones(len(df_edges.index), dtype=bool)
+    if entity_type != "":
+        mask &= (df_edges['entity_type'] == entity_type).to_numpy()
+    if actor_1 != "":
+        mask &= (df_edges['actor_1'] == actor_1).to_numpy()
+    if actor_2 != "":
+        mask &= (df_edges['actor_2'] == actor_2).to_numpy()
+    return df_edges[mask]
+
+
+def encode_instances(df_nodes, node_type):
+    '''
+    Integer-codes the instances (tasks, task variants, activities) in order of first appearance
+    returns:
+        codes per row, label per code
+    '''
+    codes, uniques = pd.factorize(df_nodes[node_type], use_na_sentinel=False)
+    return codes, [str(instance) for instance in uniques]
+
+
+def encode_handovers(df_edges, node_type):
+    '''
+    Integer-codes the handovers "{node_type}_1"_"{node_type}_2" in order of first appearance. Pairs are coded first
+    and only their labels are formatted, pairs that result in the same label share a code.
+    returns:
+        codes per row, label per code
+    '''
+    codes_1, uniques_1 = pd.factorize(df_edges[f'{node_type}_1'], use_na_sentinel=False)
+    codes_2, uniques_2 = pd.factorize(df_edges[f'{node_type}_2'], use_na_sentinel=False)
+    pair_codes, pairs = pd.factorize(codes_1.astype(np.int64) * len(uniques_2) + codes_2)
+    pair_labels = [f"{uniques_1[pair // len(uniques_2)]}_{uniques_2[pair % len(uniques_2)]}" for pair in pairs]
+    label_codes, labels = pd.factorize(np.asarray(pair_labels, dtype=object))
+    return label_codes[pair_codes], list(labels)
+
+
+def get_row_counts(df_subgraphs):
+    '''
+    returns:
+        number of nodes/edges per row if the subgraphs are aggregated (see FeatureExtraction.aggregate_subgraphs), else
+        None (every row is a single node/edge)
+    '''
+    if 'count' not in df_subgraphs.columns:
+        return None
+    return df_subgraphs['count'].to_numpy(dtype=np.int64)
+
+
+def count_rows(codes, num_codes, row_counts=None):
+    if row_counts is None:
+        return np.bincount(codes, minlength=num_codes)
+    return np.bincount(codes, weights=row_counts, minlength=num_codes).astype(np.int64)
+
+
+def count_per_group(group_codes, key_codes, num_keys, row_counts=None):
+    '''
+    Counts the rows per (group, key) combination, combinations are returned in order of first appearance
+    returns:
+        group per combination, key per combination, count per combination
+    '''
+    combined_codes, combinations = pd.factorize(group_codes.astype(np.int64) * num_keys + key_codes)
+    counts = count_rows(combined_codes, len(combinations), row_counts)
+    return combinations // num_keys, combinations % num_keys, counts
+
+
+def count_distinct_per_group(df_subgraphs, key_codes, num_keys, group_codes, num_groups, feature_name):
+    distinct_counts = np.zeros(num_groups, dtype=np.int64)
+    if not df_subgraphs.empty:
+        groups, _, _ = count_per_group(group_codes, key_codes, num_keys)
+        distinct_counts = np.bincount(groups, minlength=num_groups)
+    return np.arange(num_groups), [feature_name], np.zeros(num_groups, dtype=np.int64), distinct_counts
+
+
+def count_total_per_group(group_codes, num_groups, feature_name, row_counts=None):
+    total_counts = count_rows(group_codes, num_groups, row_counts)
+    return np.arange(num_groups), [feature_name], np.zeros(num_groups, dtype=np.int64), total_counts
+
+
+def count_per_key_per_group(key_codes, key_names, group_codes, num_groups, relative, row_counts=None):
+    if len(key_names) == 0:
+        return np.empty(0, dtype=np.int64), [], np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    groups, key_ids, counts = count_per_group(group_codes, key_codes, len(key_names), row_counts)
+    if relative:
+        total_counts = count_rows(group_codes, num_groups, row_counts)
+        return groups, key_names, key_ids, counts / total_counts[groups] * 100
+    return groups, key_names, key_ids, counts
+
+
+def extract_distinct_instance_count_per_group(df_nodes, node_type, group_codes, num_groups, feature_name):
+    '''
+    Counts the distinct instances per group of subgraph rows, where a group is e.g. a window or an (actor, window)
+    combination
+    returns:
+        group per entry, feature names, feature id per entry, value per entry
+    '''
+    instance_codes, instances = encode_instances(df_nodes, node_type) if not df_nodes.empty else ([], [])
+    return count_distinct_per_group(df_nodes, instance_codes, len(instances), group_codes, num_groups, feature_name)
+
+
+def extract_count_per_instance_per_group(df_nodes, node_type, group_codes, num_groups, relative=False):
+    if df_nodes.empty:
+        return count_per_key_per_group(np.empty(0, dtype=np.int64), [], group_codes, num_groups, relative)
+    instance_codes, instances = encode_instances(df_nodes, node_type)
+    suffix = "relative_freq" if relative else "freq"
+    instance_names = [f'{node_type}_{instance}_{suffix}' for instance in instances]
+    return count_per_key_per_group(instance_codes, instance_names, group_codes, num_groups, relative,
+                                   get_row_counts(df_nodes))
+
+
+def extract_distinct_handover_count_per_group(df_edges, node_type, group_codes, num_groups):
+    handover_codes, handovers = encode_handovers(df_edges, node_type) if not df_edges.empty else ([], [])
+    return count_distinct_per_group(df_edges, handover_codes, len(handovers), group_codes, num_groups,
+                                    f"distinct_{node_type}_handover_count")
+
+
+def extract_count_per_handover_per_group(df_edges, node_type, group_codes, num_groups, relative=False):
+    if df_edges.empty:
+        return count_per_key_per_group(np.empty(0, dtype=np.int64), [], group_codes, num_groups, relative)
+    handover_codes, handovers = encode_handovers(df_edges, node_type)
+    suffix = "relative_freq" if relative else "count"
+    handover_names = [f'{node_type}_{handover}_{suffix}' for handover in handovers]
+    return count_per_key_per_group(handover_codes, handover_names, group_codes, num_groups, relative,
+                                   get_row_counts(df_edges))
+
+
+def get_window_codes(df_subgraphs):
+    return df_subgraphs['window'].to_numpy(dtype=np.int64)
+
+
+def group_subgraphs(subgraphs, map_to_subgroups, num_windows):
+    '''
+    Stacks the subgraphs and adds a "group" column coding (subgroup, window) as subgroup * num_windows + window, rows
+    that do not belong to any subgroup are dropped
+    '''
+    df_subgraphs = stack_subgraphs(subgraphs)
+    if df_subgraphs.empty:
+        return df_subgraphs.assign(group=pd.Series(dtype=np.int64))
+    subgroup_ids = map_to_subgroups(df_subgraphs)
+    in_subgroup = subgroup_ids.notna().to_numpy()
+    df_subgraphs = df_subgraphs[in_subgroup]
+    return df_subgraphs.assign(group=subgroup_ids[in_subgroup].to_numpy(dtype=np.int64) * num_windows +
+                               get_window_codes(df_subgraphs))
+
+
+def extract_grouped_feature(df_grouped, kind, aggregation, node_type, entity_type, num_groups):
+    '''
+    Computes a feature on stacked subgraphs with a "group" column, see FeatureExtraction.grouped_feature_definitions
+    '''
+    handover = kind.endswith("edges")
+    if entity_type != "":
+        df_grouped = filter_subgraph_edges(df_grouped, entity_type=entity_type)
+    group_codes = df_grouped['group'].to_numpy(dtype=np.int64)
+    if aggregation == "case_count":
+        return extract_distinct_instance_count_per_group(df_grouped, 'case', group_codes, num_groups, 'case_count')
+    if aggregation == "total":
+        feature_name = f"total_{node_type}_handover_count" if handover else f'total_{node_type}_count'
+        return count_total_per_group(group_codes, num_groups, feature_name, get_row_counts(df_grouped))
+    if aggregation == "distinct":
+        if handover:
+            return extract_distinct_handover_count_per_group(df_grouped, node_type, group_codes, num_groups)
+        return extract_distinct_instance_count_per_group(df_grouped, node_type, group_codes, num_groups,
+                                                         f'distinct_{node_type}_count')
+    if handover:
+        return extract_count_per_handover_per_group(df_grouped, node_type, group_codes, num_groups,
+                                                    relative=aggregation == "relative")
+    return extract_count_per_instance_per_group(df_grouped, node_type, group_codes, num_groups,
+                                                relative=aggregation == "relative")
+
+
+def to_window_results(grouped_features, num_windows):
+    '''
+    Converts grouped features with the window as group to the per-window lists of (feature name, value) tuples
+    '''
+    windows, feature_names, feature_ids, values = grouped_features
+    results = [[] for _ in range(num_windows)]
+    for window, feature_id, value in zip(windows.tolist(), feature_ids.tolist(), values.tolist()):
+        results[window].append((feature_names[feature_id], value))
     return results
 
 
+def extract_distinct_performance_instance_count(subgraphs_nodes, node_type, actor):
+    df_nodes = filter_subgraph_nodes(stack_subgraphs(subgraphs_nodes), actor)
+    return to_window_results(
+        extract_distinct_instance_count_per_group(df_nodes, node_type, get_window_codes(df_nodes),
+                                                  len(subgraphs_nodes), f'distinct_{node_type}_count'),
+        len(subgraphs_nodes))
+
+
 def extract_number_of_cases(task_subgraphs_nodes, actor):
-    results = []
-    for df_subgraph in task_subgraphs_nodes:
-        all_cases = []
-        for index, row in df_subgraph.iterrows():
-            if actor == "":
-                all_cases.append(row['case'])
-            else:
-                if row['actor'] == actor:
-                    all_cases.append(row['case'])
-        results.append([('case_count', len(set(all_cases)))])
-    return results
+    df_nodes = filter_subgraph_nodes(stack_subgraphs(task_subgraphs_nodes), actor)
+    return to_window_results(
+        extract_distinct_instance_count_per_group(df_nodes, 'case', get_window_codes(df_nodes),
+                                                  len(task_subgraphs_nodes), 'case_count'),
+        len(task_subgraphs_nodes))
 
 
 def extract_count_per_performance_instance(subgraphs_nodes, node_type, actor):
-    results = []
-    for df_subgraph in subgraphs_nodes:
-        count_per_instance = {}
-        total_count = 0
-        for index, row in df_subgraph.iterrows():
-            if actor == "":
-                if not row[node_type] in count_per_instance.keys():
-                    count_per_instance[row[node_type]] = 0
-                count_per_instance[row[node_type]] += 1
-            else:
-                if row['actor'] == actor:
-                    if not row[node_type] in count_per_instance.keys():
-                        count_per_instance[row[node_type]] = 0
-                    count_per_instance[row[node_type]] += 1
-        subgraph_results = [(f'{node_type}_{str(instance)}_freq', count_per_instance[instance]) for instance in
-                            count_per_instance.keys()]
-        results.append(subgraph_results)
-    return results
+    df_nodes = filter_subgraph_nodes(stack_subgraphs(subgraphs_nodes), actor)
+    return to_window_results(
+        extract_count_per_instance_per_group(df_nodes, node_type, get_window_codes(df_nodes), len(subgraphs_nodes)),
+        len(subgraphs_nodes))
 
 
 def extract_count_per_performance_instance_normalized(subgraphs_nodes, node_type, actor):
-    results = []
-    for df_subgraph in subgraphs_nodes:
-        count_per_instance = {}
-        total_count = 0
-        for index, row in df_subgraph.iterrows():
-            if actor == "":
-                if not row[node_type] in count_per_instance.keys():
-                    count_per_instance[row[node_type]] = 0
-                count_per_instance[row[node_type]] += 1
-                total_count += 1
-            else:
-                if row['actor'] == actor:
-                    if not row[node_type] in count_per_instance.keys():
-                        count_per_instance[row[node_type]] = 0
-                    count_per_instance[row[node_type]] += 1
-                    total_count += 1
-        subgraph_results = [
-            (f'{node_type}_{str(instance)}_relative_freq', count_per_instance[instance] / total_count * 100) for
-            instance in
-            count_per_instance.keys()]
-        results.append(subgraph_results)
-    return results
+    df_nodes = filter_subgraph_nodes(stack_subgraphs(subgraphs_nodes), actor)
+    return to_window_results(
+        extract_count_per_instance_per_group(df_nodes, node_type, get_window_codes(df_nodes), len(subgraphs_nodes),
+                                             relative=True),
+        len(subgraphs_nodes))
 
 
 def extract_total_performance_instance_count(subgraphs_nodes, node_type, actor):
-    results = []
-    for df_subgraph in subgraphs_nodes:
-        all_instances = []
-        for index, row in df_subgraph.iterrows():
-            if actor == "":
-                all_instances.append(row[node_type])
-            else:
-                if row['actor'] == actor:
-                    all_instances.append(row[node_type])
-        results.append([(f'total_{node_type}_count', len(all_instances))])
-    return results
+    df_nodes = filter_subgraph_nodes(stack_subgraphs(subgraphs_nodes), actor)
+    return to_window_results(
+        count_total_per_group(get_window_codes(df_nodes), len(subgraphs_nodes), f'total_{node_type}_count',
+                              get_row_counts(df_nodes)),
+        len(subgraphs_nodes))
 
 
 def extract_distinct_handover_count(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
-    results = []
-    for df_subgraph in subgraphs_edges:
-        if entity_type != "":
-            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
-        all_handovers = []
-        for index, row in df_subgraph.iterrows():
-            if actor_1 == "" and actor_2 == "":
-                all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            elif actor_1 == "":
-                if row['actor_2'] == actor_2:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            elif actor_2 == "":
-                if row['actor_1'] == actor_1:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            else:
-                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-        results.append([(f"distinct_{node_type}_handover_count", len(set(all_handovers)))])
-    return results
+    df_edges = filter_subgraph_edges(stack_subgraphs(subgraphs_edges), actor_1, actor_2, entity_type)
+    return to_window_results(
+        extract_distinct_handover_count_per_group(df_edges, node_type, get_window_codes(df_edges),
+                                                  len(subgraphs_edges)),
+        len(subgraphs_edges))
 
 
 def extract_total_handover_count(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
-    results = []
-    for df_subgraph in subgraphs_edges:
-        if entity_type != "":
-            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
-        all_handovers = []
-        for index, row in df_subgraph.iterrows():
-            if actor_1 == "" and actor_2 == "":
-                all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            elif actor_1 == "":
-                if row['actor_2'] == actor_2:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            elif actor_2 == "":
-                if row['actor_1'] == actor_1:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-            else:
-                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
-                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
-        results.append([(f"total_{node_type}_handover_count", len(all_handovers))])
-    return results
+    df_edges = filter_subgraph_edges(stack_subgraphs(subgraphs_edges), actor_1, actor_2, entity_type)
+    return to_window_results(
+        count_total_per_group(get_window_codes(df_edges), len(subgraphs_edges), f"total_{node_type}_handover_count",
+                              get_row_counts(df_edges)),
+        len(subgraphs_edges))
 
 
 def extract_count_per_handover(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
-    results = []
-    for df_subgraph in subgraphs_edges:
-        if entity_type != "":
-            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
-        count_per_handover = {}
-        for index, row in df_subgraph.iterrows():
-            if actor_1 == "" and actor_2 == "":
-                if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-            elif actor_1 == "":
-                if row['actor_2'] == actor_2:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-            elif actor_2 == "":
-                if row['actor_1'] == actor_1:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-            else:
-                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-        subgraph_results = [(f'{node_type}_{str(handover)}_count', count_per_handover[handover]) for handover in
-                            count_per_handover.keys()]
-        results.append(subgraph_results)
-    return results
+    df_edges = filter_subgraph_edges(stack_subgraphs(subgraphs_edges), actor_1, actor_2, entity_type)
+    return to_window_results(
+        extract_count_per_handover_per_group(df_edges, node_type, get_window_codes(df_edges), len(subgraphs_edges)),
+        len(subgraphs_edges))
 
 
 def extract_count_per_handover_normalized(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
-    results = []
-    for df_subgraph in subgraphs_edges:
-        if entity_type != "" and not df_subgraph.empty:
-            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
-        count_per_handover = {}
-        total_count = 0
-        for index, row in df_subgraph.iterrows():
-            if actor_1 == "" and actor_2 == "":
-                if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-                total_count += 1
-            elif actor_1 == "":
-                if row['actor_2'] == actor_2:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-                    total_count += 1
-            elif actor_2 == "":
-                if row['actor_1'] == actor_1:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-                    total_count += 1
-            else:
-                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
-                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
-                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
-                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
-                    total_count += 1
-        subgraph_results = [
-            (f'{node_type}_{str(handover)}_relative_freq', count_per_handover[handover] / total_count * 100)
-            for handover in count_per_handover.keys()]
-        results.append(subgraph_results)
-    return results
+    df_edges = filter_subgraph_edges(stack_subgraphs(subgraphs_edges), actor_1, actor_2, entity_type)
+    return to_window_results(
+        extract_count_per_handover_per_group(df_edges, node_type, get_window_codes(df_edges), len(subgraphs_edges),
+                                             relative=True),
+        len(subgraphs_edges))
 
 
 def extract_average_case_duration(durations):
     results = []
     for df_window_durations in durations:
-        results.append([(f"average_case_duration", df_window_durations['duration'].mean() / 3600 / 24)])
+        results.append([(f"average_case_duration", df_window_durations['duration_days'].mean())])
     return results
 
 
 def extract_case_throughput_speed(durations):
     results = []
     for df_window_durations in durations:
-        average_duration_days = df_window_durations['duration'].mean() / 3600 / 24
+        average_duration_days = df_window_durations['duration_days'].mean()
         case_throughput_speed = len(df_window_durations.index) / average_duration_days
         results.append([(f"case_throughput_speed", case_throughput_speed)])
     return results
@@ -545,7 +1224,7 @@ def extract_case_throughput_speed(durations):
 def extract_case_throughput_velocity(durations):
     results = []
     for df_window_durations in durations:
-        average_duration_days = df_window_durations['duration'].mean() / 3600 / 24
+        average_duration_days = df_window_durations['duration_days'].mean()
         case_throughput_velocity = len(df_window_durations.index) / average_duration_days / average_duration_days
         results.append([(f"case_throughput_velocity", case_throughput_velocity)])
     return results
@@ -0,0 +1,52 @@
+from promg import Performance
+
+from queries.index_provisioning import IndexProvisioningQueryLibrary as ql
+
+# (index name, node label, property) for the properties the drift detection queries filter on
+RANGE_INDEXES = [("task_instance_start_time_index", "TaskInstance", "start_time"),
+                 ("task_instance_end_time_index", "TaskInstance", "end_time"),
+                 ("task_instance_cluster_index", "TaskInstance", "cluster"),
+                 ("task_instance_id_index", "TaskInstance", "ID"),
+                 ("task_instance_variant_index", "TaskInstance", "variant"),
+                 ("task_instance_start_day_index", "TaskInstance", "start_day"),
+                 ("task_instance_end_day_index", "TaskInstance", "end_day"),
+                 ("event_timestamp_index", "Event", "timestamp"),
+                 ("event_start_day_index", "Event", "start_day"),
+                 ("event_end_day_index", "Event", "end_day")]
+
+# (constraint name, node label, property), a uniqueness constraint is backed by an index as well
+UNIQUE_CONSTRAINTS = [("task_cluster_name_unique", "TaskCluster", "Name")]
+
+
+class IndexProvisioning:
+    '''
+    Creates the indexes and constraints used by task clustering and concept drift detection, such that the per-window
+    and per-variant lookups are index seeks instead of label scans. Should run after the tasks are built and clustered.
+    '''
+
+    def __init__(self, db_connection, await_timeout=3600):
+        self.connection = db_connection
+        self.await_timeout = await_timeout
+
+    def provision_indexes(self):
+        self.create_indexes()
+        self.await_indexes()
+
+    @Performance.track()
+    def create_indexes(self):
+        self.connection.exec_query(ql.q_create_node_label_lookup_index)
+        self.connection.exec_query(ql.q_create_relationship_type_lookup_index)
+        for index_name, node_label, property_name in RANGE_INDEXES:
+            self.connection.exec_query(ql.q_create_range_index, **{"index_name": index_name,
+                                                                   "node_label": node_label,
+                                                                   "property_name": property_name})
+        for constraint_name, node_label, property_name in UNIQUE_CONSTRAINTS:
+            self.connection.exec_query(ql.q_create_unique_constraint, **{"constraint_name": constraint_name,
+                                                                         "node_label": node_label,
+                                                                         "property_name": property_name})
+
+    @Performance.track()
+    def await_indexes(self):
+        # index creation returns immediately, the duration of this step is the index population time. Fails if an
+        # index is not online within the timeout (in seconds)
+        self.connection.exec_query(ql.q_await_indexes, **{"timeout": self.await_timeout})
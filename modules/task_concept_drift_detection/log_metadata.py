@@ -0,0 +1,115 @@
+from promg import Performance
+from promg.data_managers.semantic_header import ConstructedNodes
+
+from queries.task_cd_detection import ConceptDriftDetectionTasksQueryLibrary as ql
+from queries import query_result_parser as qp
+
+
+class LogMetadata:
+    '''
+    Metadata of the graph that every concept drift detection and evaluation step needs: the bounds of the log and the
+    actor and collaboration frequencies. Computed once after the tasks are built and clustered and stored on a
+    :LogMetadata node per resource and case type, such that reading it is a single node lookup instead of a scan over
+    all task instances. The node stores the graph fingerprint it was computed for and is recomputed when the graph has
+    changed since, e.g. after new events were loaded or the tasks were clustered again. If the metadata has not been
+    computed, the graph is queried instead. Create one object per run and share it between the steps, such that the
+    fingerprint and the metadata are read once.
+    '''
+
+    def __init__(self, db_connection, case: ConstructedNodes, resource: ConstructedNodes):
+        self.connection = db_connection
+        self.case = case
+        self.resource = resource
+        self.metadata = None
+        self.graph_fingerprint = None
+        # end day: fingerprint of the part of the graph that ends before the end day
+        self.graph_prefix_fingerprints = {}
+
+    @Performance.track()
+    def compute_log_metadata(self):
+        for query in [ql.q_write_log_bounds, ql.q_write_actor_frequencies, ql.q_write_collab_frequencies]:
+            self.connection.exec_query(query, **{"resource": self.resource, "case": self.case})
+        self.connection.exec_query(ql.q_write_graph_fingerprint, **{"resource": self.resource, "case": self.case,
+                                                                      "graph_fingerprint": self.get_graph_fingerprint()})
+        self.metadata = None
+
+    def write_graph_version(self):
+        '''
+        Marks the graph as changed, to be called after the task instances were built, clustered or bucketed
+        '''
+        self.connection.exec_query(ql.q_write_graph_version, **{"resource": self.resource, "case": self.case})
+        self.metadata = None
+        self.graph_fingerprint = None
+        self.graph_prefix_fingerprints = {}
+
+    def get_graph_fingerprint(self):
+        '''
+        returns:
+            fingerprint of the current state of the graph, read once per object
+        '''
+        if self.graph_fingerprint is None:
+            self.graph_fingerprint = str(self.connection.exec_query(ql.q_get_graph_fingerprint,
+                                                                    **{"resource": self.resource, "case": self.case}))
+        return self.graph_fingerprint
+
+    def get_graph_prefix_fingerprint(self, end_day):
+        '''
+        returns:
+            fingerprint of the events and task instances that end before end_day (day bucket), read once per object
+        '''
+        if end_day not in self.graph_prefix_fingerprints:
+            self.graph_prefix_fingerprints[end_day] = str(self.connection.exec_query(
+                ql.q_get_graph_prefix_fingerprint, **{"end_day": end_day, "resource": self.resource, "case": self.case}))
+        return self.graph_prefix_fingerprints[end_day]
+
+    def get_metadata(self):
+        '''
+        returns:
+            dict of the properties of the :LogMetadata node, read once per object (empty if it does not exist). The
+            metadata is recomputed first if it was computed for another state of the graph.
+        '''
+        if self.metadata is None:
+            result = self.connection.exec_query(ql.q_retrieve_log_metadata,
+                                                **{"resource": self.resource, "case": self.case})
+            if result is not None and result[0]['metadata'].get("graph_fingerprint") != self.get_graph_fingerprint():
+                print("The graph has changed since the log metadata was computed, recomputing the log metadata.")
+                self.compute_log_metadata()
+                result = self.connection.exec_query(ql.q_retrieve_log_metadata,
+                                                    **{"resource": self.resource, "case": self.case})
+            self.metadata = {} if result is None else result[0]['metadata']
+        return self.metadata
+
+    def get_log_bounds(self):
+        '''
+        returns:
+            dates of the first and the last start of a task instance
+        '''
+        metadata = self.get_metadata()
+        if "start_time" not in metadata:
+            return (qp.parse_timestamp(self.connection.exec_query(ql.q_get_start_timestamp), 'start_time'),
+                    qp.parse_timestamp(self.connection.exec_query(ql.q_get_end_timestamp), 'end_time'))
+        return qp.parse_timestamp([metadata], 'start_time'), qp.parse_timestamp([metadata], 'end_time')
+
+    def get_actor_list(self, min_freq=0):
+        '''
+        returns:
+            actors that executed more than min_freq clustered task instances
+        '''
+        metadata = self.get_metadata()
+        if "actors" not in metadata:
+            return qp.parse_to_list(self.connection.exec_query(ql.q_retrieve_actor_list, **{
+                "resource": self.resource, "min_freq": min_freq}), "actor")
+        return [actor for actor, count in zip(metadata["actors"], metadata["actor_counts"]) if count > min_freq]
+
+    def get_collab_list(self, min_freq=0):
+        '''
+        returns:
+            [actor_1, actor_2] pairs with more than min_freq handovers between clustered task instances of a case
+        '''
+        metadata = self.get_metadata()
+        if "collab_counts" not in metadata:
+            return qp.parse_to_2d_list(self.connection.exec_query(ql.q_retrieve_collab_list, **{
+                "resource": self.resource, "case": self.case, "min_freq": min_freq}), "actor_1", "actor_2")
+        return [[actor_1, actor_2] for actor_1, actor_2, count in
+                zip(metadata["collab_actors_1"], metadata["collab_actors_2"], metadata["collab_counts"])
+                if count > min_freq]
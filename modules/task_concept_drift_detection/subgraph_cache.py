@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+import shutil
+from os import path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from promg import Query
+
+
+def get_cache_key(query: Query, *parameters):
+    '''
+    returns:
+        hash of the query (after template substitution), the query parameters and any other parameters the subgraphs
+        depend on (e.g. the graph fingerprint)
+    '''
+    key = repr((query.query_string, sorted((query.kwargs or {}).items()), parameters))
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def write_watermark(dataset_path, watermark):
+    # files starting with an underscore are ignored when the dataset is read
+    with open(os.path.join(dataset_path, "_watermark.json"), "w") as watermark_file:
+        json.dump(watermark, watermark_file)
+
+
+class SubgraphCache:
+    '''
+    Caches subgraphs as one Parquet dataset per subgraph type and cache key, partitioned by window. Since the cache key
+    is a hash of the query and the state of the graph, changing the query, its parameters or the graph never reuses a
+    stale cache.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_dataset_path(self, subgraph_type, cache_key):
+        return f"{self.directory}{subgraph_type}_{cache_key}"
+
+    def contains(self, subgraph_type, cache_key):
+        return path.exists(self.get_dataset_path(subgraph_type, cache_key))
+
+    def store(self, subgraph_type, cache_key, df_subgraph, partition_cols=None, watermark=None):
+        '''
+        Writes the subgraph to a temporary directory first, such that an interrupted write never leaves a partial
+        dataset behind
+        args:
+            watermark: dict stored next to the dataset, e.g. the last processed timestamp
+        '''
+        dataset_path = self.get_dataset_path(subgraph_type, cache_key)
+        temporary_path = f"{dataset_path}_tmp"
+        shutil.rmtree(temporary_path, ignore_errors=True)
+        table = pa.Table.from_pandas(df_subgraph, preserve_index=False)
+        if table.num_rows == 0:
+            # a partitioned dataset without rows has no files, store the schema in a single file instead
+            os.makedirs(temporary_path)
+            pq.write_table(table, os.path.join(temporary_path, "part-0.parquet"))
+        else:
+            pq.write_to_dataset(table, temporary_path, partition_cols=partition_cols)
+        if watermark is not None:
+            write_watermark(temporary_path, watermark)
+        shutil.rmtree(dataset_path, ignore_errors=True)
+        os.replace(temporary_path, dataset_path)
+
+    def load_watermark(self, subgraph_type, cache_key):
+        '''
+        returns:
+            watermark stored with the dataset, None if there is none
+        '''
+        watermark_path = os.path.join(self.get_dataset_path(subgraph_type, cache_key), "_watermark.json")
+        if not path.exists(watermark_path):
+            return None
+        with open(watermark_path) as watermark_file:
+            return json.load(watermark_file)
+
+    def load(self, subgraph_type, cache_key, columns=None, filters=None):
+        '''
+        args:
+            columns: columns to read, all columns if None
+            filters: predicates pushed down to the Parquet reader, e.g. [('window', 'in', [0, 1])]
+        '''
+        return pq.read_table(self.get_dataset_path(subgraph_type, cache_key), columns=columns,
+                             filters=filters).to_pandas()
+
+    def store_windows(self, subgraph_type, cache_key, subgraphs, watermark=None, first_window=0):
+        '''
+        args:
+            subgraphs: per-window subgraphs of the windows from first_window on
+            first_window: if > 0, the stored partitions of the windows before first_window are kept and only the
+              partitions of first_window and later windows are replaced, instead of rewriting the entire dataset
+        '''
+        # empty windows are left out, they would turn integer columns into float columns (and have no rows anyway)
+        window_subgraphs = [df_window_subgraph.assign(window=window)
+                            for window, df_window_subgraph in enumerate(subgraphs, start=first_window)
+                            if not df_window_subgraph.empty]
+        if window_subgraphs:
+            df_subgraphs = pd.concat(window_subgraphs, ignore_index=True)
+        else:
+            df_subgraphs = pd.DataFrame({'window': pd.Series([], dtype='int64')})
+        if first_window == 0 or not self.contains(subgraph_type, cache_key):
+            self.store(subgraph_type, cache_key, df_subgraphs, partition_cols=['window'], watermark=watermark)
+            return
+        dataset_path = self.get_dataset_path(subgraph_type, cache_key)
+        # the watermark is removed first, such that a dataset with an interrupted update is never reused
+        watermark_path = os.path.join(dataset_path, "_watermark.json")
+        if path.exists(watermark_path):
+            os.remove(watermark_path)
+        # the partitions of the replaced windows and the file of a dataset without rows are removed
+        for name in os.listdir(dataset_path):
+            entry_path = os.path.join(dataset_path, name)
+            if not name.startswith("window="):
+                os.remove(entry_path)
+            elif int(name[len("window="):]) >= first_window:
+                shutil.rmtree(entry_path)
+        if window_subgraphs:
+            pq.write_to_dataset(pa.Table.from_pandas(df_subgraphs, preserve_index=False), dataset_path,
+                                partition_cols=['window'])
+        elif not os.listdir(dataset_path):
+            pq.write_table(pa.Table.from_pandas(df_subgraphs, preserve_index=False),
+                           os.path.join(dataset_path, "part-0.parquet"))
+        if watermark is not None:
+            write_watermark(dataset_path, watermark)
+
+    def load_windows(self, subgraph_type, cache_key, num_windows, columns=None, windows=None):
+        '''
+        Loads the per-window subgraphs with a single read of the dataset
+        args:
+            columns: columns to read, all columns if None
+            windows: windows to read, all windows if None
+        returns:
+            list of subgraphs, one per window in windows (or range(num_windows))
+        '''
+        if windows is None:
+            windows = list(range(0, num_windows))
+        df_subgraphs = self.load(subgraph_type, cache_key,
+                                 columns=None if columns is None else columns + ['window'],
+                                 filters=[('window', 'in', windows)])
+        window_codes = df_subgraphs.pop('window').astype('int64').to_numpy()
+        order = np.argsort(window_codes, kind='stable')
+        window_offsets = np.searchsorted(window_codes[order], np.arange(num_windows + 1))
+        return [df_subgraphs.iloc[order[window_offsets[window]:window_offsets[window + 1]]].reset_index(drop=True)
+                for window in windows]
@@ -45,3 +45,11 @@ class TaskIdentification:
     @Performance.track("resource")
     def set_task_id(self):
         self.connection.exec_query(tf_ql.get_set_task_id_query)
+
+    @Performance.track("resource")
+    def set_day_buckets(self, only_missing=False):
+        # integer days on which the window queries of concept drift detection filter, such that they can use an index.
+        # With only_missing, only the task instances and events without day buckets are set, such that the step can be
+        # rerun on an existing graph, e.g. after new events were loaded
+        self.connection.exec_query(tf_ql.get_set_task_instance_days_query, **{"only_missing": only_missing})
+        self.connection.exec_query(tf_ql.get_set_event_days_query, **{"only_missing": only_missing})
@@ -0,0 +1,52 @@
+from promg import Query
+
+
+class IndexProvisioningQueryLibrary:
+
+    @staticmethod
+    def q_create_range_index(index_name, node_label, property_name):
+        query_str = '''
+            CREATE RANGE INDEX $index_name IF NOT EXISTS FOR (n:$node_label) ON (n.$property_name)
+            '''
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "index_name": index_name,
+                         "node_label": node_label,
+                         "property_name": property_name
+                     })
+
+    @staticmethod
+    def q_create_unique_constraint(constraint_name, node_label, property_name):
+        query_str = '''
+            CREATE CONSTRAINT $constraint_name IF NOT EXISTS FOR (n:$node_label) REQUIRE n.$property_name IS UNIQUE
+            '''
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "constraint_name": constraint_name,
+                         "node_label": node_label,
+                         "property_name": property_name
+                     })
+
+    @staticmethod
+    def q_create_node_label_lookup_index():
+        query_str = '''
+            CREATE LOOKUP INDEX node_label_lookup_index IF NOT EXISTS FOR (n) ON EACH labels(n)
+            '''
+        return Query(query_str=query_str)
+
+    @staticmethod
+    def q_create_relationship_type_lookup_index():
+        query_str = '''
+            CREATE LOOKUP INDEX rel_type_lookup_index IF NOT EXISTS FOR ()-[r]-() ON EACH type(r)
+            '''
+        return Query(query_str=query_str)
+
+    @staticmethod
+    def q_await_indexes(timeout):
+        query_str = '''
+            CALL db.awaitIndexes($timeout)
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "timeout": timeout
+                     })
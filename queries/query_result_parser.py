@@ -1,28 +1,30 @@
 import datetime
+from itertools import islice
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+
+
+# unit: number of seconds per unit
+DURATION_UNITS = {'seconds': 1, 'minutes': 60, 'hours': 60 * 60, 'days': 60 * 60 * 24}
 
 
 def transform_neo_duration(dataframe, column, unit='seconds'):
-    for index, row in dataframe.iterrows():
-        duration = row[column]
-        duration_seconds = duration.hours_minutes_seconds_nanoseconds[0] * 3600 + \
-                           duration.hours_minutes_seconds_nanoseconds[1] * 60 + \
-                           duration.hours_minutes_seconds_nanoseconds[2]
-        if unit == 'seconds':
-            duration_unit = duration_seconds
-        elif unit == 'minutes':
-            duration_unit = duration_seconds / 60
-        elif unit == 'hours':
-            duration_unit = duration_seconds / 60 / 60
-        elif unit == 'days':
-            duration_unit = duration_seconds / 60 / 60 / 24
-        dataframe.loc[index, f'{column}_{unit}'] = duration_unit
+    '''
+    Converts a column of neo4j durations to a float column {column}_{unit} in one step. Only the seconds and
+    nanoseconds of a duration are used, durations returned by duration.inSeconds() have no months or days.
+    '''
+    durations = dataframe[column]
+    duration_seconds = np.fromiter((duration.seconds + duration.nanoseconds / 1e9 for duration in durations),
+                                   dtype=np.float64, count=len(durations))
+    dataframe[f'{column}_{unit}'] = duration_seconds / DURATION_UNITS[unit]
     dataframe.drop(columns=[column], inplace=True)
     return dataframe
 
 
 def transform_neo_date(dataframe, column):
-    dataframe[column] = pd.DatetimeIndex(dataframe[column].astype(str))
+    dataframe[column] = pd.to_datetime([timestamp.to_native() for timestamp in dataframe[column]])
     return dataframe
 
 
@@ -49,6 +51,8 @@ def parse_timestamp(query_result, key):
 
 def parse_to_dataframe(query_result, timedelta_cols: dict = None, timestamp_cols: list = None):
     dataframe = pd.DataFrame([dict(record) for record in query_result])
+    if dataframe.empty:
+        return dataframe
     if timedelta_cols is not None:
         for timedelta_col_name, unit in timedelta_cols.items():
             transform_neo_duration(dataframe, timedelta_col_name, unit=unit)
@@ -56,3 +60,82 @@ def parse_to_dataframe(query_result, timedelta_cols: dict = None, timestamp_cols
         for timestamp_col in timestamp_cols:
             transform_neo_date(dataframe, timestamp_col)
     return dataframe
+
+
+def stream_record_chunks(db_connection, query, chunk_size=10000):
+    '''
+    Runs the query in its own session with fetch size chunk_size
+    returns:
+        generator of lists of at most chunk_size records, which are fetched from the database while they are consumed
+    '''
+    with db_connection.driver.session(database=query.database or db_connection.db_name,
+                                      fetch_size=chunk_size) as session:
+        records = iter(session.run(query.query_string, query.kwargs or {}))
+        chunk = list(islice(records, chunk_size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(records, chunk_size))
+
+
+def concat_tables(tables, vocabulary=None):
+    if not tables:
+        return pd.DataFrame()
+    # column types that differ between chunks (e.g. integers with or without nulls) are promoted to a common type
+    dataframe = pa.concat_tables(tables, promote_options="permissive").to_pandas()
+    if vocabulary is not None:
+        vocabulary.codes_to_categorical(dataframe)
+    return dataframe
+
+
+def parse_stream_to_dataframe(db_connection, function, chunk_size=10000, timedelta_cols: dict = None,
+                              timestamp_cols: list = None, vocabulary=None, **kwargs):
+    '''
+    Runs the query of function(**kwargs) and parses the records while they are streamed from the database, chunk_size
+    records at a time. Every chunk is converted column-wise into an Arrow table, without a dict per record, such that
+    at most chunk_size records are held as Python objects.
+    args:
+        db_connection: promg DatabaseConnection, the query runs in its own session with fetch size chunk_size
+        vocabulary: if given, the values of its columns are replaced by integer codes in every chunk (with
+          vocabulary.encode_codes) and returned as Categoricals, such that no strings are kept after a chunk is parsed
+    returns:
+        dataframe of the query result, same as parse_to_dataframe
+    '''
+    tables = []
+    for chunk in stream_record_chunks(db_connection, function(**kwargs), chunk_size):
+        dataframe = pd.DataFrame(dict(zip(chunk[0].keys(), zip(*(record.values() for record in chunk)))))
+        if timedelta_cols is not None:
+            for timedelta_col_name, unit in timedelta_cols.items():
+                transform_neo_duration(dataframe, timedelta_col_name, unit=unit)
+        if timestamp_cols is not None:
+            for timestamp_col in timestamp_cols:
+                transform_neo_date(dataframe, timestamp_col)
+        if vocabulary is not None:
+            vocabulary.encode_codes(dataframe)
+        tables.append(pa.Table.from_pandas(dataframe, preserve_index=False))
+    return concat_tables(tables, vocabulary)
+
+
+def parse_stream_to_dataframes(db_connection, function, discriminator, columns: dict, chunk_size=10000,
+                               vocabulary=None, **kwargs):
+    '''
+    Streaming parser for a query that returns several result sets at once, every record has a discriminator column
+    naming its result set and a "row" list with the values of the columns of the result set. The rows of a chunk are
+    grouped per result set and converted column-wise into Arrow tables, as in parse_stream_to_dataframe.
+    args:
+        columns: dict result set: columns of the values in the "row" lists
+        vocabulary: see parse_stream_to_dataframe
+    returns:
+        dict result set: dataframe, result sets without rows are left out
+    '''
+    tables = {}
+    for chunk in stream_record_chunks(db_connection, function(**kwargs), chunk_size):
+        rows = {}
+        for record in chunk:
+            rows.setdefault(record[discriminator], []).append(record["row"])
+        for result_set, result_set_rows in rows.items():
+            dataframe = pd.DataFrame(dict(zip(columns[result_set], zip(*result_set_rows))))
+            if vocabulary is not None:
+                vocabulary.encode_codes(dataframe)
+            tables.setdefault(result_set, []).append(pa.Table.from_pandas(dataframe, preserve_index=False))
+    return {result_set: concat_tables(result_set_tables, vocabulary)
+            for result_set, result_set_tables in tables.items()}
@@ -1,5 +1,73 @@
+import re
+
 from promg import Query
 
+# column: Cypher expression, per subgraph query. The RETURN clause of a subgraph query only contains the requested
+# columns, such that only the columns needed for the feature set are retrieved.
+TASK_SUBGRAPH_NODE_COLUMNS = {"task": "ti.cluster", "task_variant": "ti.ID", "case": "c.sysId", "actor": "r.sysId"}
+EVENT_SUBGRAPH_NODE_COLUMNS = {"activity": "e.activity+'+'+e.lifecycle", "case": "c.sysId", "actor": "r.sysId"}
+TASK_SUBGRAPH_EDGE_COLUMNS = {"task_1": "ti1.cluster", "task_2": "ti2.cluster",
+                              "task_variant_1": "ti1.ID", "task_variant_2": "ti2.ID",
+                              "case_1": "c1.sysId", "case_2": "c2.sysId", "actor_1": "r1.sysId", "actor_2": "r2.sysId",
+                              "duration": "duration.inSeconds(ti1.end_time, ti2.start_time)",
+                              "entity_type": "r.entityType"}
+EVENT_SUBGRAPH_EDGE_COLUMNS = {"activity_1": "e1.activity+'+'+e1.lifecycle",
+                               "activity_2": "e2.activity+'+'+e2.lifecycle",
+                               "case_1": "c1.sysId", "case_2": "c2.sysId", "actor_1": "r1.sysId", "actor_2": "r2.sysId",
+                               "duration": "duration.inSeconds(e1.timestamp, e2.timestamp)",
+                               "entity_type": "r.entityType"}
+
+
+def get_return_items(column_expressions: dict, columns: list = None):
+    '''
+    returns:
+        return items "expression AS column" of the requested columns (all columns if None), in the order of
+        column_expressions
+    '''
+    return ", ".join(f"{expression} AS {column}" for column, expression in column_expressions.items()
+                     if columns is None or column in columns)
+
+
+def get_count_item(aggregate=False):
+    '''
+    returns:
+        count return item if the rows are aggregated, i.e. counted per distinct combination of the returned columns
+    '''
+    return ", count(*) AS count" if aggregate else ""
+
+
+def get_return_columns(query_str: str):
+    '''
+    returns:
+        columns returned by the final RETURN clause of a query, in order
+    '''
+    return re.findall(r" AS (\w+)", query_str.rsplit("RETURN ", 1)[1])
+
+
+def get_discriminated_branch(query_str: str, subgraph_type: str):
+    '''
+    Rewrites the final RETURN clause of a subgraph query, such that the query returns its rows as a "row" list of the
+    values of its columns (in the order of get_return_columns) next to a "subgraph_type" discriminator column. Queries
+    rewritten like this can be combined with UNION ALL.
+    '''
+    match_str, return_items = query_str.rsplit("RETURN ", 1)
+    # columns are escaped, a bare column such as case could be parsed as the start of a CASE expression
+    row_items = ", ".join(f"`{column}`" for column in get_return_columns(query_str))
+    return f'''{match_str}WITH {return_items.strip()}
+            RETURN "{subgraph_type}" AS subgraph_type, [{row_items}] AS row
+            '''
+
+
+def get_window_subgraph_columns(subgraph_queries: dict):
+    '''
+    args:
+        subgraph_queries: dict subgraph type: (window query, query parameters), as in q_retrieve_window_subgraphs
+    returns:
+        dict subgraph type: columns of the "row" lists of q_retrieve_window_subgraphs
+    '''
+    return {subgraph_type: get_return_columns(window_query(start_day=0, end_day=0, **window_parameters).query_string)
+            for subgraph_type, (window_query, window_parameters) in subgraph_queries.items()}
+
 
 class ConceptDriftDetectionTasksQueryLibrary:
 
@@ -22,92 +90,366 @@ class ConceptDriftDetectionTasksQueryLibrary:
         return Query(query_str=query_str)
 
     @staticmethod
-    def q_retrieve_task_subgraph_nodes(start_date: str, end_date: str, case, resource, exclude_cluster=""):
+    def q_write_log_bounds(resource, case):
+        query_str = '''
+            MATCH (ti:TaskInstance)
+            WITH min(ti.start_time) AS start_time, max(ti.start_time) AS end_time
+            MERGE (m:LogMetadata {resource: $resource_type, case: $case_type})
+            SET m.start_time = start_time, m.end_time = end_time
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     })
+
+    @staticmethod
+    def q_write_graph_fingerprint(resource, case, graph_fingerprint):
+        query_str = '''
+            MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            SET m.graph_fingerprint = $graph_fingerprint
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type,
+                         "graph_fingerprint": graph_fingerprint
+                     })
+
+    @staticmethod
+    def q_write_graph_version(resource, case):
+        # a new version whenever the tasks are built, clustered or bucketed, which changes the task instances without
+        # necessarily changing their number
+        query_str = '''
+            MERGE (m:LogMetadata {resource: $resource_type, case: $case_type})
+            SET m.graph_version = randomUUID()
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     })
+
+    @staticmethod
+    def q_write_actor_frequencies(resource, case):
+        # same counts as q_retrieve_actor_list, without the frequency threshold
+        query_str = '''
+            MATCH (ti:TaskInstance)-[:CORR]->(r:$resource_node_label) WHERE ti.cluster IS NOT NULL
+            WITH r.sysId AS actor, COUNT(*) AS count ORDER BY actor
+            WITH collect(actor) AS actors, collect(count) AS actor_counts
+            MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            SET m.actors = actors, m.actor_counts = actor_counts
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     },
+                     template_string_parameters={
+                         "resource_node_label": resource.type
+                     })
+
+    @staticmethod
+    def q_write_collab_frequencies(resource, case):
+        # same counts as q_retrieve_collab_list, without the frequency threshold
+        query_str = '''
+            MATCH (r1:$resource_node_label)<-[:CORR]-(ti1:TaskInstance)-[:$df_ti_case]->
+                (ti2:TaskInstance)-[:CORR]->(r2:$resource_node_label) 
+                WHERE r1.sysId <> r2.sysId AND ti1.cluster IS NOT NULL AND ti2.cluster IS NOT NULL
+            WITH r1.sysId AS actor_1, r2.sysId AS actor_2, count(*) AS count ORDER BY actor_1, actor_2
+            WITH collect(actor_1) AS collab_actors_1, collect(actor_2) AS collab_actors_2,
+                collect(count) AS collab_counts
+            MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            SET m.collab_actors_1 = collab_actors_1, m.collab_actors_2 = collab_actors_2,
+                m.collab_counts = collab_counts
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     },
+                     template_string_parameters={
+                         "resource_node_label": resource.type,
+                         "df_ti_case": case.get_df_ti_label()
+                     })
+
+    @staticmethod
+    def q_retrieve_log_metadata(resource, case):
+        query_str = '''
+            MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            RETURN properties(m) AS metadata
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     })
+
+    @staticmethod
+    def q_get_day_bucket():
+        query_str = f'''
+            MATCH (ti:TaskInstance) WHERE ti.start_day IS NOT NULL
+            RETURN ti.start_day AS start_day
+            LIMIT 1
+            '''
+        return Query(query_str=query_str)
+
+    @staticmethod
+    def q_get_graph_fingerprint(resource, case):
+        # changes whenever events or task instances are added or removed (counts read from the count store), or the
+        # tasks are built, clustered or bucketed again (graph version written by q_write_graph_version)
+        query_str = '''
+            CALL {
+                MATCH (e:Event)
+                RETURN count(e) AS num_events
+            }
+            CALL {
+                MATCH (ti:TaskInstance)
+                RETURN count(ti) AS num_task_instances
+            }
+            OPTIONAL MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            RETURN num_events, num_task_instances, m.graph_version AS graph_version
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     })
+
+    @staticmethod
+    def q_get_graph_prefix_fingerprint(end_day: int, resource, case):
+        # same as q_get_graph_fingerprint, restricted to the events and task instances that end before end_day (day
+        # buckets), i.e. to the part of the graph the windows ending before end_day are retrieved from
+        query_str = '''
+            CALL {
+                MATCH (e:Event) WHERE e.end_day <= $end_day
+                RETURN count(e) AS num_events
+            }
+            CALL {
+                MATCH (ti:TaskInstance) WHERE ti.end_day <= $end_day
+                RETURN count(ti) AS num_task_instances
+            }
+            OPTIONAL MATCH (m:LogMetadata {resource: $resource_type, case: $case_type})
+            RETURN num_events, num_task_instances, m.graph_version AS graph_version
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "end_day": end_day,
+                         "resource_type": resource.type,
+                         "case_type": case.type
+                     })
+
+    @staticmethod
+    def q_retrieve_task_subgraph_nodes(start_day: int, end_day: int, case, resource, exclude_cluster="",
+                                       columns: list = None, aggregate=False):
         where_exclude_cluster = ""
         if not exclude_cluster == "":
-            where_exclude_cluster = f"AND ti.cluster <> \"{exclude_cluster}\""
+            where_exclude_cluster = "AND ti.cluster <> $exclude_cluster"
         query_str = f'''
             MATCH (r:$resource)<-[:CORR]-(ti:TaskInstance)-[:CORR]->(c:$case) 
-                WHERE date("$start_date") <= date(ti.start_time) AND date(ti.end_time) <= date("$end_date") 
+                WHERE $start_day <= ti.start_day AND ti.end_day <= $end_day 
                 AND ti.cluster IS NOT NULL $where_exclude_cluster
-            WITH ti.cluster AS task, ti.ID AS task_variant, c.sysId AS case, r.sysId AS actor
-            RETURN task, task_variant, case, actor
+            RETURN $return_items$count_item
             '''
 
         return Query(query_str=query_str,
+                     parameters={
+                         "start_day": start_day,
+                         "end_day": end_day,
+                         "exclude_cluster": exclude_cluster
+                     },
                      template_string_parameters={
-                         "start_date": start_date,
-                         "end_date": end_date,
                          "case": case.type,
                          "resource": resource.type,
-                         "where_exclude_cluster": where_exclude_cluster
+                         "where_exclude_cluster": where_exclude_cluster,
+                         "return_items": get_return_items(TASK_SUBGRAPH_NODE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
                      })
 
     @staticmethod
-    def q_retrieve_event_subgraph_nodes(start_date: str, end_date: str, case, resource):
+    def q_retrieve_event_subgraph_nodes(start_day: int, end_day: int, case, resource, columns: list = None,
+                                        aggregate=False):
         query_str = '''
             MATCH (r:$resource)<-[:CORR]-(e:Event)-[:CORR]->(c:$case) 
-                WHERE date("$start_date") <= date(e.timestamp) <= date("$end_date")
-            WITH e.activity+'+'+e.lifecycle AS activity, c.sysId AS case, r.sysId AS actor
-            RETURN activity, case, actor
+                WHERE $start_day <= e.start_day AND e.end_day <= $end_day
+            RETURN $return_items$count_item
             '''
         return Query(query_str=query_str,
+                     parameters={
+                         "start_day": start_day,
+                         "end_day": end_day
+                     },
                      template_string_parameters={
-                         "start_date": start_date,
-                         "end_date": end_date,
                          "case": case.type,
-                         "resource": resource.type
+                         "resource": resource.type,
+                         "return_items": get_return_items(EVENT_SUBGRAPH_NODE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
                      })
 
     @staticmethod
-    def q_retrieve_task_subgraph_edges(start_date: str, end_date: str, case, resource, exclude_cluster=""):
+    def q_retrieve_task_subgraph_edges(start_day: int, end_day: int, case, resource, exclude_cluster="",
+                                       columns: list = None, aggregate=False):
         where_exclude_cluster = ""
         if not exclude_cluster == "":
-            where_exclude_cluster = f"AND ti1.cluster <> \"{exclude_cluster}\" AND ti2.cluster <> \"{exclude_cluster}\""
+            where_exclude_cluster = "AND ti1.cluster <> $exclude_cluster AND ti2.cluster <> $exclude_cluster"
         query_str = f'''
                 MATCH (ti1:TaskInstance)-[r:$df_ti_case|$df_ti_resource]->(ti2:TaskInstance) 
-                    WHERE date("{start_date}") <= date(ti1.end_time) AND date(ti2.start_time) <= date("{end_date}") 
+                    WHERE $start_day <= ti1.end_day AND ti2.start_day <= $end_day 
                     AND ti1.cluster IS NOT NULL AND ti2.cluster IS NOT NULL $where_exclude_cluster
                 MATCH (r1:$resource_node_label)<-[:CORR]-(ti1)-[:CORR]->(c1:$case_node_label)
                 MATCH (r2:$resource_node_label)<-[:CORR]-(ti2)-[:CORR]->(c2:$case_node_label)
-                WITH ti1.cluster AS task_1, ti2.cluster AS task_2, ti1.ID AS task_variant_1, ti2.ID AS task_variant_2, 
-                    c1.sysId AS case_1, c2.sysId AS case_2, r1.sysId AS actor_1, r2.sysId AS actor_2,
-                    duration.inSeconds(ti1.end_time, ti2.start_time) AS duration, r.entityType AS entity_type
-                RETURN task_1, task_2, task_variant_1, task_variant_2, case_1, case_2, actor_1, actor_2, duration, 
-                    entity_type
+                RETURN $return_items$count_item
                 '''
         return Query(query_str=query_str,
+                     parameters={
+                         "start_day": start_day,
+                         "end_day": end_day,
+                         "exclude_cluster": exclude_cluster
+                     },
                      template_string_parameters={
-                         "start_date": start_date,
-                         "end_date": end_date,
                          "case_node_label": case.type,
                          "resource_node_label": resource.type,
                          "df_ti_case": case.get_df_ti_label(),
                          "df_ti_resource": resource.get_df_ti_label(),
-                         "where_exclude_cluster": where_exclude_cluster
+                         "where_exclude_cluster": where_exclude_cluster,
+                         "return_items": get_return_items(TASK_SUBGRAPH_EDGE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
                      })
 
     @staticmethod
-    def q_retrieve_event_subgraph_edges(start_date: str, end_date: str, case, resource):
+    def q_retrieve_event_subgraph_edges(start_day: int, end_day: int, case, resource, columns: list = None,
+                                        aggregate=False):
         query_str = f'''
                 MATCH (e1:Event)-[r:$df_case|$df_resource]->(e2:Event) 
-                    WHERE date("$start_date") <= date(e1.timestamp) 
-                    AND date(e2.timestamp) <= date("$end_date")
+                    WHERE $start_day <= e1.start_day AND e2.end_day <= $end_day
                 MATCH (r1:$resource_node_label)<-[:CORR]-(e1)-[:CORR]->(c1:$case_node_label)
                 MATCH (r2:$resource_node_label)<-[:CORR]-(e2)-[:CORR]->(c2:$case_node_label)
-                WITH e1.activity+'+'+e1.lifecycle AS activity_1, e2.activity+'+'+e2.lifecycle AS activity_2, 
-                    c1.sysId AS case_1, c2.sysId AS case_2, r1.sysId AS actor_1, r2.sysId AS actor_2,
-                    duration.inSeconds(e1.timestamp, e2.timestamp) AS duration, r.entityType AS entity_type
-                RETURN activity_1, activity_2, case_1, case_2, actor_1, actor_2, duration, entity_type
+                RETURN $return_items$count_item
                 '''
         return Query(query_str=query_str,
+                     parameters={
+                         "start_day": start_day,
+                         "end_day": end_day
+                     },
                      template_string_parameters={
-                         "start_date": start_date,
-                         "end_date": end_date,
                          "case_node_label": case.type,
                          "resource_node_label": resource.type,
                          "df_case": case.get_df_label(),
-                         "df_resource": resource.get_df_label()
+                         "df_resource": resource.get_df_label(),
+                         "return_items": get_return_items(EVENT_SUBGRAPH_EDGE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
+                     })
+
+    @staticmethod
+    def q_retrieve_window_subgraphs(start_day: int, end_day: int, subgraph_queries: dict):
+        '''
+        Combines the window queries of several subgraph types into a single query, such that the subgraphs of a window
+        are retrieved in one round trip
+        args:
+            subgraph_queries: dict subgraph type: (window query, query parameters)
+        '''
+        branches = []
+        parameters = {}
+        for subgraph_type, (window_query, window_parameters) in subgraph_queries.items():
+            query = window_query(start_day=start_day, end_day=end_day, **window_parameters)
+            branches.append(get_discriminated_branch(query.query_string, subgraph_type))
+            parameters.update(query.kwargs or {})
+        query_str = f'''
+            CALL {{
+                {"UNION ALL".join(branches)}
+            }}
+            RETURN subgraph_type, row
+            '''
+        return Query(query_str=query_str,
+                     parameters=parameters)
+
+    @staticmethod
+    def q_retrieve_all_task_subgraph_nodes(case, resource, exclude_cluster="", columns: list = None,
+                                           aggregate=False):
+        # from_day/to_day: day buckets of the properties compared to the window bounds
+        where_exclude_cluster = ""
+        if not exclude_cluster == "":
+            where_exclude_cluster = "AND ti.cluster <> $exclude_cluster"
+        query_str = '''
+            MATCH (r:$resource)<-[:CORR]-(ti:TaskInstance)-[:CORR]->(c:$case) 
+                WHERE ti.cluster IS NOT NULL $where_exclude_cluster
+            RETURN $return_items,
+                ti.start_day AS from_day,
+                ti.end_day AS to_day$count_item
+            '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "exclude_cluster": exclude_cluster
+                     },
+                     template_string_parameters={
+                         "case": case.type,
+                         "resource": resource.type,
+                         "where_exclude_cluster": where_exclude_cluster,
+                         "return_items": get_return_items(TASK_SUBGRAPH_NODE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
+                     })
+
+    @staticmethod
+    def q_retrieve_all_event_subgraph_nodes(case, resource, columns: list = None, aggregate=False):
+        query_str = '''
+            MATCH (r:$resource)<-[:CORR]-(e:Event)-[:CORR]->(c:$case) 
+            RETURN $return_items, e.start_day AS from_day, e.end_day AS to_day$count_item
+            '''
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "case": case.type,
+                         "resource": resource.type,
+                         "return_items": get_return_items(EVENT_SUBGRAPH_NODE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
+                     })
+
+    @staticmethod
+    def q_retrieve_all_task_subgraph_edges(case, resource, exclude_cluster="", columns: list = None,
+                                           aggregate=False):
+        where_exclude_cluster = ""
+        if not exclude_cluster == "":
+            where_exclude_cluster = "AND ti1.cluster <> $exclude_cluster AND ti2.cluster <> $exclude_cluster"
+        query_str = '''
+                MATCH (ti1:TaskInstance)-[r:$df_ti_case|$df_ti_resource]->(ti2:TaskInstance) 
+                    WHERE ti1.cluster IS NOT NULL AND ti2.cluster IS NOT NULL $where_exclude_cluster
+                MATCH (r1:$resource_node_label)<-[:CORR]-(ti1)-[:CORR]->(c1:$case_node_label)
+                MATCH (r2:$resource_node_label)<-[:CORR]-(ti2)-[:CORR]->(c2:$case_node_label)
+                RETURN $return_items,
+                    ti1.end_day AS from_day,
+                    ti2.start_day AS to_day$count_item
+                '''
+        return Query(query_str=query_str,
+                     parameters={
+                         "exclude_cluster": exclude_cluster
+                     },
+                     template_string_parameters={
+                         "case_node_label": case.type,
+                         "resource_node_label": resource.type,
+                         "df_ti_case": case.get_df_ti_label(),
+                         "df_ti_resource": resource.get_df_ti_label(),
+                         "where_exclude_cluster": where_exclude_cluster,
+                         "return_items": get_return_items(TASK_SUBGRAPH_EDGE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
+                     })
+
+    @staticmethod
+    def q_retrieve_all_event_subgraph_edges(case, resource, columns: list = None, aggregate=False):
+        query_str = '''
+                MATCH (e1:Event)-[r:$df_case|$df_resource]->(e2:Event) 
+                MATCH (r1:$resource_node_label)<-[:CORR]-(e1)-[:CORR]->(c1:$case_node_label)
+                MATCH (r2:$resource_node_label)<-[:CORR]-(e2)-[:CORR]->(c2:$case_node_label)
+                RETURN $return_items,
+                    e1.start_day AS from_day,
+                    e2.end_day AS to_day$count_item
+                '''
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "case_node_label": case.type,
+                         "resource_node_label": resource.type,
+                         "df_case": case.get_df_label(),
+                         "df_resource": resource.get_df_label(),
+                         "return_items": get_return_items(EVENT_SUBGRAPH_EDGE_COLUMNS, columns),
+                         "count_item": get_count_item(aggregate)
                      })
 
     @staticmethod
@@ -117,9 +459,11 @@ class ConceptDriftDetectionTasksQueryLibrary:
             RETURN DISTINCT ti.variant AS variant
             '''
         return Query(query_str=query_str,
-                     template_string_parameters={
-                         "aggregation_type": aggregation_type,
+                     parameters={
                          "aggregation_id": aggregation_id
+                     },
+                     template_string_parameters={
+                         "aggregation_type": aggregation_type
                      })
 
     @staticmethod
@@ -131,9 +475,11 @@ class ConceptDriftDetectionTasksQueryLibrary:
                 RETURN DISTINCT action1, action2
                 '''
         return Query(query_str=query_str,
+                     parameters={
+                         "aggregation_id": aggregation_id
+                     },
                      template_string_parameters={
                          "aggregation_type": aggregation_type,
-                         "aggregation_id": aggregation_id,
                          "df_case": case.get_df_label(),
                          "df_resource": resource.get_df_label()
                      })
@@ -146,9 +492,11 @@ class ConceptDriftDetectionTasksQueryLibrary:
                 RETURN DISTINCT action
                 '''
         return Query(query_str=query_str,
-                     template_string_parameters={
-                         "aggregation_type": aggregation_type,
+                     parameters={
                          "aggregation_id": aggregation_id
+                     },
+                     template_string_parameters={
+                         "aggregation_type": aggregation_type
                      })
 
     @staticmethod
@@ -159,8 +507,10 @@ class ConceptDriftDetectionTasksQueryLibrary:
             RETURN actor
             '''
         return Query(query_str=query_str,
+                     parameters={
+                         "min_freq": min_freq
+                     },
                      template_string_parameters={
-                         "min_freq": min_freq,
                          "resource_node_label": resource.type
                      })
 
@@ -178,26 +528,26 @@ class ConceptDriftDetectionTasksQueryLibrary:
             WITH DISTINCT r1.sysId AS actor_1, r2.sysId AS actor_2, count(*) AS count WHERE count > $min_freq
             RETURN actor_1, actor_2'''
         return Query(query_str=query_str,
+                     parameters={
+                         "min_freq": min_freq
+                     },
                      template_string_parameters={
-                         "min_freq": min_freq,
                          "resource_node_label": resource.type,
                          "df_ti_case": case.get_df_ti_label()
                      })
 
     @staticmethod
-    def q_retrieve_case_durations(start_date, end_date, case):
-        query_str = f'''
+    def q_retrieve_case_lifecycles(case):
+        # one row per case, with the days of the start of its first and the end of its last task instance
+        query_str = '''
             MATCH (ti1:TaskInstance)-[:CORR]->(c:$case_node_label)<-[:CORR]-(ti2:TaskInstance)
-                WHERE date("$start_date") <= date(ti2.end_time) AND date(ti1.start_time) <= date("$end_date")
-                AND NOT (:TaskInstance)-[:$df_ti_case]->(ti1) 
+                WHERE NOT (:TaskInstance)-[:$df_ti_case]->(ti1) 
                 AND NOT (ti2)-[:$df_ti_case]->(:TaskInstance) 
-            WITH duration.inSeconds(ti1.start_time, ti2.end_time) AS duration
-            RETURN duration
+            RETURN c.sysId AS case, ti1.start_day AS start_day, ti2.end_day AS end_day,
+                duration.inSeconds(ti1.start_time, ti2.end_time) AS duration
             '''
         return Query(query_str=query_str,
                      template_string_parameters={
-                         "start_date": start_date,
-                         "end_date": end_date,
                          "case_node_label": case.type,
                          "df_ti_case": case.get_df_ti_label()
                      })
@@ -12,7 +12,7 @@ class TaskClusteringQueryLibrary:
             RETURN variant, variant_length, ID, frequency
             '''
         return Query(query_str=query_str,
-                     template_string_parameters={
+                     parameters={
                          "min_variant_freq": min_variant_freq
                      })
 
@@ -33,12 +33,13 @@ class TaskClusteringQueryLibrary:
             "MATCH (ti:TaskInstance) WHERE ti.variant = $variant
              RETURN ti",
             "WITH ti
-             SET ti.cluster = '$cluster'",
-             {batchSize: $batch_size})'''
+             SET ti.cluster = $cluster",
+             {batchSize: $batch_size, params: {variant: $variant, cluster: $cluster}})'''
+        # clusters are stored as strings
         return Query(query_str=query_str,
-                     template_string_parameters={
-                         "variant": variant,
-                         "cluster": cluster
+                     parameters={
+                         "variant": list(variant),
+                         "cluster": str(cluster)
                      })
 
     @staticmethod
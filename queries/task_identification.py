@@ -232,3 +232,40 @@ class TaskIdentifierLibrary:
             {batchSize:$batch_size})'''
 
         return Query(query_str=query_str)
+
+    @staticmethod
+    def get_set_task_instance_days_query(only_missing=False):
+        # days since the date of the first task instance, which is day 0 of the windows in concept drift detection
+        query_str = '''
+            CALL apoc.periodic.iterate(
+            "MATCH (ti:TaskInstance)
+             WITH date(min(ti.start_time)) AS log_start
+             MATCH (ti:TaskInstance) $where_missing
+             RETURN ti, log_start",
+            "WITH ti, log_start
+             SET ti.start_day = duration.inDays(log_start, date(ti.start_time)).days,
+                 ti.end_day = duration.inDays(log_start, date(ti.end_time)).days",
+            {batchSize:$batch_size})'''
+
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "where_missing": "WHERE ti.start_day IS NULL" if only_missing else ""
+                     })
+
+    @staticmethod
+    def get_set_event_days_query(only_missing=False):
+        # an event has a single timestamp, start_day and end_day are equal
+        query_str = '''
+            CALL apoc.periodic.iterate(
+            "MATCH (ti:TaskInstance)
+             WITH date(min(ti.start_time)) AS log_start
+             MATCH (e:Event) $where_missing
+             RETURN e, log_start",
+            "WITH e, log_start, duration.inDays(log_start, date(e.timestamp)).days AS day
+             SET e.start_day = day, e.end_day = day",
+            {batchSize:$batch_size})'''
+
+        return Query(query_str=query_str,
+                     template_string_parameters={
+                         "where_missing": "WHERE e.start_day IS NULL" if only_missing else ""
+                     })
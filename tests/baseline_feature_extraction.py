@@ -0,0 +1,371 @@
+'''
+Feature extraction of the baseline implementation (per-window extractors iterating over the rows of every window and the
+feature alignment by name), kept as the reference the vectorised feature extraction is tested against
+'''
+import numpy as np
+
+
+def apply_feature_extraction(f_extr, features, actor="", actor_1="", actor_2=""):
+    '''
+    Adapted from Adams et al. (2021) https://github.com/niklasadams/explainable_concept_drift_pm
+    '''
+    feature_vectors = [[] for i in range(0, f_extr.num_windows)]
+    for feature in features:
+        results = []
+        # task node based features
+        if feature == "case_volume":
+            results = extract_number_of_cases(f_extr.task_subgraphs_nodes, actor)
+        if feature == "distinct_task_count":
+            results = extract_distinct_performance_instance_count(f_extr.task_subgraphs_nodes, 'task', actor)
+        if feature == "total_task_count":
+            results = extract_total_performance_instance_count(f_extr.task_subgraphs_nodes, 'task', actor)
+        if feature == "distinct_task_variant_count":
+            results = extract_distinct_performance_instance_count(f_extr.task_subgraphs_nodes, 'task_variant', actor)
+        if feature == "count_per_task":
+            results = extract_count_per_performance_instance(f_extr.task_subgraphs_nodes, 'task', actor)
+        if feature == "count_per_task_relative":
+            results = extract_count_per_performance_instance_normalized(f_extr.task_subgraphs_nodes, 'task', actor)
+        if feature == "count_per_task_variant":
+            results = extract_count_per_performance_instance(f_extr.task_subgraphs_nodes, 'task_variant', actor)
+        if feature == "count_per_task_variant_relative":
+            results = extract_count_per_performance_instance_normalized(f_extr.task_subgraphs_nodes, 'task_variant',
+                                                                        actor)
+
+        # task edge based features -- actor
+        if feature == "distinct_task_handover_count_actor":
+            results = extract_distinct_handover_count(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2,
+                                                      f_extr.actor.type)
+        if feature == "distinct_task_variant_handover_count_actor":
+            results = extract_distinct_handover_count(f_extr.task_subgraphs_edges, 'task_variant', actor_1,
+                                                      actor_2, f_extr.actor.type)
+        if feature == "total_task_handover_count_actor":
+            results = extract_total_handover_count(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2, f_extr.actor.type)
+
+        if feature == "count_per_task_handover_actor_relative":
+            results = extract_count_per_handover_normalized(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2,
+                                                            f_extr.actor.type)
+        if feature == "count_per_task_handover_actor":
+            results = extract_count_per_handover(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2, f_extr.actor.type)
+        if feature == "count_per_task_variant_handover_actor_relative":
+            results = extract_count_per_handover_normalized(f_extr.task_subgraphs_edges, 'task_variant', actor_1,
+                                                            actor_2, f_extr.actor.type)
+        if feature == "count_per_task_variant_handover_actor":
+            results = extract_count_per_handover(f_extr.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                                                 f_extr.actor.type)
+
+        # task edge based features -- case
+        if feature == "distinct_task_handover_count_case":
+            results = extract_distinct_handover_count(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2, f_extr.case.type)
+        if feature == "distinct_task_variant_handover_count_case":
+            results = extract_distinct_handover_count(f_extr.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                                                      f_extr.case.type)
+        if feature == "total_task_handover_count_case":
+            results = extract_total_handover_count(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2, f_extr.case.type)
+        if feature == "count_per_task_handover_case_relative":
+            results = extract_count_per_handover_normalized(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2,
+                                                            f_extr.case.type)
+        if feature == "count_per_task_handover_case":
+            results = extract_count_per_handover(f_extr.task_subgraphs_edges, 'task', actor_1, actor_2, f_extr.case.type)
+        if feature == "count_per_task_variant_handover_case_relative":
+            results = extract_count_per_handover_normalized(f_extr.task_subgraphs_edges, 'task_variant', actor_1,
+                                                            actor_2, f_extr.case.type)
+        if feature == "count_per_task_variant_handover_case":
+            results = extract_count_per_handover(f_extr.task_subgraphs_edges, 'task_variant', actor_1, actor_2,
+                                                 f_extr.case.type)
+
+        # event node based features
+        if feature == "distinct_activity_count":
+            results = extract_distinct_performance_instance_count(f_extr.event_subgraphs_nodes, 'activity',
+                                                                  actor)
+        if feature == "count_per_activity_relative":
+            results = extract_count_per_performance_instance_normalized(f_extr.event_subgraphs_nodes,
+                                                                        'activity', actor)
+        if feature == "count_per_activity":
+            results = extract_count_per_performance_instance(f_extr.event_subgraphs_nodes, 'activity',
+                                                             actor)
+        if feature == "total_activity_count":
+            results = extract_total_performance_instance_count(f_extr.event_subgraphs_nodes, 'activity',
+                                                               actor)
+
+        # event edge based features -- actor
+        if feature == "distinct_activity_handover_count_actor":
+            results = extract_distinct_handover_count(f_extr.event_subgraphs_edges, 'activity', actor_1,
+                                                      actor_2, f_extr.actor.type)
+        if feature == "count_per_activity_handover_actor_relative":
+            results = extract_count_per_handover_normalized(f_extr.event_subgraphs_edges, 'activity',
+                                                            actor_1, actor_2, f_extr.actor.type)
+        if feature == "count_per_activity_handover_actor":
+            results = extract_count_per_handover(f_extr.event_subgraphs_edges, 'activity',
+                                                 actor_1, actor_2, f_extr.actor.type)
+        # event edge based features -- case
+        if feature == "distinct_activity_handover_count_case":
+            results = extract_distinct_handover_count(f_extr.event_subgraphs_edges, 'activity', actor_1,
+                                                      actor_2, f_extr.case.type)
+        if feature == "count_per_activity_handover_case_relative":
+            results = extract_count_per_handover_normalized(f_extr.event_subgraphs_edges, 'activity',
+                                                            actor_1, actor_2, f_extr.case.type)
+        if feature == "count_per_activity_handover_case":
+            results = extract_count_per_handover(f_extr.event_subgraphs_edges, 'activity',
+                                                 actor_1, actor_2, f_extr.case.type)
+
+        # global features
+        if feature == "average_case_duration":
+            results = extract_average_case_duration(f_extr.durations)
+        if feature == "case_throughput_speed":
+            results = extract_case_throughput_speed(f_extr.durations)
+        if feature == "case_throughput_velocity":
+            results = extract_case_throughput_velocity(f_extr.durations)
+
+        # more feature
+        for i in range(0, len(results)):
+            for result in results[i]:
+                feature_vectors[i].append(result)
+    # set non existent features to zero
+    feature_names__ = []
+    for window in range(0, f_extr.num_windows):
+        for feature in range(0, len(feature_vectors[window])):
+            feature_names__.append(feature_vectors[window][feature][0])
+
+    feature_names = list(set(feature_names__))
+
+    feature_lists = []
+    for feature_name in range(0, len(feature_names)):
+        feature_list = []
+        for window in range(0, f_extr.num_windows):
+            existing_features = [i[0] for i in feature_vectors[window]]
+            if feature_names[feature_name] in existing_features:
+                # find index
+                idx = existing_features.index(feature_names[feature_name])
+                feature_list.append(feature_vectors[window][idx][1])
+            else:
+                feature_list.append(0)
+        feature_lists.append(feature_list)
+
+    return feature_names, np.asarray(feature_lists).transpose()
+
+
+def extract_distinct_performance_instance_count(subgraphs_nodes, node_type, actor):
+    results = []
+    for df_subgraph in subgraphs_nodes:
+        all_instances = []
+        for index, row in df_subgraph.iterrows():
+            if actor == "":
+                all_instances.append(row[node_type])
+            else:
+                if row['actor'] == actor:
+                    all_instances.append(row[node_type])
+        results.append([(f'distinct_{node_type}_count', len(set(all_instances)))])
+    return results
+
+
+def extract_number_of_cases(task_subgraphs_nodes, actor):
+    results = []
+    for df_subgraph in task_subgraphs_nodes:
+        all_cases = []
+        for index, row in df_subgraph.iterrows():
+            if actor == "":
+                all_cases.append(row['case'])
+            else:
+                if row['actor'] == actor:
+                    all_cases.append(row['case'])
+        results.append([('case_count', len(set(all_cases)))])
+    return results
+
+
+def extract_count_per_performance_instance(subgraphs_nodes, node_type, actor):
+    results = []
+    for df_subgraph in subgraphs_nodes:
+        count_per_instance = {}
+        total_count = 0
+        for index, row in df_subgraph.iterrows():
+            if actor == "":
+                if not row[node_type] in count_per_instance.keys():
+                    count_per_instance[row[node_type]] = 0
+                count_per_instance[row[node_type]] += 1
+            else:
+                if row['actor'] == actor:
+                    if not row[node_type] in count_per_instance.keys():
+                        count_per_instance[row[node_type]] = 0
+                    count_per_instance[row[node_type]] += 1
+        subgraph_results = [(f'{node_type}_{str(instance)}_freq', count_per_instance[instance]) for instance in
+                            count_per_instance.keys()]
+        results.append(subgraph_results)
+    return results
+
+
+def extract_count_per_performance_instance_normalized(subgraphs_nodes, node_type, actor):
+    results = []
+    for df_subgraph in subgraphs_nodes:
+        count_per_instance = {}
+        total_count = 0
+        for index, row in df_subgraph.iterrows():
+            if actor == "":
+                if not row[node_type] in count_per_instance.keys():
+                    count_per_instance[row[node_type]] = 0
+                count_per_instance[row[node_type]] += 1
+                total_count += 1
+            else:
+                if row['actor'] == actor:
+                    if not row[node_type] in count_per_instance.keys():
+                        count_per_instance[row[node_type]] = 0
+                    count_per_instance[row[node_type]] += 1
+                    total_count += 1
+        subgraph_results = [
+            (f'{node_type}_{str(instance)}_relative_freq', count_per_instance[instance] / total_count * 100) for
+            instance in
+            count_per_instance.keys()]
+        results.append(subgraph_results)
+    return results
+
+
+def extract_total_performance_instance_count(subgraphs_nodes, node_type, actor):
+    results = []
+    for df_subgraph in subgraphs_nodes:
+        all_instances = []
+        for index, row in df_subgraph.iterrows():
+            if actor == "":
+                all_instances.append(row[node_type])
+            else:
+                if row['actor'] == actor:
+                    all_instances.append(row[node_type])
+        results.append([(f'total_{node_type}_count', len(all_instances))])
+    return results
+
+
+def extract_distinct_handover_count(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
+    results = []
+    for df_subgraph in subgraphs_edges:
+        if entity_type != "":
+            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
+        all_handovers = []
+        for index, row in df_subgraph.iterrows():
+            if actor_1 == "" and actor_2 == "":
+                all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            elif actor_1 == "":
+                if row['actor_2'] == actor_2:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            elif actor_2 == "":
+                if row['actor_1'] == actor_1:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            else:
+                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+        results.append([(f"distinct_{node_type}_handover_count", len(set(all_handovers)))])
+    return results
+
+
+def extract_total_handover_count(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
+    results = []
+    for df_subgraph in subgraphs_edges:
+        if entity_type != "":
+            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
+        all_handovers = []
+        for index, row in df_subgraph.iterrows():
+            if actor_1 == "" and actor_2 == "":
+                all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            elif actor_1 == "":
+                if row['actor_2'] == actor_2:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            elif actor_2 == "":
+                if row['actor_1'] == actor_1:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+            else:
+                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
+                    all_handovers.append(f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}")
+        results.append([(f"total_{node_type}_handover_count", len(all_handovers))])
+    return results
+
+
+def extract_count_per_handover(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
+    results = []
+    for df_subgraph in subgraphs_edges:
+        if entity_type != "":
+            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
+        count_per_handover = {}
+        for index, row in df_subgraph.iterrows():
+            if actor_1 == "" and actor_2 == "":
+                if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+            elif actor_1 == "":
+                if row['actor_2'] == actor_2:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+            elif actor_2 == "":
+                if row['actor_1'] == actor_1:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+            else:
+                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+        subgraph_results = [(f'{node_type}_{str(handover)}_count', count_per_handover[handover]) for handover in
+                            count_per_handover.keys()]
+        results.append(subgraph_results)
+    return results
+
+
+def extract_count_per_handover_normalized(subgraphs_edges, node_type, actor_1="", actor_2="", entity_type=""):
+    results = []
+    for df_subgraph in subgraphs_edges:
+        if entity_type != "" and not df_subgraph.empty:
+            df_subgraph = df_subgraph[df_subgraph["entity_type"] == entity_type]
+        count_per_handover = {}
+        total_count = 0
+        for index, row in df_subgraph.iterrows():
+            if actor_1 == "" and actor_2 == "":
+                if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+                total_count += 1
+            elif actor_1 == "":
+                if row['actor_2'] == actor_2:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+                    total_count += 1
+            elif actor_2 == "":
+                if row['actor_1'] == actor_1:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+                    total_count += 1
+            else:
+                if row['actor_1'] == actor_1 and row['actor_2'] == actor_2:
+                    if f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}" not in count_per_handover.keys():
+                        count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] = 0
+                    count_per_handover[f"{row[f'{node_type}_1']}_{row[f'{node_type}_2']}"] += 1
+                    total_count += 1
+        subgraph_results = [
+            (f'{node_type}_{str(handover)}_relative_freq', count_per_handover[handover] / total_count * 100)
+            for handover in count_per_handover.keys()]
+        results.append(subgraph_results)
+    return results
+
+
+def extract_average_case_duration(durations):
+    results = []
+    for df_window_durations in durations:
+        results.append([(f"average_case_duration", df_window_durations['duration'].mean() / 3600 / 24)])
+    return results
+
+
+def extract_case_throughput_speed(durations):
+    results = []
+    for df_window_durations in durations:
+        average_duration_days = df_window_durations['duration'].mean() / 3600 / 24
+        case_throughput_speed = len(df_window_durations.index) / average_duration_days
+        results.append([(f"case_throughput_speed", case_throughput_speed)])
+    return results
+
+
+def extract_case_throughput_velocity(durations):
+    results = []
+    for df_window_durations in durations:
+        average_duration_days = df_window_durations['duration'].mean() / 3600 / 24
+        case_throughput_velocity = len(df_window_durations.index) / average_duration_days / average_duration_days
+        results.append([(f"case_throughput_velocity", case_throughput_velocity)])
+    return results
@@ -0,0 +1,67 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.task_concept_drift_detection.feature_extraction import FeatureExtraction
+
+ACTORS = [f"User_{i}" for i in range(6)]
+TASKS = ["T01", "T02", "m01", "A_B", "C"]
+ACTIVITIES = ["A_x+complete", "O_y+start", "W_z+complete"]
+CASES = [f"c{i}" for i in range(20)]
+
+
+def make_window_nodes(rng, num_rows):
+    return pd.DataFrame({"task": rng.choice(TASKS, num_rows), "task_variant": rng.integers(1, 8, num_rows),
+                         "case": rng.choice(CASES, num_rows), "actor": rng.choice(ACTORS, num_rows),
+                         "activity": rng.choice(ACTIVITIES, num_rows)})
+
+
+def make_window_edges(rng, num_rows, node_type):
+    values = ACTIVITIES if node_type == "activity" else TASKS
+    return pd.DataFrame({f"{node_type}_1": rng.choice(values, num_rows), f"{node_type}_2": rng.choice(values, num_rows),
+                         "task_variant_1": rng.integers(1, 8, num_rows), "task_variant_2": rng.integers(1, 8, num_rows),
+                         "case_1": rng.choice(CASES, num_rows), "case_2": rng.choice(CASES, num_rows),
+                         "actor_1": rng.choice(ACTORS, num_rows), "actor_2": rng.choice(ACTORS, num_rows),
+                         "entity_type": rng.choice(["CaseAWO", "Resource"], num_rows)})
+
+
+def make_subgraphs(rng, num_windows, make_window, empty_windows=(3,)):
+    return [make_window(rng, 0 if window in empty_windows else int(rng.integers(5, 40)))
+            for window in range(0, num_windows)]
+
+
+@pytest.fixture
+def working_directory(tmp_path, monkeypatch):
+    '''
+    Runs the test in a temporary directory, in which the performance recorders and caches write their files
+    '''
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("perf")
+    return tmp_path
+
+
+@pytest.fixture
+def f_extr(working_directory):
+    '''
+    FeatureExtraction with synthetic per-window subgraphs instead of subgraphs retrieved from the database
+    '''
+    rng = np.random.default_rng(0)
+    num_windows = 8
+    f_extr = FeatureExtraction(None, "test", SimpleNamespace(type="CaseAWO"), SimpleNamespace(type="Resource"), "")
+    f_extr.num_windows = num_windows
+    f_extr.task_subgraphs_nodes = make_subgraphs(rng, num_windows, make_window_nodes)
+    f_extr.event_subgraphs_nodes = make_subgraphs(rng, num_windows, make_window_nodes)
+    f_extr.task_subgraphs_edges = make_subgraphs(rng, num_windows, lambda rng, n: make_window_edges(rng, n, "task"))
+    f_extr.event_subgraphs_edges = make_subgraphs(rng, num_windows,
+                                                  lambda rng, n: make_window_edges(rng, n, "activity"))
+    # the baseline performance features read the durations in seconds, the current ones in days
+    durations = [rng.random(10) * 1e6 for _ in range(0, num_windows)]
+    f_extr.durations = [pd.DataFrame({"duration": duration, "duration_days": duration / 3600 / 24})
+                        for duration in durations]
+    return f_extr
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+import ruptures as rpt
+from ruptures.costs import CostRbf
+
+from modules.task_concept_drift_detection import change_point_detection
+
+PENALTIES = [0.1, 0.2, 0.3, 0.5, 0.7, 1, 2, 3, 5, 10, 20]
+
+
+def make_series(seed=0, num_windows=60):
+    # three segments with another mean, in two reduced dimensions
+    rng = np.random.default_rng(seed)
+    means = np.repeat([[0, 0], [2, 1], [0.5, -1]], [20, 25, num_windows - 45], axis=0)
+    return means + rng.normal(0, 0.5, (num_windows, 2))
+
+
+def baseline_rpt_pelt(series, pen):
+    algo = rpt.Pelt(model="rbf", min_size=1, jump=1).fit(series)
+    return algo.predict(pen=pen)[:-1]
+
+
+def test_cumsum_cost_matches_rbf_cost():
+    series = make_series()
+    cost = change_point_detection.CostRbfCumsum().fit(series)
+    expected_cost = CostRbf().fit(series)
+    for start, end in [(0, 1), (0, 60), (5, 17), (20, 45), (44, 46)]:
+        assert cost.error(start, end) == pytest.approx(expected_cost.error(start, end))
+
+
+@pytest.mark.parametrize("pen", PENALTIES)
+def test_rpt_pelt_matches_baseline(pen):
+    series = make_series()
+    assert change_point_detection.rpt_pelt(series, pen=pen) == baseline_rpt_pelt(series, pen)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_penalty_path_matches_pelt_per_penalty(seed):
+    series = make_series(seed)
+    dict_cps = change_point_detection.rpt_pelt_penalty_path(series, PENALTIES)
+    assert dict_cps == {pen: baseline_rpt_pelt(series, pen) for pen in PENALTIES}
+
+
+@pytest.mark.parametrize("backend, params", [("pelt", {}), ("binseg", {}), ("bottomup", {}),
+                                             ("window", {"width": 10})])
+def test_detect_change_points_finds_segments(backend, params):
+    dict_cps, runtime = change_point_detection.detect_change_points(make_series(), [3], backend=backend, **params)
+    assert dict_cps[3] == pytest.approx([20, 45], abs=2)
+    assert runtime >= 0
+
+
+@pytest.mark.parametrize("backend, params", [("pelt", {"width": 10}), ("binseg", {"width": 10}), ("dynp", {})])
+def test_detect_change_points_rejects_unknown_settings(backend, params):
+    with pytest.raises(ValueError):
+        change_point_detection.detect_change_points(make_series(), [3], backend=backend, **params)
+
+
+def test_online_detector_alerts_step_change():
+    rng = np.random.default_rng(0)
+    features = np.abs(rng.normal(0.2, 0.03, (200, 2)))
+    features[120:, 0] += 0.2
+    detector = change_point_detection.BayesianOnlineChangePointDetector(prior_beta=0.01)
+    alerts = [(window, detector.update(["a", "b"], features[window])) for window in range(0, len(features))]
+    alerts = [(window, change_point) for window, change_point in alerts if change_point is not None]
+    assert len(alerts) == 1
+    window, change_point = alerts[0]
+    assert change_point == pytest.approx(120, abs=1)
+    assert change_point <= window <= change_point + 5
+
+
+def test_online_detector_continues_after_save_and_load(tmp_path):
+    rng = np.random.default_rng(1)
+    features = np.abs(rng.normal(0.2, 0.03, (150, 2)))
+    features[90:, 1] += 0.2
+    active = np.ones(len(features), dtype=bool)
+    active[30:35] = False
+    detector = change_point_detection.BayesianOnlineChangePointDetector(prior_beta=0.01)
+    expected_alerts = [detector.update(["a", "b"], features[window], active[window])
+                       for window in range(0, len(features))]
+
+    detector = change_point_detection.BayesianOnlineChangePointDetector(prior_beta=0.01)
+    alerts = [detector.update(["a", "b"], features[window], active[window]) for window in range(0, 60)]
+    detector.graph_state = {"graph_fingerprint": "fingerprint"}
+    detector.save(tmp_path / "detector.npz")
+    detector = change_point_detection.BayesianOnlineChangePointDetector.load(tmp_path / "detector.npz")
+    assert detector.num_windows == 60
+    assert detector.feature_columns == {"a": 0, "b": 1}
+    assert detector.graph_state == {"graph_fingerprint": "fingerprint"}
+    alerts += [detector.update(["a", "b"], features[window], active[window]) for window in range(60, len(features))]
+    assert alerts == expected_alerts
+    assert any(alert is not None for alert in alerts)
+
+
+def test_online_detector_maps_features_to_columns():
+    detector = change_point_detection.BayesianOnlineChangePointDetector()
+    detector.update(["a", "b"], [0.1, 0.2])
+    detector.update(["c", "a"], [0.3, 0.4])
+    assert detector.feature_names == ["a", "b", "c"]
+    assert detector.feature_columns == {"a": 0, "b": 1, "c": 2}
+    np.testing.assert_allclose(detector.sums[1], [0.4, 0, 0.3])
+    np.testing.assert_allclose(detector.sums[-1], [0.5, 0.2, 0.3])
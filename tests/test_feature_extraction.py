@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+import baseline_feature_extraction as baseline
+from conftest import ACTORS
+from modules.task_concept_drift_detection import feature_extraction
+
+
+def to_columns(feature_names, feature_matrix):
+    if sparse.issparse(feature_matrix):
+        feature_matrix = feature_matrix.toarray()
+    return {feature_name: np.asarray(feature_matrix[:, i], dtype=float) for i, feature_name in enumerate(feature_names)}
+
+
+def assert_same_features(feature_names, feature_matrix, expected_feature_names, expected_feature_matrix):
+    columns = to_columns(feature_names, feature_matrix)
+    expected_columns = to_columns(expected_feature_names, expected_feature_matrix)
+    assert columns.keys() == expected_columns.keys()
+    for feature_name, expected_column in expected_columns.items():
+        np.testing.assert_allclose(columns[feature_name], expected_column, err_msg=feature_name)
+
+
+def assert_same_window_results(results, expected_results):
+    assert len(results) == len(expected_results)
+    for window_results, expected_window_results in zip(results, expected_results):
+        window_results = dict(window_results)
+        expected_window_results = dict(expected_window_results)
+        assert window_results.keys() == expected_window_results.keys()
+        for feature_name, expected_value in expected_window_results.items():
+            assert window_results[feature_name] == pytest.approx(expected_value, nan_ok=True)
+
+
+def get_all_features(f_extr):
+    return list(f_extr.grouped_feature_definitions) + f_extr.performance_features
+
+
+@pytest.mark.parametrize("actor", ["", ACTORS[1]])
+@pytest.mark.parametrize("extractor, subgraphs, node_type", [
+    ("extract_distinct_performance_instance_count", "task_subgraphs_nodes", "task_variant"),
+    ("extract_count_per_performance_instance", "task_subgraphs_nodes", "task"),
+    ("extract_count_per_performance_instance_normalized", "event_subgraphs_nodes", "activity"),
+    ("extract_total_performance_instance_count", "event_subgraphs_nodes", "activity")])
+def test_node_extractors_match_baseline(f_extr, extractor, subgraphs, node_type, actor):
+    subgraphs_nodes = getattr(f_extr, subgraphs)
+    assert_same_window_results(getattr(feature_extraction, extractor)(subgraphs_nodes, node_type, actor),
+                               getattr(baseline, extractor)(subgraphs_nodes, node_type, actor))
+
+
+@pytest.mark.parametrize("actor", ["", ACTORS[1]])
+def test_number_of_cases_matches_baseline(f_extr, actor):
+    assert_same_window_results(
+        feature_extraction.extract_number_of_cases(f_extr.task_subgraphs_nodes, actor),
+        baseline.extract_number_of_cases(f_extr.task_subgraphs_nodes, actor))
+
+
+@pytest.mark.parametrize("actor_1, actor_2", [("", ""), (ACTORS[0], ""), (ACTORS[0], ACTORS[1])])
+@pytest.mark.parametrize("entity_type", ["CaseAWO", "Resource"])
+@pytest.mark.parametrize("extractor, subgraphs, node_type", [
+    ("extract_distinct_handover_count", "task_subgraphs_edges", "task_variant"),
+    ("extract_total_handover_count", "task_subgraphs_edges", "task"),
+    ("extract_count_per_handover", "task_subgraphs_edges", "task"),
+    ("extract_count_per_handover_normalized", "event_subgraphs_edges", "activity")])
+def test_edge_extractors_match_baseline(f_extr, extractor, subgraphs, node_type, entity_type, actor_1, actor_2):
+    subgraphs_edges = getattr(f_extr, subgraphs)
+    assert_same_window_results(
+        getattr(feature_extraction, extractor)(subgraphs_edges, node_type, actor_1, actor_2, entity_type),
+        getattr(baseline, extractor)(subgraphs_edges, node_type, actor_1, actor_2, entity_type))
+
+
+@pytest.mark.parametrize("actor, actor_1, actor_2", [("", "", ""), (ACTORS[2], ACTORS[2], ACTORS[2]),
+                                                     ("", ACTORS[0], ACTORS[3])])
+def test_feature_matrix_matches_baseline(f_extr, actor, actor_1, actor_2):
+    features = get_all_features(f_extr)
+    feature_names, feature_matrix = f_extr.apply_feature_extraction(features, actor, actor_1, actor_2)
+    assert feature_names == sorted(feature_names)
+    assert_same_features(feature_names, feature_matrix,
+                         *baseline.apply_feature_extraction(f_extr, features, actor, actor_1, actor_2))
+
+
+def test_sparse_feature_matrix_matches_dense(f_extr):
+    features = get_all_features(f_extr)
+    feature_names, feature_matrix = f_extr.apply_feature_extraction(features, return_sparse=True)
+    dense_feature_names, dense_feature_matrix = f_extr.apply_feature_extraction(features)
+    assert sparse.isspmatrix_csr(feature_matrix)
+    assert feature_names == dense_feature_names
+    np.testing.assert_array_equal(feature_matrix.toarray(), dense_feature_matrix)
+
+
+def test_actor_feature_tensor_matches_feature_matrix(f_extr):
+    features = list(f_extr.grouped_feature_definitions)
+    actor_feature_tensor = f_extr.extract_actor_feature_tensor(features, ACTORS)
+    for actor in ACTORS:
+        assert_same_features(*actor_feature_tensor.get_subgroup_features(actor),
+                             *f_extr.apply_feature_extraction(features, actor=actor, actor_1=actor, actor_2=actor))
+
+
+def test_collab_feature_tensor_matches_feature_matrix(f_extr):
+    features = f_extr.task_edge_based_features[:-2] + f_extr.event_edge_based_features
+    collab_pairs = [[ACTORS[0], ACTORS[1]], [ACTORS[2], ACTORS[4]]]
+    collab_feature_tensor = f_extr.extract_collab_feature_tensor(features, collab_pairs)
+    for actor_1, actor_2 in collab_pairs + [pair[::-1] for pair in collab_pairs]:
+        assert_same_features(*collab_feature_tensor.get_subgroup_features((actor_1, actor_2)),
+                             *f_extr.apply_feature_extraction(features, actor_1=actor_1, actor_2=actor_2))
+
+
+@pytest.mark.parametrize("window_size", [1, 3, 7])
+def test_split_into_windows_matches_window_filter(window_size):
+    rng = np.random.default_rng(1)
+    num_days = 30
+    from_days = rng.integers(0, num_days, 200)
+    df_subgraph = pd.DataFrame({"task": rng.choice(["T01", "T02", "C"], 200), "from_day": from_days,
+                                "to_day": from_days + rng.integers(0, 4, 200)})
+    num_windows = num_days // window_size
+    subgraphs = feature_extraction.split_into_windows(df_subgraph, window_size, num_windows)
+    assert len(subgraphs) == num_windows
+    for window, df_window_subgraph in enumerate(subgraphs):
+        # the date filter of the per-window queries
+        expected = df_subgraph[(window * window_size <= df_subgraph["from_day"]) &
+                               (df_subgraph["to_day"] <= (window + 1) * window_size)]
+        pd.testing.assert_frame_equal(df_window_subgraph,
+                                      expected.drop(columns=["from_day", "to_day"]).reset_index(drop=True))
+
+
+@pytest.mark.parametrize("num_days, window_size, num_complete_windows", [(30, 1, 29), (30, 3, 9), (31, 3, 10),
+                                                                         (2, 3, 0)])
+def test_num_complete_windows(num_days, window_size, num_complete_windows):
+    assert feature_extraction.get_num_complete_windows(num_days, window_size) == num_complete_windows
+
+
+@pytest.mark.parametrize("extractor", ["extract_average_case_duration", "extract_case_throughput_speed",
+                                       "extract_case_throughput_velocity"])
+def test_performance_features_without_case_lifecycles(extractor):
+    durations = feature_extraction.bin_case_lifecycles(pd.DataFrame(), 7, 3)
+    results = getattr(feature_extraction, extractor)(durations)
+    assert len(results) == 3
+    assert all(np.isnan(value) for window_results in results for _, value in window_results)
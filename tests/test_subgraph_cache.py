@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd
+import pytest
+
+from modules.task_concept_drift_detection.subgraph_cache import SubgraphCache
+
+
+@pytest.fixture
+def subgraph_cache(working_directory):
+    return SubgraphCache(f"{working_directory}{os.sep}")
+
+
+def make_window_subgraph(window, num_rows):
+    return pd.DataFrame({"task": pd.Categorical([f"T{(window + row) % 3}" for row in range(0, num_rows)]),
+                         "count": list(range(0, num_rows))})
+
+
+def assert_same_windows(subgraphs, expected_subgraphs):
+    assert len(subgraphs) == len(expected_subgraphs)
+    for df_window_subgraph, df_expected in zip(subgraphs, expected_subgraphs):
+        if df_expected.empty:
+            assert df_window_subgraph.empty
+        else:
+            pd.testing.assert_frame_equal(df_window_subgraph.astype({"task": str}), df_expected.astype({"task": str}),
+                                          check_dtype=False)
+
+
+def test_store_and_load(subgraph_cache):
+    df_subgraph = pd.DataFrame({"task": ["T1", "T2"], "count": [1, 2]})
+    assert not subgraph_cache.contains("task_nodes", "key")
+    subgraph_cache.store("task_nodes", "key", df_subgraph, watermark={"num_windows": 2})
+    assert subgraph_cache.contains("task_nodes", "key")
+    pd.testing.assert_frame_equal(subgraph_cache.load("task_nodes", "key"), df_subgraph)
+    assert subgraph_cache.load_watermark("task_nodes", "key") == {"num_windows": 2}
+    assert subgraph_cache.load_watermark("task_nodes", "other_key") is None
+
+
+def test_store_and_load_windows(subgraph_cache):
+    subgraphs = [make_window_subgraph(window, 0 if window == 2 else window + 1) for window in range(0, 5)]
+    subgraph_cache.store_windows("task_nodes", "key", subgraphs)
+    assert_same_windows(subgraph_cache.load_windows("task_nodes", "key", 5), subgraphs)
+    assert_same_windows(subgraph_cache.load_windows("task_nodes", "key", 5, windows=[1, 4]),
+                        [subgraphs[1], subgraphs[4]])
+
+
+def test_store_windows_without_rows(subgraph_cache):
+    subgraphs = [make_window_subgraph(window, 0) for window in range(0, 3)]
+    subgraph_cache.store_windows("task_nodes", "key", subgraphs)
+    assert_same_windows(subgraph_cache.load_windows("task_nodes", "key", 3), subgraphs)
+
+
+def test_store_windows_from_first_window(subgraph_cache):
+    subgraphs = [make_window_subgraph(window, window + 1) for window in range(0, 4)]
+    subgraph_cache.store_windows("task_nodes", "key", subgraphs, watermark={"prefix_windows": 3})
+    dataset_path = subgraph_cache.get_dataset_path("task_nodes", "key")
+    kept_partition = os.path.join(dataset_path, "window=1")
+    kept_files = {name: os.stat(os.path.join(kept_partition, name)).st_mtime_ns for name in os.listdir(kept_partition)}
+
+    # the last window is replaced and two windows are appended, the partitions of the other windows are kept
+    new_subgraphs = [make_window_subgraph(window, 2 * window) for window in range(3, 6)]
+    subgraph_cache.store_windows("task_nodes", "key", new_subgraphs, watermark={"prefix_windows": 5}, first_window=3)
+    assert {name: os.stat(os.path.join(kept_partition, name)).st_mtime_ns
+            for name in os.listdir(kept_partition)} == kept_files
+    assert_same_windows(subgraph_cache.load_windows("task_nodes", "key", 6), subgraphs[:3] + new_subgraphs)
+    assert subgraph_cache.load_watermark("task_nodes", "key") == {"prefix_windows": 5}
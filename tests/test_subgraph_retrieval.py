@@ -0,0 +1,266 @@
+import datetime
+import os
+import re
+from types import SimpleNamespace
+
+import neo4j
+import numpy as np
+import pytest
+from neo4j.time import Duration
+
+from conftest import ACTIVITIES, ACTORS, CASES, TASKS
+from modules.task_concept_drift_detection.feature_extraction import FeatureExtraction, get_num_complete_windows
+from queries.task_cd_detection import get_return_columns
+
+START_DATE = datetime.datetime(2020, 1, 1)
+# subgraph source: text of the MATCH clause of its queries, the lifecycles before the nodes they also match
+SUBGRAPH_SOURCES = {"case_lifecycles": "ti1.start_day AS start_day", "task_edges": "(ti1:TaskInstance)-[r:",
+                    "event_edges": "(e1:Event)-[r:", "task_nodes": "(ti:TaskInstance)", "event_nodes": "(e:Event)"}
+
+
+class Entity(SimpleNamespace):
+    def get_df_label(self):
+        return f"DF_{self.type}"
+
+    def get_df_ti_label(self):
+        return f"DF_TI_{self.type}"
+
+
+CASE = Entity(type="CaseAWO")
+RESOURCE = Entity(type="Resource")
+
+
+class FakeGraph:
+    '''
+    Rows of every subgraph source with the day buckets (from_day, to_day) the window queries filter on, the subgraph
+    queries are answered from the rows by the text of the query
+    '''
+
+    def __init__(self, seed=0):
+        self.rng = np.random.default_rng(seed)
+        self.num_days = 0
+        self.rows = {subgraph_source: [] for subgraph_source in SUBGRAPH_SOURCES}
+        # start day of every window query that was run
+        self.queried_windows = []
+
+    def add_rows(self, first_day, last_day, num_rows):
+        rng = self.rng
+
+        def get_days():
+            from_day = int(rng.integers(first_day, last_day))
+            return from_day, int(min(from_day + rng.integers(0, 3), last_day))
+
+        for _ in range(0, num_rows):
+            from_day, to_day = get_days()
+            self.rows["task_nodes"].append({"task": str(rng.choice(TASKS)),
+                                            "task_variant": int(rng.integers(1, 8)), "case": str(rng.choice(CASES)),
+                                            "actor": str(rng.choice(ACTORS)), "from_day": from_day, "to_day": to_day})
+            from_day, to_day = get_days()
+            self.rows["event_nodes"].append({"activity": str(rng.choice(ACTIVITIES)),
+                                             "case": str(rng.choice(CASES)), "actor": str(rng.choice(ACTORS)),
+                                             "from_day": from_day, "to_day": to_day})
+            for node_type, subgraph_source in [("task", "task_edges"), ("activity", "event_edges")]:
+                from_day, to_day = get_days()
+                values = ACTIVITIES if node_type == "activity" else TASKS
+                self.rows[subgraph_source].append({
+                    f"{node_type}_1": str(rng.choice(values)), f"{node_type}_2": str(rng.choice(values)),
+                    "task_variant_1": int(rng.integers(1, 8)), "task_variant_2": int(rng.integers(1, 8)),
+                    "case_1": str(rng.choice(CASES)), "case_2": str(rng.choice(CASES)),
+                    "actor_1": str(rng.choice(ACTORS)), "actor_2": str(rng.choice(ACTORS)),
+                    "entity_type": str(rng.choice([CASE.type, RESOURCE.type])),
+                    "from_day": from_day, "to_day": to_day})
+        for _ in range(0, num_rows // 4):
+            start_day, end_day = get_days()
+            self.rows["case_lifecycles"].append({"case": str(rng.choice(CASES)), "start_day": start_day,
+                                                 "end_day": end_day,
+                                                 "duration": Duration(seconds=int(rng.integers(1, 10 ** 6)))})
+        self.num_days = max(self.num_days, last_day)
+
+    def count_rows(self, end_day=None):
+        return sum(1 for subgraph_source in ["task_nodes", "event_nodes"] for row in self.rows[subgraph_source]
+                   if end_day is None or row["to_day"] <= end_day)
+
+    def run_subgraph_query(self, query_str, parameters):
+        '''
+        returns:
+            rows of the subgraph query, counted per distinct combination of the returned columns if it aggregates
+        '''
+        subgraph_source = next(subgraph_source for subgraph_source, match_str in SUBGRAPH_SOURCES.items()
+                               if match_str in query_str)
+        rows = self.rows[subgraph_source]
+        if "$start_day" in query_str:
+            rows = [row for row in rows
+                    if parameters["start_day"] <= row["from_day"] and row["to_day"] <= parameters["end_day"]]
+        columns = get_return_columns(query_str)
+        if "count(*) AS count" not in query_str:
+            return [{column: row[column] for column in columns} for row in rows]
+        counts = {}
+        for row in rows:
+            key = tuple(row[column] for column in columns[:-1])
+            counts[key] = counts.get(key, 0) + 1
+        return [dict(zip(columns, key + (count,))) for key, count in counts.items()]
+
+    def run(self, query_str, parameters):
+        self.queried_windows.append(parameters.get("start_day"))
+        if "AS subgraph_type" not in query_str:
+            return self.run_subgraph_query(query_str, parameters)
+        # combined query: the branches are subgraph queries that return their rows as "row" lists
+        records = []
+        for branch in query_str.split("CALL {", 1)[1].rsplit("}", 1)[0].split("UNION ALL"):
+            subgraph_type = re.search(r'RETURN "(\w+)" AS subgraph_type', branch).group(1)
+            match_str, return_items = branch.rsplit("WITH ", 1)
+            rows = self.run_subgraph_query(f"{match_str}RETURN {return_items.split('RETURN ')[0]}", parameters)
+            records += [{"subgraph_type": subgraph_type, "row": list(row.values())} for row in rows]
+        return records
+
+
+class FakeSession:
+    def __init__(self, graph, fetch_sizes, **session_parameters):
+        self.graph = graph
+        fetch_sizes.append(session_parameters["fetch_size"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+    def run(self, query_str, parameters):
+        return iter([neo4j.Record(record) for record in self.graph.run(query_str, parameters)])
+
+
+class FakeConnection:
+    '''
+    Connection to a FakeGraph, the records of the streamed subgraph queries are derived from the query text
+    '''
+    db_name = "neo4j"
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.fetch_sizes = []
+        self.driver = SimpleNamespace(session=lambda **kwargs: FakeSession(graph, self.fetch_sizes, **kwargs))
+
+    def exec_query(self, function, **kwargs):
+        function(**kwargs)
+        if function.__name__ == "q_get_day_bucket":
+            return [{"start_day": 0}]
+        if function.__name__ == "q_get_start_timestamp":
+            return [{"start_time": START_DATE}]
+        if function.__name__ == "q_get_end_timestamp":
+            return [{"end_time": START_DATE + datetime.timedelta(days=self.graph.num_days)}]
+        if function.__name__ == "q_get_graph_fingerprint":
+            return [{"num_rows": self.graph.count_rows()}]
+        if function.__name__ == "q_get_graph_prefix_fingerprint":
+            return [{"num_rows": self.graph.count_rows(kwargs["end_day"])}]
+        return None
+
+
+@pytest.fixture
+def graph():
+    graph = FakeGraph()
+    graph.add_rows(0, 30, 300)
+    return graph
+
+
+def get_all_features(f_extr):
+    return list(f_extr.grouped_feature_definitions) + f_extr.performance_features
+
+
+def retrieve_features(graph, dataset_name, window_size, **subgraph_settings):
+    '''
+    returns:
+        feature names and matrices of the process and of an actor, from the subgraphs retrieved with the settings
+    '''
+    f_extr = FeatureExtraction(FakeConnection(graph), dataset_name, CASE, RESOURCE, "")
+    features = get_all_features(f_extr)
+    f_extr.retrieve_subgraphs_for_feature_extraction(window_size, features, **subgraph_settings)
+    return [f_extr.apply_feature_extraction(features), f_extr.apply_feature_extraction(features, actor=ACTORS[1])]
+
+
+def assert_same_features(results, expected_results):
+    for (feature_names, feature_matrix), (expected_feature_names, expected_feature_matrix) in \
+            zip(results, expected_results):
+        assert feature_names == expected_feature_names
+        np.testing.assert_allclose(feature_matrix, expected_feature_matrix)
+
+
+@pytest.mark.parametrize("window_size", [1, 4, 7])
+def test_one_shot_retrieval_matches_per_window(working_directory, graph, window_size):
+    assert_same_features(retrieve_features(graph, "one_shot", window_size, retrieval_mode="one_shot"),
+                         retrieve_features(graph, "per_window", window_size))
+
+
+@pytest.mark.parametrize("retrieval_mode", ["per_window", "one_shot"])
+def test_aggregated_retrieval_matches_per_window(working_directory, graph, retrieval_mode):
+    assert_same_features(retrieve_features(graph, "aggregated", 4, retrieval_mode=retrieval_mode,
+                                           aggregate_subgraphs=True),
+                         retrieve_features(graph, "per_window", 4))
+
+
+@pytest.mark.parametrize("retrieval_workers", [2, 5])
+def test_concurrent_retrieval_matches_per_window(working_directory, graph, retrieval_workers):
+    assert_same_features(retrieve_features(graph, "concurrent", 3, retrieval_workers=retrieval_workers),
+                         retrieve_features(graph, "per_window", 3))
+
+
+@pytest.mark.parametrize("retrieval_mode", ["per_window", "one_shot"])
+def test_chunked_parsing_matches_per_window(working_directory, graph, retrieval_mode):
+    # chunks of 7 records, such that the subgraphs are parsed from several chunks
+    connection = FakeConnection(graph)
+    f_extr = FeatureExtraction(connection, "chunked", CASE, RESOURCE, "")
+    features = get_all_features(f_extr)
+    f_extr.retrieve_subgraphs_for_feature_extraction(4, features, retrieval_mode=retrieval_mode, chunk_size=7)
+    assert connection.fetch_sizes and set(connection.fetch_sizes) == {7}
+    assert_same_features([f_extr.apply_feature_extraction(features),
+                          f_extr.apply_feature_extraction(features, actor=ACTORS[1])],
+                         retrieve_features(graph, "per_window", 4))
+
+
+@pytest.mark.parametrize("aggregate_subgraphs", [False, True])
+@pytest.mark.parametrize("retrieval_workers", [1, 3])
+def test_combined_retrieval_matches_per_window(working_directory, graph, aggregate_subgraphs, retrieval_workers):
+    results = retrieve_features(graph, "combined", 4, aggregate_subgraphs=aggregate_subgraphs,
+                                retrieval_workers=retrieval_workers, combine_window_queries=True)
+    # a single query per window for all subgraph types
+    assert sorted(start_day for start_day in graph.queried_windows if start_day is not None) == list(range(0, 28, 4))
+    assert_same_features(results, retrieve_features(graph, "per_window", 4))
+
+
+def retrieve_incremental(graph, window_size):
+    f_extr = FeatureExtraction(FakeConnection(graph), "incremental", CASE, RESOURCE, "")
+    features = get_all_features(f_extr)
+    graph.queried_windows = []
+    f_extr.retrieve_subgraphs_for_feature_extraction(window_size, features, incremental=True)
+    return f_extr, [f_extr.apply_feature_extraction(features),
+                    f_extr.apply_feature_extraction(features, actor=ACTORS[1])]
+
+
+def get_partition_files(f_extr, window):
+    # the task node subgraphs are the first cached subgraph type
+    partition = os.path.join(f_extr.subgraph_cache.get_dataset_path("task_node", f_extr.subgraph_cache_keys[0]),
+                             f"window={window}")
+    return {name: os.stat(os.path.join(partition, name)).st_mtime_ns for name in os.listdir(partition)}
+
+
+def test_incremental_retrieval_after_the_graph_grows(working_directory, graph):
+    f_extr, _ = retrieve_incremental(graph, 3)
+    partition_files = get_partition_files(f_extr, 0)
+    prefix_windows = get_num_complete_windows(graph.num_days, 3)
+    graph.add_rows(prefix_windows * 3 + 1, 45, 150)
+
+    f_extr, results = retrieve_incremental(graph, 3)
+    # only the windows from the last incomplete window on are queried, the partitions of the others are kept
+    queried_windows = [start_day for start_day in graph.queried_windows if start_day is not None]
+    assert min(queried_windows) == prefix_windows * 3
+    assert get_partition_files(f_extr, 0) == partition_files
+    assert_same_features(results, retrieve_features(graph, "per_window", 3))
+
+
+def test_incremental_retrieval_after_late_data(working_directory, graph):
+    retrieve_incremental(graph, 3)
+    # rows that end in the second window, which was complete when it was cached
+    graph.add_rows(3, 6, 5)
+
+    _, results = retrieve_incremental(graph, 3)
+    assert 0 in graph.queried_windows
+    assert_same_features(results, retrieve_features(graph, "per_window", 3))